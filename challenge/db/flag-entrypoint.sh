@@ -0,0 +1,21 @@
+#!/bin/bash
+# Entrypoint for the pre-seeded database image.
+# Writes this team's Credential Harvester flag into the seeded users table
+# via --init-file, which mysqld runs before it accepts connections (so the
+# healthcheck never sees the placeholder). The WHERE on the placeholder makes
+# it a no-op on restarts and after init_flags.sh has already run.
+set -e
+
+DATADIR=/var/lib/mysql-seed
+
+if [ "$1" = 'mysqld' ] && [ -d "$DATADIR/mysql" ] && [ -n "${FLAG_SQL_INJECTION:-}" ]; then
+    flag=$(printf '%s' "$FLAG_SQL_INJECTION" | sed -e 's/\\/\\\\/g' -e "s/'/''/g")
+    cat > /tmp/init-flag.sql <<SQL
+UPDATE \`${MYSQL_DATABASE}\`.users SET username = '${flag}'
+ WHERE id = 22 AND username = 'FLAG_SQL_INJECTION_PLACEHOLDER';
+SQL
+    chmod 644 /tmp/init-flag.sql
+    set -- "$@" --init-file=/tmp/init-flag.sql
+fi
+
+exec docker-entrypoint.sh "$@"
@@ -1,5 +1,6 @@
 #!/bin/bash
 # Inject the Credential Harvester flag as a username in the users table.
-# This runs after 01_bankingai.sql during DB initialisation.
+# The ctf-db image writes the flag at startup (flag-entrypoint.sh); this
+# script re-flags an already running database (manager warm pool).
 mysql -uroot -p"${MYSQL_ROOT_PASSWORD}" "${MYSQL_DATABASE}" \
   -e "UPDATE users SET username = '${FLAG_SQL_INJECTION}' WHERE id = 22;"
@@ -95,8 +95,12 @@ port  = int(os.environ['TEAM_PORT'])
 pw_hash = bcrypt.hashpw(pw, bcrypt.gensalt()).decode()
 
 conn = sqlite3.connect(db)
+# Upsert rather than INSERT OR REPLACE: REPLACE deletes the row, which would
+# cascade to the team's submissions and purchases.
 conn.execute(
-    "INSERT OR REPLACE INTO teams (name, password_hash, port, status) VALUES (?,?,?,?)",
+    "INSERT INTO teams (name, password_hash, port, status) VALUES (?,?,?,?) "
+    "ON CONFLICT(name) DO UPDATE SET password_hash = excluded.password_hash, "
+    "port = excluded.port, status = excluded.status",
     (team, pw_hash, port, 'ready')
 )
 conn.commit()
@@ -37,10 +37,9 @@ import os, sqlite3
 db   = os.environ['MANAGER_DB']
 team = os.environ['TEAM_NAME']
 conn = sqlite3.connect(db)
-conn.execute("DELETE FROM hint_purchases WHERE team_name = ?", (team,))
-conn.execute("DELETE FROM name_purchases WHERE team_name = ?", (team,))
-conn.execute("DELETE FROM submissions    WHERE team_name = ?", (team,))
-conn.execute("DELETE FROM teams          WHERE name = ?",      (team,))
+# submissions, hint_purchases and name_purchases cascade via team_id
+conn.execute("PRAGMA foreign_keys = ON")
+conn.execute("DELETE FROM teams WHERE name = ?", (team,))
 conn.commit()
 conn.close()
 PYEOF
@@ -1,9 +1,10 @@
 <?php
 // Database connection settings
-$servername = "db";          // Docker service name
-$username   = "admin";        // your DB user
-$password   = "password";        // your DB password
-$dbname     = "bankingai";     // your database name
+// (overridden per team when the manager runs a shared MySQL server)
+$servername = "db";                                 // Docker service name
+$username   = getenv('DB_USER') ?: "admin";         // your DB user
+$password   = getenv('DB_PASSWORD') ?: "password";  // your DB password
+$dbname     = getenv('DB_NAME') ?: "bankingai";     // your database name
 
 // Create connection
 $conn = new mysqli($servername, $username, $password, $dbname);
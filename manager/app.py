@@ -7,33 +7,100 @@ Environment variables (set in manager/docker-compose.yaml):
   CHALLENGE_DIR     — absolute host path to challenge/ (for --project-directory)
   SECRET_KEY        — Flask session signing key
   PORT_RANGE_START  — first port to assign to teams (default 8000)
+  PORT_RANGE_END    — last port to assign to teams (default PORT_RANGE_START + 999)
   HOST_IP           — IP / hostname shown to teams in their dashboard URL
+  MANAGER_DB        — SQLite database path (default data/manager.db)
+  WORKERS           — run under gunicorn with this many web worker processes plus an orchestrator process (default 0: one process, development server)
+  WORKER_THREADS    — threads per web worker (default 256)
+  CONTROL_SOCKET    — unix socket web workers reach the orchestrator on (default next to MANAGER_DB)
+  RATELIMIT_STORAGE — flask-limiter storage URI (default memory://, or a shared sqlite:// file with WORKERS)
+  BCRYPT_ROUNDS     — bcrypt cost of password hashes; logins re-hash older ones (default 12)
+  HASH_WORKERS      — processes hashing passwords, 0 = in the request thread (default half the CPUs, split over WORKERS)
+  HASH_QUEUE        — password hashes queued at once before logins get a 503 (default 32)
+  METRICS           — 0 to turn off /metrics and the request/query timing hooks (default 1)
+  SLOW_REQUEST_MS   — while SQL tracing is on, requests slower than this go to the slow-request log (default 250)
+  PROFILE_INTERVAL_MS — sampling profiler interval (default 5)
+  DB_POOL           — 0 to disable pooled WAL-mode SQLite connections (default 1)
+  DB_POOL_SIZE      — max idle pooled SQLite connections (default 16)
+  DB_BUSY_TIMEOUT_MS — SQLite busy timeout before retrying a statement (default 5000)
+  FLAG_INDEX_SIZE   — teams kept in the flag verification LRU (default 1024)
+  CATALOG_FILE      — flags/hints JSON catalog (default manager/catalog.json)
+  CATALOG_POLL_SECONDS — seconds between catalog change checks, 0 disables (default 5)
+  DOCKER_API        — 0 to drive containers with the docker CLI instead of the Engine API (default 1)
+  DOCKER_SOCKET     — Docker Engine API socket (default /var/run/docker.sock)
+  DOCKER_HOSTS      — Docker hosts to place instances on: "name=endpoint [host_ip=..] [max=..] [tls=..], ..."
+  HOST_CHECK_SECONDS — Docker host health check interval (default 15)
+  READY_TIMEOUT     — seconds a launched instance may take to come up (default 180)
+  READY_RECONCILE_SECONDS — full container-state reconcile interval (default 5)
+  POOL_SIZE         — pre-booted instances kept ready for new teams (default 0, off)
+  POOL_SERVICES     — services pre-booted in the pool (default db)
+  POOL_BIND_EXEC    — service:command that injects a team's flags at assignment
+  SHARED_DB         — container name of a MySQL server shared by all teams (default off)
+  SHARED_DB_SQL     — bankingai.sql path inside that container (default /srv/bankingai.sql)
+  PROXY_PORT        — port of the built-in instance proxy; instances then publish no ports (default 0, off)
+  PROXY_DOMAIN      — serve <team>.PROXY_DOMAIN through the proxy (required with PROXY_PORT)
+  PROXY_PUBLIC_PORT — proxy port as seen by teams (default PROXY_PORT)
+  PROXY_CONTAINER   — manager container name, joined to instance networks for the proxy
+  NETWORK_SUBNET_POOL — CIDR that team networks get their own subnets from (default: Docker's pools)
+  NETWORK_SUBNET_PREFIX — prefix length of each team network's subnet (default 24)
+  INSTANCE_MEMORY_MB — memory budgeted per running instance, 0 = no limit (default 512)
+  ADMIT_MEMORY_PERCENT — share of the Docker host's memory instances may use (default 90)
+  HIBERNATE_IDLE_MINUTES — idle minutes before an instance is hibernated (default 0, off)
+  HIBERNATE_MODE    — stop (frees memory) or pause (instant, traffic-woken) (default stop)
+  HIBERNATE_POLL_SECONDS — traffic check interval for paused instances (default 2)
+  STATS_SECONDS     — CPU/memory/network sampling interval of instances for the admin page, 0 disables (default 10)
+  LIVE_UPDATES      — 0 to turn off pushing scoreboard/status changes over Server-Sent Events (default 1)
+  LIVE_MAX_CLIENTS  — open live-update streams served at once (default 2000)
+  LIVE_KEEPALIVE_SECONDS — keepalive interval on idle streams (default 15)
+  ORCH_CONCURRENCY  — instances launched in parallel (default 4)
+  ORCH_STAGGER_SECONDS — minimum gap between instance launches (default 3)
   FLAG_INSPECTED, FLAG_LOGIN, FLAG_SQL_INJECTION,
   FLAG_USER_ESCALATION, FLAG_FILE_UPLOAD — correct flag values for submission scoring
 """
 
+import gzip
 import hashlib
+import heapq
 import hmac
+import itertools
+import json
 import logging
+import math
 import os
+import queue
 import re
 import sqlite3
 import subprocess
+import sys
 import threading
 import time
-from collections import defaultdict
+from collections import Counter, defaultdict, deque
 from contextlib import contextmanager
 from datetime import datetime, timezone
-from functools import wraps
+from functools import lru_cache, partial, wraps
+from types import SimpleNamespace
 from zoneinfo import ZoneInfo
 
-import bcrypt
-from flask import (Flask, flash, redirect, render_template,
+from flask import (Flask, flash, g, redirect, render_template,
                    request, session, url_for)
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_wtf.csrf import CSRFProtect
 
+import limiter_store  # noqa: F401  (registers the sqlite:// limiter storage)
+import metrics
+import profiling
+from capacity import Allocator
+from control import ControlClient, ControlError, ControlServer
+from docker_api import (ComposeEngine, ComposeModel, DockerClient, DockerError,
+                        context_endpoint)
+from hibernation import Hibernator
+from passwords import HasherBusy, PasswordHasher, hash_rounds
+from proxy import InstanceProxy
+from resource_stats import ContainerStats
+from scheduler import PRIO_ADMIN, PRIO_REGISTER, Orchestrator
+from warm_pool import POOL_LABEL, WarmPool
+
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s [%(levelname)s] %(message)s')
 
@@ -45,8 +112,6 @@ app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'change-me-in-production')
 
 csrf    = CSRFProtect(app)
-limiter = Limiter(get_remote_address, app=app,
-                  storage_uri="memory://", default_limits=[])
 
 ADMIN_TOKEN      = os.environ.get('ADMIN_TOKEN', '')
 # Path the compose CLIENT reads (inside the container)
@@ -55,6 +120,7 @@ CTF_COMPOSE_FILE = os.environ.get('CTF_COMPOSE_FILE', '/ctf/challenge/docker-com
 # Docker daemon resolves relative bind mounts (./web/src etc.) to the right host paths
 CHALLENGE_DIR    = os.environ.get('CHALLENGE_DIR', '')
 PORT_RANGE_START = int(os.environ.get('PORT_RANGE_START', '8000'))
+PORT_RANGE_END   = int(os.environ.get('PORT_RANGE_END', str(PORT_RANGE_START + 999)))
 HOST_IP          = os.environ.get('HOST_IP', '127.0.0.1')
 # Single secret used to derive all per-team flags
 FLAG_SECRET      = os.environ.get('FLAG_SECRET', 'change-me-flag-secret')
@@ -67,67 +133,368 @@ def _ts_to_ms(ts_str: str) -> int:
     return int(datetime.fromisoformat(ts_str).replace(tzinfo=timezone.utc).timestamp() * 1000)
 
 
-def _ts_to_est(ts_str: str) -> str:
-    """Convert a UTC SQLite timestamp string to an EST/EDT display string."""
-    dt = datetime.fromisoformat(ts_str).replace(tzinfo=timezone.utc).astimezone(TZ)
+def _ms_to_est(ms: int) -> str:
+    """Convert Unix milliseconds to an EST/EDT display string."""
+    dt = datetime.fromtimestamp(ms / 1000, tz=timezone.utc).astimezone(TZ)
     return dt.strftime('%Y-%m-%d %H:%M %Z')
 
-DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'manager.db')
+# Same MANAGER_DB override as challenge/scripts/*.sh
+DB_PATH = os.environ.get('MANAGER_DB',
+                         os.path.join(os.path.dirname(__file__), 'data', 'manager.db'))
+# DB_POOL=0 falls back to one fresh connection per get_db() call with the
+# default rollback journal — kept for A/B comparison against the pooled layer.
+DB_POOL            = os.environ.get('DB_POOL', '1') != '0'
+DB_POOL_SIZE       = int(os.environ.get('DB_POOL_SIZE', '16'))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', '5000'))
+DB_BUSY_RETRIES    = 5
+
+# What this process runs. 'all' (the default) is everything in one process
+# under the development server. With WORKERS > 0, `python app.py` hands over
+# to gunicorn (gunicorn.conf.py): WORKERS processes with MANAGER_ROLE=web
+# serve requests, and one with MANAGER_ROLE=orchestrator owns Docker and the
+# background threads, reached over CONTROL_SOCKET.
+MANAGER_ROLE   = os.environ.get('MANAGER_ROLE', 'all')
+WORKERS        = int(os.environ.get('WORKERS', '0'))
+WORKER_THREADS = int(os.environ.get('WORKER_THREADS', '256'))
+CONTROL_SOCKET = os.environ.get('CONTROL_SOCKET',
+                                os.path.join(os.path.dirname(DB_PATH), 'control.sock'))
+# Rate-limit counters: per process, or in a SQLite file all workers share
+RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE') or (
+    'sqlite://' + os.path.join(os.path.dirname(DB_PATH), 'ratelimit.db')
+    if MANAGER_ROLE == 'web' else 'memory://')
+
+limiter = Limiter(get_remote_address, app=app,
+                  storage_uri=RATELIMIT_STORAGE, default_limits=[])
 
 # ---------------------------------------------------------------------------
-# Flag config
+# Metrics
 # ---------------------------------------------------------------------------
 
-FLAGS = [
-    # Points reflect difficulty (75–200). fb_multiplier applied to first capture only.
-    {'id': 'FLAG_INSPECTED',            'name': 'Inspect the Source',   'points':  75, 'fb_multiplier': 1.2},
-    {'id': 'FLAG_LOGIN',                'name': 'Initial Access',        'points': 100, 'fb_multiplier': 1.2},
-    {'id': 'FLAG_SQL_INJECTION', 'name': 'SQL Injection',         'points': 150, 'fb_multiplier': 1.2},
-    {'id': 'FLAG_USER_ESCALATION',         'name': 'User Escalation',       'points': 125, 'fb_multiplier': 1.2},
-    {'id': 'FLAG_FILE_UPLOAD',          'name': 'File Upload RCE',       'points': 200, 'fb_multiplier': 1.2},
-]
-# Base total (no first blood bonuses). MAX_POSSIBLE includes all first blood bonuses.
-MAX_SCORE    = sum(f['points'] for f in FLAGS)
-MAX_POSSIBLE = sum(int(f['points'] * f['fb_multiplier']) for f in FLAGS)
-
-# Cost to reveal a flag's challenge name on the dashboard
-FLAG_NAME_COST = 5
-
-# Hints — sequential per flag (order N requires order N-1 purchased first).
-# cost is deducted from the team's score when purchased.
-HINTS = [
-    # ── FLAG_INSPECTED ──────────────────────────────────────────────────────
-    {'id':  1, 'flag_id': 'FLAG_INSPECTED',            'order': 1, 'cost': 10,
-     'text': "Something is hidden in plain sight on one of the public pages."},
-    {'id':  2, 'flag_id': 'FLAG_INSPECTED',            'order': 2, 'cost': 25,
-     'text': "View the HTML source of the Products page (Ctrl+U)."},
-    # ── FLAG_LOGIN ──────────────────────────────────────────────────────────
-    {'id':  3, 'flag_id': 'FLAG_LOGIN',                'order': 1, 'cost': 15,
-     'text': "Web servers often tell crawlers which paths to avoid. Have you checked?"},
-    {'id':  4, 'flag_id': 'FLAG_LOGIN',                'order': 2, 'cost': 30,
-     'text': "Check /robots.txt — then follow the disallowed path."},
-    {'id':  5, 'flag_id': 'FLAG_LOGIN',                'order': 3, 'cost': 50,
-     'text': "The staff resources directory contains an onboarding document with default credentials."},
-    # ── FLAG_SQL_INJECTION (SQL Injection) ───────────────────────────
-    {'id':  6, 'flag_id': 'FLAG_SQL_INJECTION', 'order': 1, 'cost': 20,
-     'text': "After login, one page lets you search for staff. Does it sanitise input?"},
-    {'id':  7, 'flag_id': 'FLAG_SQL_INJECTION', 'order': 2, 'cost': 45,
-     'text': "The lookup page builds a SQL LIKE query directly from the search field — no sanitisation."},
-    {'id':  8, 'flag_id': 'FLAG_SQL_INJECTION', 'order': 3, 'cost': 70,
-     'text': "Try a UNION SELECT to dump the users table: ' UNION SELECT username,password,3,4,5 FROM users-- -"},
-    # ── FLAG_USER_ESCALATION (User Escalation) ────────────────────────────────
-    {'id':  9, 'flag_id': 'FLAG_USER_ESCALATION',         'order': 1, 'cost': 20,
-     'text': "The users table contains credentials for other accounts, not just employees."},
-    {'id': 10, 'flag_id': 'FLAG_USER_ESCALATION',         'order': 2, 'cost': 45,
-     'text': "The password column is unsalted MD5. Crack it with rockyou.txt."},
-    # ── FLAG_FILE_UPLOAD ────────────────────────────────────────────────────
-    {'id': 11, 'flag_id': 'FLAG_FILE_UPLOAD',          'order': 1, 'cost': 25,
-     'text': "The admin panel has a file management section. Does it validate what you upload?"},
-    {'id': 12, 'flag_id': 'FLAG_FILE_UPLOAD',          'order': 2, 'cost': 55,
-     'text': "The upload feature accepts any file type. A PHP script will execute on the server."},
-    {'id': 13, 'flag_id': 'FLAG_FILE_UPLOAD',          'order': 3, 'cost': 80,
-     'text': "Uploaded files are served from /uploads/. A PHP webshell with ?cmd=cat+/flag.txt will read the flag."},
-]
+# Prometheus text format on /metrics, for localhost and the admin (logged in,
+# or `Authorization: Bearer <ADMIN_TOKEN>` from a scraper). METRICS=0 turns
+# off the endpoint and the per-request and per-query hooks.
+METRICS = os.environ.get('METRICS', '1') != '0'
+# Web workers send their metrics to the orchestrator process this often (the
+# worker answering /metrics sends its own first); see prometheus_text()
+METRICS_PUSH_SECONDS  = 15
+# A worker that stopped sending (it exited) is dropped after this long
+METRICS_STALE_SECONDS = 4 * METRICS_PUSH_SECONDS
+
+registry = metrics.Registry()
+
+http_seconds    = registry.histogram(
+    'manager_http_request_seconds', 'Request latency until the response is returned, by route',
+    ['endpoint', 'method', 'status'])
+ratelimited     = registry.counter(
+    'manager_ratelimit_rejections_total', 'Requests refused by the rate limiter', ['endpoint'])
+db_seconds      = registry.histogram(
+    'manager_db_seconds', 'Time a get_db() block held its connection, by calling function',
+    ['helper'])
+db_statements   = registry.counter(
+    'manager_db_statements_total', 'SQL statements run in get_db() blocks, by calling function',
+    ['helper'])
+docker_seconds  = registry.histogram(
+    'manager_docker_seconds', 'docker compose up/down duration (CLI or Engine API)', ['op'],
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300))
+docker_failures = registry.counter(
+    'manager_docker_failures_total', 'docker compose up/down calls that failed', ['op'])
+ready_seconds   = registry.histogram(
+    'manager_instance_ready_seconds', 'Time from registration to the team instance being ready',
+    buckets=(5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600, 1800))
+
+registry.gauge('manager_threads', 'Live threads, summed over the processes of a role',
+               ['role'], lambda: {(MANAGER_ROLE,): threading.active_count()})
+
+
+def _metrics_start():
+    g.metrics_start = time.perf_counter()
+
+
+def _metrics_record(response):
+    endpoint = request.endpoint or 'unmatched'
+    # Unset when an earlier before_request hook (the limiter's) cut the request short
+    start = g.get('metrics_start')
+    if start is not None:
+        http_seconds.observe(time.perf_counter() - start,
+                             endpoint, request.method, response.status_code)
+    if response.status_code == 429:
+        ratelimited.inc(endpoint)
+    return response
+
+
+if METRICS:
+    app.before_request(_metrics_start)
+    app.after_request(_metrics_record)
+
+# ---------------------------------------------------------------------------
+# Diagnostics (SQL tracing, slow requests, profiler)
+# ---------------------------------------------------------------------------
+
+# Opt-in from /admin/diagnostics, each for a chosen time. While SQL tracing
+# is on, every request records the statements it runs, with duration and
+# call site; the last TRACE_KEEP requests are kept, and those slower than
+# SLOW_REQUEST_MS also go to the slow-request log. The profiler samples
+# every thread's stack (profiling.py) in every process. With WORKERS, the
+# orchestrator process holds the settings and the results: web workers fetch
+# the one and send the other every DIAG_SYNC_SECONDS.
+SLOW_REQUEST_MS      = float(os.environ.get('SLOW_REQUEST_MS', '250'))
+PROFILE_INTERVAL_MS  = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+TRACE_KEEP           = 100
+TRACE_MAX_STATEMENTS = 200      # per request; the rest are only counted
+DIAG_SYNC_SECONDS    = 2
+
+class _TraceLocal(threading.local):
+    statements = None       # a list while the thread serves a traced request
+
+
+_trace_local = _TraceLocal()
+
+
+class Diagnostics:
+    """Settings and results of the opt-in diagnostics in this process.
+
+    Results end up here in the 'all' and 'orchestrator' roles. A web worker
+    keeps its traces in an outbox, and its samples in the sampler, until
+    sync() sends them.
+    """
+
+    def __init__(self):
+        self.lock          = threading.Lock()
+        self.trace_until   = 0.0
+        self.profile_until = 0.0
+        self.profile_mode  = 'cpu'
+        self.recent        = deque(maxlen=TRACE_KEEP)
+        self.slow          = deque(maxlen=TRACE_KEEP)
+        self.profile       = Counter()     # folded stack -> samples, all processes
+        self.sampler       = profiling.Sampler(PROFILE_INTERVAL_MS / 1000)
+        self._outbox       = deque(maxlen=TRACE_KEEP)
+
+    def tracing(self) -> bool:
+        return time.time() < self.trace_until
+
+    def settings(self) -> dict:
+        return {'trace_until': self.trace_until, 'profile_until': self.profile_until,
+                'profile_mode': self.profile_mode}
+
+    def apply(self, settings: dict):
+        self.trace_until   = settings['trace_until']
+        self.profile_until = settings['profile_until']
+        self.profile_mode  = settings['profile_mode']
+        if self.profile_until > time.time() or self.sampler.running:
+            self.sampler.run_until(self.profile_until, self.profile_mode)
+
+    def configure(self, trace_seconds: float = None, profile_seconds: float = None,
+                  mode: str = 'cpu') -> dict:
+        """The admin's choice: run for this long, 0 to stop, None to leave as is."""
+        now = time.time()
+        with self.lock:
+            if trace_seconds is not None:
+                self.trace_until = now + trace_seconds
+            if profile_seconds is not None:
+                if profile_seconds and not self.sampler.running:
+                    self.profile.clear()        # a new profile, not more of the last one
+                    self.sampler.take()
+                self.profile_until = now + profile_seconds
+                self.profile_mode  = mode
+            settings = self.settings()
+        self.apply(settings)
+        return settings
+
+    def record(self, entry: dict):
+        if MANAGER_ROLE == 'web':
+            with self.lock:
+                self._outbox.append(entry)
+        else:
+            self.receive([entry], {})
+
+    def receive(self, entries: list, samples: dict) -> dict:
+        """Take traces and profile samples from a process; return the settings."""
+        with self.lock:
+            for e in entries:
+                self.recent.append(e)
+                if e['ms'] >= SLOW_REQUEST_MS:
+                    self.slow.append(e)
+            self.profile.update(samples)
+            return self.settings()
+
+    def sync(self):
+        """Web workers: send what was captured, pick up the admin's settings."""
+        with self.lock:
+            entries = list(self._outbox)
+            self._outbox.clear()
+        self.apply(control.diag_sync(entries, self.sampler.take()))
+
+    def view(self) -> dict:
+        with self.lock:
+            self.profile.update(self.sampler.take())
+            return {**self.settings(), 'now': time.time(), 'slow_ms': SLOW_REQUEST_MS,
+                    'recent': list(self.recent)[::-1], 'slow': list(self.slow)[::-1],
+                    'samples': sum(self.profile.values()),
+                    'top': profiling.top_frames(self.profile)}
+
+    def folded(self, kind: str) -> str:
+        """'profile': sampled stacks. 'sql': statement time (µs) of the kept
+        requests, as request;call site;statement stacks."""
+        with self.lock:
+            if kind == 'profile':
+                self.profile.update(self.sampler.take())
+                return profiling.folded(self.profile)
+            stacks = Counter()
+            for e in {id(e): e for e in (*self.recent, *self.slow)}.values():
+                for sql, ms, site in e['statements']:
+                    frames = (f'{e["method"]} {e["endpoint"] or e["path"]}', site,
+                              sql.replace(';', ','))
+                    stacks[';'.join(frames)] += max(1, round(ms * 1000))
+            return profiling.folded(stacks)
+
+
+diagnostics = Diagnostics()
+
+
+def _trace_start():
+    if diagnostics.tracing():
+        _trace_local.statements = []
+        g.trace_start = time.perf_counter()
+
+
+def _trace_finish(response):
+    statements = _trace_local.statements
+    if statements is None:
+        return response
+    _trace_local.statements = None
+    diagnostics.record({
+        'at':         time.time(),
+        'pid':        os.getpid(),
+        'method':     request.method,
+        'path':       request.path,
+        'endpoint':   request.endpoint,
+        'status':     response.status_code,
+        'ms':         round((time.perf_counter() - g.trace_start) * 1000, 2),
+        'sql_ms':     round(sum(ms for _, ms, _ in statements), 2),
+        'count':      len(statements),
+        'statements': statements[:TRACE_MAX_STATEMENTS],
+    })
+    return response
+
+
+def _trace_clear(exc):
+    _trace_local.statements = None
+
+
+app.before_request(_trace_start)
+app.after_request(_trace_finish)
+app.teardown_request(_trace_clear)
+
+
+def _diagnostics_sync_loop():
+    while True:
+        time.sleep(DIAG_SYNC_SECONDS)
+        try:
+            diagnostics.sync()
+        except ControlError as exc:
+            logging.warning('Diagnostics sync failed: %s', exc)
+
+# ---------------------------------------------------------------------------
+# Challenge catalog
+# ---------------------------------------------------------------------------
+
+CATALOG_FILE = os.environ.get('CATALOG_FILE',
+                              os.path.join(os.path.dirname(__file__), 'catalog.json'))
+# How often the watcher checks CATALOG_FILE for edits (0 disables it)
+CATALOG_POLL_SECONDS = float(os.environ.get('CATALOG_POLL_SECONDS', '5'))
+
+
+class Catalog:
+    """Immutable, pre-indexed view of flags and hints loaded from CATALOG_FILE.
+
+    A reload builds a complete new Catalog and swaps the module-level
+    `catalog` reference, so readers always see one consistent version.
+    Request handlers should read `catalog` once and use that object.
+    """
+
+    def __init__(self, data: dict, mtime: float = 0.0):
+        self.mtime          = mtime
+        self.flag_name_cost = int(data.get('flag_name_cost', 5))
+        self.flags          = list(data['flags'])
+        self.hints          = list(data.get('hints', []))
+
+        self.flag_by_id = {}
+        for f in self.flags:
+            if f['id'] in self.flag_by_id:
+                raise ValueError(f'duplicate flag id {f["id"]}')
+            f.setdefault('fb_multiplier', 1.0)
+            self.flag_by_id[f['id']] = f
+
+        self.hint_by_id = {}
+        # {flag_id: [hint, ...]} ordered by hint order (sequential unlock chain)
+        self.hint_chain = {f['id']: [] for f in self.flags}
+        for h in self.hints:
+            if h['id'] in self.hint_by_id:
+                raise ValueError(f'duplicate hint id {h["id"]}')
+            if h['flag_id'] not in self.flag_by_id:
+                raise ValueError(f'hint {h["id"]} references unknown flag {h["flag_id"]}')
+            self.hint_by_id[h['id']] = h
+            self.hint_chain[h['flag_id']].append(h)
+
+        # {hint_id: hint that must be bought first, or None}
+        self.hint_prev = {}
+        for chain in self.hint_chain.values():
+            chain.sort(key=lambda h: h['order'])
+            by_order = {h['order']: h for h in chain}
+            if len(by_order) != len(chain):
+                raise ValueError(f'duplicate hint order for flag {chain[0]["flag_id"]}')
+            for h in chain:
+                self.hint_prev[h['id']] = by_order.get(h['order'] - 1)
+
+        self.hint_costs = {h['id']: h['cost'] for h in self.hints}
+        # Base total (no first blood bonuses). max_possible includes all first blood bonuses.
+        self.max_score    = sum(f['points'] for f in self.flags)
+        self.max_possible = sum(int(f['points'] * f['fb_multiplier']) for f in self.flags)
+
+    @classmethod
+    def from_file(cls, path: str):
+        mtime = os.path.getmtime(path)
+        with open(path, encoding='utf-8') as fh:
+            return cls(json.load(fh), mtime)
+
+
+catalog = Catalog.from_file(CATALOG_FILE)
+
+
+def reload_catalog() -> bool:
+    """Re-read CATALOG_FILE and swap it in. Keeps the old catalog if invalid.
+
+    Scores depend on flag points and hint costs, so the score engine is
+    rebuilt under its lock together with the swap.
+    """
+    global catalog
+    try:
+        new = Catalog.from_file(CATALOG_FILE)
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        logging.error('Catalog reload failed, keeping current catalog: %s', exc)
+        return False
+    with scores.lock:
+        catalog = new
+        _flag_index.cache_clear()
+        scores.load()
+    logging.info('Catalog reloaded: %d flags, %d hints', len(new.flags), len(new.hints))
+    return True
+
+
+def _watch_catalog():
+    """Background thread: reload the catalog when CATALOG_FILE changes."""
+    seen = catalog.mtime
+    while True:
+        time.sleep(CATALOG_POLL_SECONDS)
+        try:
+            mtime = os.path.getmtime(CATALOG_FILE)
+        except OSError as exc:
+            logging.warning('Catalog watch error: %s', exc)
+            continue
+        # Only retry a broken file once it has been edited again
+        if mtime != seen:
+            seen = mtime
+            reload_catalog()
 
 
 def _team_flag(flag_id: str, team_name: str) -> str:
@@ -143,61 +510,340 @@ def _team_flag(flag_id: str, team_name: str) -> str:
     ).hexdigest()[:8]
     return f'CTF{{{slug}_{token}}}'
 
+
+# Longest submission worth hashing — real flags are well under this
+MAX_FLAG_LEN    = 128
+FLAG_INDEX_SIZE = int(os.environ.get('FLAG_INDEX_SIZE', '1024'))
+
+
+@lru_cache(maxsize=FLAG_INDEX_SIZE)
+def _flag_index(secret: str, team_name: str) -> dict:
+    """Return {sha256(flag value): (flag, flag value)} for one team.
+
+    Keyed on the secret as well as the team so that rotating FLAG_SECRET
+    simply misses the cache instead of serving stale flags. Bounded LRU so
+    brute-forcing many team names cannot grow it without limit.
+    """
+    index = {}
+    for f in catalog.flags:
+        value = _team_flag(f['id'], team_name)
+        index[hashlib.sha256(value.encode()).digest()] = (f, value)
+    return index
+
+
+def match_flag(team_name: str, submitted: str):
+    """Return the flag dict whose per-team value equals `submitted`, else None.
+
+    One hash + one dict lookup regardless of catalog size, confirmed with
+    a constant-time comparison.
+    """
+    if len(submitted) > MAX_FLAG_LEN:
+        return None
+    entry = _flag_index(FLAG_SECRET, team_name).get(hashlib.sha256(submitted.encode()).digest())
+    if entry and hmac.compare_digest(entry[1].encode(), submitted.encode()):
+        return entry[0]
+    return None
+
 # ---------------------------------------------------------------------------
 # Database helpers
 # ---------------------------------------------------------------------------
 
+# Current time as Unix ms, as an SQL expression (column default / migrations)
+_SQL_NOW_MS = "CAST(ROUND((julianday('now') - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def _sql_ts_to_ms(col: str) -> str:
+    """SQL expression converting a legacy UTC timestamp column to Unix ms."""
+    return f"CAST(ROUND((julianday({col}) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def _migration_1(conn):
+    """Original schema: children keyed by team_name, TEXT timestamps."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS teams (
+            id            INTEGER PRIMARY KEY AUTOINCREMENT,
+            name          TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            port          INTEGER UNIQUE NOT NULL,
+            created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status        TEXT DEFAULT 'starting'
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS submissions (
+            id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_name    TEXT NOT NULL,
+            flag_id      TEXT NOT NULL,
+            captured_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(team_name, flag_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS hint_purchases (
+            id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_name    TEXT NOT NULL,
+            hint_id      INTEGER NOT NULL,
+            purchased_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(team_name, hint_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS name_purchases (
+            id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_name    TEXT NOT NULL,
+            flag_id      TEXT NOT NULL,
+            purchased_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(team_name, flag_id)
+        )
+    """)
+
+
+def _migration_2(conn):
+    """Integer team_id foreign keys, epoch-ms timestamps, covering indexes.
+
+    Child tables reference teams(id) with ON DELETE CASCADE, and event times
+    become integer Unix milliseconds. Rows whose team_name no longer matches
+    a team are dropped.
+    """
+    conn.execute(f"""
+        CREATE TABLE submissions_new (
+            id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_id      INTEGER NOT NULL REFERENCES teams(id) ON DELETE CASCADE,
+            flag_id      TEXT NOT NULL,
+            captured_ms  INTEGER NOT NULL DEFAULT ({_SQL_NOW_MS}),
+            UNIQUE(team_id, flag_id)
+        )
+    """)
+    conn.execute(f"""
+        INSERT INTO submissions_new (id, team_id, flag_id, captured_ms)
+        SELECT s.id, t.id, s.flag_id, {_sql_ts_to_ms('s.captured_at')}
+          FROM submissions s JOIN teams t ON t.name = s.team_name
+    """)
+    conn.execute(f"""
+        CREATE TABLE hint_purchases_new (
+            id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_id      INTEGER NOT NULL REFERENCES teams(id) ON DELETE CASCADE,
+            hint_id      INTEGER NOT NULL,
+            purchased_ms INTEGER NOT NULL DEFAULT ({_SQL_NOW_MS}),
+            UNIQUE(team_id, hint_id)
+        )
+    """)
+    conn.execute(f"""
+        INSERT INTO hint_purchases_new (id, team_id, hint_id, purchased_ms)
+        SELECT h.id, t.id, h.hint_id, {_sql_ts_to_ms('h.purchased_at')}
+          FROM hint_purchases h JOIN teams t ON t.name = h.team_name
+    """)
+    conn.execute(f"""
+        CREATE TABLE name_purchases_new (
+            id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_id      INTEGER NOT NULL REFERENCES teams(id) ON DELETE CASCADE,
+            flag_id      TEXT NOT NULL,
+            purchased_ms INTEGER NOT NULL DEFAULT ({_SQL_NOW_MS}),
+            UNIQUE(team_id, flag_id)
+        )
+    """)
+    conn.execute(f"""
+        INSERT INTO name_purchases_new (id, team_id, flag_id, purchased_ms)
+        SELECT n.id, t.id, n.flag_id, {_sql_ts_to_ms('n.purchased_at')}
+          FROM name_purchases n JOIN teams t ON t.name = n.team_name
+    """)
+    for table in ('submissions', 'hint_purchases', 'name_purchases'):
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    # Per-team lookups are covered by the UNIQUE(team_id, ...) autoindexes.
+    # These cover the time-ordered streams and per-flag capture order.
+    conn.execute('CREATE INDEX ix_submissions_flag_order '
+                 'ON submissions (flag_id, captured_ms, id, team_id)')
+    conn.execute('CREATE INDEX ix_submissions_time '
+                 'ON submissions (captured_ms, id, team_id, flag_id)')
+    conn.execute('CREATE INDEX ix_hint_purchases_time '
+                 'ON hint_purchases (purchased_ms, id, team_id, hint_id)')
+    conn.execute('CREATE INDEX ix_name_purchases_time '
+                 'ON name_purchases (purchased_ms, id, team_id)')
+
+
+def _migration_3(conn):
+    """Docker host each team is placed on (NULL = the first host)."""
+    conn.execute('ALTER TABLE teams ADD COLUMN host TEXT')
+
+
+def _migration_4(conn):
+    """team_log: a row per insert, update or delete on teams, written by triggers.
+
+    Processes follow each other's team changes (and challenge/scripts/*.sh)
+    by reading it from the last id they saw.
+    """
+    conn.execute(f"""
+        CREATE TABLE team_log (
+            id     INTEGER PRIMARY KEY AUTOINCREMENT,
+            team   TEXT NOT NULL,
+            at_ms  INTEGER NOT NULL DEFAULT ({_SQL_NOW_MS})
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER team_log_insert AFTER INSERT ON teams
+        BEGIN INSERT INTO team_log (team) VALUES (NEW.name); END
+    """)
+    conn.execute("""
+        CREATE TRIGGER team_log_update AFTER UPDATE ON teams
+        BEGIN
+            INSERT INTO team_log (team) VALUES (NEW.name);
+            INSERT INTO team_log (team) SELECT OLD.name WHERE OLD.name <> NEW.name;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER team_log_delete AFTER DELETE ON teams
+        BEGIN INSERT INTO team_log (team) VALUES (OLD.name); END
+    """)
+
+
+# Forward-only schema migrations, applied in order at startup. The index + 1
+# is the schema version stored in PRAGMA user_version; append, never edit.
+MIGRATIONS = [
+    _migration_1,
+    _migration_2,
+    _migration_3,
+    _migration_4,
+]
+
+
 def init_db():
+    """Create the database if needed and apply any pending migrations."""
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS teams (
-                id            INTEGER PRIMARY KEY AUTOINCREMENT,
-                name          TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                port          INTEGER UNIQUE NOT NULL,
-                created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status        TEXT DEFAULT 'starting'
-            )
-        """)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS submissions (
-                id           INTEGER PRIMARY KEY AUTOINCREMENT,
-                team_name    TEXT NOT NULL,
-                flag_id      TEXT NOT NULL,
-                captured_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(team_name, flag_id)
-            )
-        """)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS hint_purchases (
-                id           INTEGER PRIMARY KEY AUTOINCREMENT,
-                team_name    TEXT NOT NULL,
-                hint_id      INTEGER NOT NULL,
-                purchased_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(team_name, hint_id)
-            )
-        """)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS name_purchases (
-                id           INTEGER PRIMARY KEY AUTOINCREMENT,
-                team_name    TEXT NOT NULL,
-                flag_id      TEXT NOT NULL,
-                purchased_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(team_name, flag_id)
-            )
-        """)
-        conn.commit()
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    try:
+        # journal_mode is persistent in the database file, so set it either way
+        conn.execute(f"PRAGMA journal_mode = {'WAL' if DB_POOL else 'DELETE'}")
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            logging.info('Applying schema migration %d: %s', number,
+                         migration.__doc__.splitlines()[0])
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                migration(conn)
+                problems = conn.execute('PRAGMA foreign_key_check').fetchall()
+                if problems:
+                    raise RuntimeError(f'migration {number} left dangling foreign keys: {problems}')
+                conn.execute(f'PRAGMA user_version = {number}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+    finally:
+        conn.close()
+
+
+def _is_busy(exc: sqlite3.OperationalError) -> bool:
+    return 'locked' in str(exc) or 'busy' in str(exc)
+
+
+class _Connection(sqlite3.Connection):
+    """Connection that retries statements still hitting SQLITE_BUSY after
+    busy_timeout, with exponential backoff (50 ms, 100 ms, 200 ms, ...)."""
+
+    statements = 0      # execute() calls, for the metrics
+
+    def _retry(self, fn, *args):
+        for attempt in range(DB_BUSY_RETRIES):
+            try:
+                return fn(*args)
+            except sqlite3.OperationalError as exc:
+                if not _is_busy(exc) or attempt == DB_BUSY_RETRIES - 1:
+                    raise
+                logging.warning('SQLite busy (attempt %d): %s', attempt + 1, exc)
+                time.sleep(0.05 * 2 ** attempt)
+
+    def execute(self, sql, params=()):
+        self.statements += 1
+        trace = _trace_local.statements
+        if trace is None:
+            return self._retry(super().execute, sql, params)
+        # Timed up to the first row; fetching the rest is the caller's
+        start = time.perf_counter()
+        try:
+            return self._retry(super().execute, sql, params)
+        finally:
+            # The helper running the statement, and what called it
+            inner = sys._getframe(1)
+            outer = inner.f_back
+            trace.append((' '.join(sql.split())[:300],
+                          round((time.perf_counter() - start) * 1000, 3),
+                          f'{outer.f_code.co_qualname}:{outer.f_lineno} > '
+                          f'{inner.f_code.co_qualname}:{inner.f_lineno}'))
+
+    def commit(self):
+        return self._retry(super().commit)
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, factory=_Connection, check_same_thread=False,
+                           cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA synchronous = NORMAL')     # durable enough under WAL
+    conn.execute('PRAGMA cache_size = -16000')      # 16 MB page cache
+    conn.execute('PRAGMA mmap_size = 67108864')     # 64 MB memory-mapped reads
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+
+class _ConnectionPool:
+    """LIFO pool of tuned connections. A thread checks one out for the
+    duration of its outermost get_db() block; nested blocks reuse it."""
+
+    def __init__(self, size: int):
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return _connect()
+
+    def release(self, conn: sqlite3.Connection):
+        # Never hand an open transaction to the next borrower
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+_db_pool  = _ConnectionPool(DB_POOL_SIZE)
+_db_local = threading.local()
 
 
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    if not DB_POOL:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA foreign_keys = ON')
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    conn = getattr(_db_local, 'conn', None)
+    if conn is not None:
+        yield conn
+        return
+    conn = _db_local.conn = _db_pool.acquire()
+    if METRICS:
+        # Frame 1 is contextlib's __enter__; 2 is the function opening the block
+        helper = sys._getframe(2).f_code.co_qualname
+        start, count = time.perf_counter(), conn.statements
     try:
         yield conn
     finally:
-        conn.close()
+        _db_local.conn = None
+        if METRICS:
+            db_seconds.observe(time.perf_counter() - start, helper)
+            db_statements.inc(helper, amount=conn.statements - count)
+        _db_pool.release(conn)
 
 
 def get_team_by_name(name: str):
@@ -212,98 +858,121 @@ def get_all_teams():
         return [dict(r) for r in rows]
 
 
-def set_team_status(name: str, status: str):
+def get_teams_page(column: str, descending: bool, offset: int, limit: int) -> tuple:
+    """(number of teams, one page of them ordered by `column`, a trusted column name)."""
+    order = 'DESC' if descending else 'ASC'
+    ties  = '' if column == 'id' else f', id {order}'
     with get_db() as db:
-        db.execute('UPDATE teams SET status = ? WHERE name = ?', (status, name))
-        db.commit()
+        total = db.execute('SELECT COUNT(*) FROM teams').fetchone()[0]
+        rows  = db.execute(f'SELECT * FROM teams ORDER BY {column} {order}{ties} '
+                           'LIMIT ? OFFSET ?', (limit, offset)).fetchall()
+        return total, [dict(r) for r in rows]
 
 
-def next_free_port() -> int:
+def get_teams_named(names: list) -> list:
+    """The rows of the named teams, in the order given."""
     with get_db() as db:
-        used = {r[0] for r in db.execute('SELECT port FROM teams').fetchall()}
-    port = PORT_RANGE_START
-    while port in used:
-        port += 1
-    return port
+        rows = db.execute('SELECT * FROM teams WHERE name IN (SELECT value FROM json_each(?))',
+                          (json.dumps(names),)).fetchall()
+    found = {r['name']: dict(r) for r in rows}
+    return [found[n] for n in names if n in found]
 
 
-def get_team_submissions(team_name: str) -> set:
-    """Return the set of flag_ids already captured by this team."""
+def set_team_status(name: str, status: str):
     with get_db() as db:
-        rows = db.execute(
-            'SELECT flag_id FROM submissions WHERE team_name = ?', (team_name,)
-        ).fetchall()
-    return {r['flag_id'] for r in rows}
+        db.execute('UPDATE teams SET status = ? WHERE name = ?', (status, name))
+        db.commit()
+    sync_db_changes()
+
 
+def record_submission(team_name: str, flag_id: str):
+    """Insert a submission and return its 1-indexed capture position.
 
-def record_submission(team_name: str, flag_id: str) -> bool:
-    """Insert a submission. Returns True on success, False if already captured."""
+    None if already captured. The score engine applies submissions in row
+    id order, so positions match the order rows land in the table even
+    when several processes insert at once.
+    """
     try:
         with get_db() as db:
-            db.execute(
-                'INSERT INTO submissions (team_name, flag_id) VALUES (?, ?)',
-                (team_name, flag_id)
-            )
+            db.execute('INSERT INTO submissions (team_id, flag_id) '
+                       'VALUES ((SELECT id FROM teams WHERE name = ?), ?)',
+                       (team_name, flag_id))
             db.commit()
-        return True
     except sqlite3.IntegrityError:
-        return False
+        return None
+    sync_db_changes()
+    standing = scores.team(team_name)
+    return standing and standing['flag_positions'].get(flag_id)
 
 
-def get_capture_order() -> dict:
-    """Return {flag_id: [team_name, ...]} ordered by capture time (earliest first)."""
-    with get_db() as db:
-        rows = db.execute(
-            'SELECT flag_id, team_name FROM submissions ORDER BY captured_at, id'
-        ).fetchall()
-    order: dict = defaultdict(list)
-    for r in rows:
-        order[r['flag_id']].append(r['team_name'])
-    return dict(order)
+class TeamState:
+    """Everything the team-facing routes need about one team, loaded together.
 
+    team      — the teams row as a dict
+    captured  — flag_ids captured
+    hints     — hint ids purchased
+    revealed  — flag_ids whose challenge names were purchased
+    """
 
-def get_revealed_names(team_name: str) -> set:
-    """Return the set of flag IDs whose names have been purchased by this team."""
-    with get_db() as db:
-        rows = db.execute(
-            'SELECT flag_id FROM name_purchases WHERE team_name = ?', (team_name,)
-        ).fetchall()
-    return {r['flag_id'] for r in rows}
+    __slots__ = ('team', 'captured', 'hints', 'revealed')
 
+    def __init__(self, team: dict, captured: set, hints: set, revealed: set):
+        self.team     = team
+        self.captured = captured
+        self.hints    = hints
+        self.revealed = revealed
 
-def get_all_name_reveal_costs() -> dict:
-    """Return {team_name: total_name_reveal_cost} for all teams (single query)."""
-    with get_db() as db:
-        rows = db.execute(
-            'SELECT team_name, COUNT(*) as cnt FROM name_purchases GROUP BY team_name'
-        ).fetchall()
-    return {r['team_name']: r['cnt'] * FLAG_NAME_COST for r in rows}
+    @property
+    def hint_cost(self) -> int:
+        costs = catalog.hint_costs
+        return sum(costs.get(h, 0) for h in self.hints)
 
 
-def get_purchased_hints(team_name: str) -> set:
-    """Return the set of hint IDs already purchased by this team."""
-    with get_db() as db:
-        rows = db.execute(
-            'SELECT hint_id FROM hint_purchases WHERE team_name = ?', (team_name,)
-        ).fetchall()
-    return {r['hint_id'] for r in rows}
+# {team_name: TeamState} — dropped by invalidate_team_state() after any write
+# that touches the team (its own submissions/purchases, status, admin actions).
+_team_states: dict = {}
+# {team_name: int} — bumped on invalidation so a load that raced a write is
+# not cached with pre-write data. Only invalidation adds keys: lookups of
+# names that are not teams must not grow it.
+_team_state_gen: dict = {}
 
 
-def get_hint_cost(team_name: str) -> int:
-    """Total points deducted for hints purchased by this team."""
-    purchased = get_purchased_hints(team_name)
-    return sum(h['cost'] for h in HINTS if h['id'] in purchased)
+def _split_ids(csv, cast=str) -> set:
+    return {cast(v) for v in csv.split(',')} if csv else set()
 
 
-def get_all_hint_costs() -> dict:
-    """Return {team_name: total_hint_cost} for all teams (single query)."""
+def get_team_state(name: str):
+    """Return the cached TeamState for a team, loading it in one query. None if missing."""
+    state = _team_states.get(name)
+    if state is not None:
+        return state
+    gen = _team_state_gen.get(name, 0)
     with get_db() as db:
-        rows = db.execute('SELECT team_name, hint_id FROM hint_purchases').fetchall()
-    costs: dict = defaultdict(int)
-    hint_map = {h['id']: h['cost'] for h in HINTS}
-    for r in rows:
-        costs[r['team_name']] += hint_map.get(r['hint_id'], 0)
-    return dict(costs)
+        row = db.execute("""
+            SELECT t.*,
+                   (SELECT group_concat(flag_id) FROM submissions    WHERE team_id = t.id) AS _captured,
+                   (SELECT group_concat(hint_id) FROM hint_purchases WHERE team_id = t.id) AS _hints,
+                   (SELECT group_concat(flag_id) FROM name_purchases WHERE team_id = t.id) AS _revealed
+              FROM teams t
+             WHERE t.name = ?
+        """, (name,)).fetchone()
+    if row is None:
+        return None
+    team = dict(row)
+    state = TeamState(
+        team,
+        _split_ids(team.pop('_captured')),
+        _split_ids(team.pop('_hints'), int),
+        _split_ids(team.pop('_revealed')),
+    )
+    if _team_state_gen.get(name, 0) == gen:
+        _team_states[name] = state
+    return state
+
+
+def invalidate_team_state(name: str):
+    _team_state_gen[name] = _team_state_gen.get(name, 0) + 1
+    _team_states.pop(name, None)
 
 
 def _flag_points(base: int, fb_mult: float, position: int) -> int:
@@ -319,162 +988,1699 @@ def _flag_points(base: int, fb_mult: float, position: int) -> int:
     return max(1, base - (position - 3))
 
 
-def _calc_score(team_name: str, flag_ids: set, capture_order: dict, hint_cost: int = 0) -> int:
-    """Sum positional points for captured flags, subtract hint and name-reveal costs.
-    Score can go negative if deductions exceed points earned."""
-    score = 0
-    for f in FLAGS:
-        if f['id'] in flag_ids:
-            order    = capture_order.get(f['id'], [])
-            position = order.index(team_name) + 1 if team_name in order else len(order) + 1
-            score   += _flag_points(f['points'], f['fb_multiplier'], position)
-    return score - hint_cost
-
-
 def get_scoreboard() -> list:
     """Return all teams ranked by score desc, last capture asc."""
-    capture_order = get_capture_order()
-    hint_costs    = get_all_hint_costs()
-    name_costs    = get_all_name_reveal_costs()
-    with get_db() as db:
-        team_rows = db.execute('SELECT name, status FROM teams ORDER BY name').fetchall()
-        sub_rows  = db.execute(
-            'SELECT team_name, flag_id, captured_at FROM submissions'
-        ).fetchall()
-
-    subs: dict = defaultdict(list)
-    for s in sub_rows:
-        subs[s['team_name']].append(s)
-
-    board = []
-    for t in team_rows:
-        team_subs    = subs[t['name']]
-        flag_ids     = {s['flag_id'] for s in team_subs}
-        last_cap_utc = max((s['captured_at'] for s in team_subs), default=None)
-        hcost        = hint_costs.get(t['name'], 0) + name_costs.get(t['name'], 0)
-        score        = _calc_score(t['name'], flag_ids, capture_order, hcost)
-        # Position per flag (1-indexed)
-        flag_positions = {
-            fid: capture_order[fid].index(t['name']) + 1
-            for fid in flag_ids
-            if t['name'] in capture_order.get(fid, [])
+    return scores.scoreboard()
+
+# ---------------------------------------------------------------------------
+# Scoring engine
+# ---------------------------------------------------------------------------
+
+# The score event streams, each time-ordered, from row id ? on. Ids come from
+# AUTOINCREMENT, so they only grow and a stream can be followed by its last id.
+_EVENT_SQL = {
+    'submissions':
+        'SELECT s.id, t.name AS team_name, s.flag_id, s.captured_ms AS ts '
+        'FROM submissions s JOIN teams t ON t.id = s.team_id '
+        'WHERE s.id > ? ORDER BY s.captured_ms, s.id',
+    'hint_purchases':
+        'SELECT h.id, t.name AS team_name, h.hint_id, h.purchased_ms AS ts '
+        'FROM hint_purchases h JOIN teams t ON t.id = h.team_id '
+        'WHERE h.id > ? ORDER BY h.purchased_ms, h.id',
+    'name_purchases':
+        'SELECT n.id, t.name AS team_name, n.purchased_ms AS ts '
+        'FROM name_purchases n JOIN teams t ON t.id = n.team_id '
+        'WHERE n.id > ? ORDER BY n.purchased_ms, n.id',
+}
+
+
+class ScoreEngine:
+    """In-memory, incrementally maintained view of every team's score.
+
+    Loaded once from SQLite at startup, then follows the tables: sync()
+    applies the rows committed since, by this process or any other, in
+    O(new rows). The SQLite tables stay the source of truth; writers commit
+    and then call sync(), and load() rebuilds the whole state in one merged,
+    time-ordered pass.
+
+    Per team:  {'status', 'created_ms', 'flags': {flag_id: position}, 'points',
+                'deduct', 'last_capture_ms', 'last_capture', 'series': [{'x', 'y'}]}
+    Per flag:  list of team names in capture order (earliest first)
+
+    `series` is the score-over-time graph for the team: one point at
+    registration plus one per event, appended as events arrive.
+    """
+
+    def __init__(self):
+        self.lock   = threading.RLock()
+        self._cond  = threading.Condition(self.lock)
+        self._teams: dict = {}
+        self._order: dict = {}
+        self._cat   = None      # catalog the current scores were computed with
+        self._board = None      # cached ranking, dropped on every mutation
+        self.version = 0        # bumped on every mutation; keys rendered snapshots
+        self._y_min = 0
+        self._y_max = 0
+        self._conn  = None      # own connection, so PRAGMA data_version sees every writer
+        self._data_version = None
+        self._marks: dict  = {}     # table -> last row id applied
+
+    def load(self):
+        """(Re)build all state from the SQLite tables.
+
+        Holds the lock throughout, so no sync() can interleave with the rebuild.
+        """
+        with self.lock:
+            self._load()
+
+    def _read(self, sql: str, *params) -> list:
+        if self._conn is None:
+            self._conn = _connect()
+        return self._conn.execute(sql, params).fetchall()
+
+    @contextmanager
+    def _snapshot(self):
+        """One read transaction, so every query sees the same commits."""
+        self._data_version = self._read('PRAGMA data_version')[0][0]
+        self._conn.execute('BEGIN')
+        try:
+            yield
+        finally:
+            self._conn.rollback()
+
+    def _load(self):
+        with self._snapshot():
+            team_rows = self._read('SELECT name, status, created_at FROM teams')
+            streams   = {table: self._read(sql, 0) for table, sql in _EVENT_SQL.items()}
+            log_mark  = self._read('SELECT COALESCE(MAX(id), 0) FROM team_log')[0][0]
+        cat = catalog
+        self._cat   = cat
+        self._teams = {}
+        self._order = {fid: [] for fid in cat.flag_by_id}
+        self._y_min = self._y_max = 0
+        self._marks = {table: 0 for table in _EVENT_SQL}
+        self._marks['team_log'] = log_mark
+        for t in team_rows:
+            self._add(t['name'], t['status'], _ts_to_ms(t['created_at']))
+        self._apply(streams)
+        self._changed()
+        logging.info('Score engine loaded: %d teams, %d captures',
+                     len(team_rows), len(streams['submissions']))
+
+    def sync(self) -> set:
+        """Apply rows committed since the last load or sync, by any process.
+
+        Captures and purchases are followed by row id; new, changed and
+        deleted teams through team_log. Costs one PRAGMA when nothing was
+        committed. Returns the names of the teams touched.
+        """
+        with self.lock:
+            if self._conn is not None and \
+                    self._read('PRAGMA data_version')[0][0] == self._data_version:
+                return set()
+            with self._snapshot():
+                streams = {table: self._read(sql, self._marks[table])
+                           for table, sql in _EVENT_SQL.items()}
+                log     = self._read('SELECT id, team FROM team_log WHERE id > ?',
+                                     self._marks['team_log'])
+                names   = {r['team'] for r in log}
+                rows    = {r['name']: r for r in self._read(
+                    'SELECT name, status, created_at FROM teams '
+                    'WHERE name IN (SELECT value FROM json_each(?))',
+                    json.dumps(sorted(names)))} if names else {}
+            if log:
+                self._marks['team_log'] = log[-1]['id']
+            for name in names:
+                row, t = rows.get(name), self._teams.get(name)
+                created_ms = _ts_to_ms(row['created_at']) if row else None
+                if t is not None and (row is None or t['created_ms'] != created_ms):
+                    # Deleted (or deleted and registered again): later capture
+                    # positions shift, and SQLite may reuse the deleted rows'
+                    # ids, so start over. Admin-only and rare.
+                    self._load()
+                    return names | set(self._teams)
+                if row is None:
+                    continue
+                if t is None:
+                    self._add(name, row['status'], created_ms)
+                else:
+                    t['status'] = row['status']
+            names |= self._apply(streams)
+            if names:
+                self._changed()
+            return names
+
+    def _apply(self, streams: dict) -> set:
+        """Apply new rows of the event streams in time order; return their teams.
+
+        Each stream is already time-ordered; merging keeps ties in
+        capture → hint → name order.
+        """
+        cat    = self._cat
+        events = heapq.merge(
+            *([(table, r) for r in rows] for table, rows in streams.items()),
+            key=lambda e: e[1]['ts'],
+        )
+        touched = set()
+        for table, r in events:
+            self._marks[table] = max(self._marks[table], r['id'])
+            if r['team_name'] not in self._teams:
+                continue
+            touched.add(r['team_name'])
+            if table == 'submissions':
+                if r['flag_id'] in cat.flag_by_id:
+                    self._capture(r['team_name'], r['flag_id'], r['ts'])
+            elif table == 'hint_purchases':
+                self._deduct(r['team_name'], cat.hint_costs.get(r['hint_id'], 0), r['ts'])
+            else:
+                self._deduct(r['team_name'], cat.flag_name_cost, r['ts'])
+        return touched
+
+    # -- mutations (applied from committed SQLite rows) ---------------------
+
+    def _changed(self):
+        self._board   = None
+        self.version += 1
+        self._cond.notify_all()
+
+    def _add(self, name: str, status: str, created_ms: int):
+        self._teams[name] = {
+            'status': status, 'created_ms': created_ms,
+            'flags': {}, 'points': 0, 'deduct': 0,
+            'last_capture_ms': None, 'last_capture': None, 'series': [],
         }
-        board.append({
-            'name':         t['name'],
-            'status':       t['status'],
-            'score':        score,
-            'flag_ids':      flag_ids,
-            'flag_positions': flag_positions,
-            'last_capture':  _ts_to_est(last_cap_utc) if last_cap_utc else None,
-            '_sort_key':     last_cap_utc or '9999-99-99',
-        })
 
-    board.sort(key=lambda r: (-r['score'], r['_sort_key']))
-    return board
+    def _point(self, t: dict, ms: int):
+        if not t['series']:
+            t['series'].append({'x': t['created_ms'], 'y': 0})
+        y = t['points'] - t['deduct']
+        t['series'].append({'x': ms, 'y': y})
+        self._y_min = min(self._y_min, y)
+        self._y_max = max(self._y_max, y)
+
+    def _capture(self, team_name: str, flag_id: str, ms: int) -> int:
+        order    = self._order[flag_id]
+        order.append(team_name)
+        position = len(order)
+        flag     = self._cat.flag_by_id[flag_id]
+        t        = self._teams[team_name]
+        t['flags'][flag_id] = position
+        t['points']        += _flag_points(flag['points'], flag['fb_multiplier'], position)
+        if t['last_capture_ms'] is None or ms > t['last_capture_ms']:
+            t['last_capture_ms'] = ms
+            t['last_capture']    = _ms_to_est(ms)
+        self._point(t, ms)
+        return position
+
+    def _deduct(self, team_name: str, cost: int, ms: int):
+        t = self._teams[team_name]
+        t['deduct'] += cost
+        self._point(t, ms)
+
+    # -- reads --------------------------------------------------------------
+
+    def team(self, name: str):
+        """Return {'score', 'flag_positions', 'deduct', 'status'} for one team, or None."""
+        with self.lock:
+            t = self._teams.get(name)
+            if t is None:
+                return None
+            return {
+                'score':          t['points'] - t['deduct'],
+                'flag_positions': dict(t['flags']),
+                'deduct':         t['deduct'],
+                'status':         t['status'],
+            }
+
+    def position(self) -> tuple:
+        """Where the engine is in the database's history, comparable across processes.
+
+        The last row id applied of each event stream and of team_log, plus
+        the catalog's mtime in ms. Processes that have applied the same
+        commits are at the same position, and every component only grows
+        (a team deletion reloads, but also appends to team_log).
+        """
+        with self.lock:
+            return (*(self._marks.get(t, 0) for t in (*_EVENT_SQL, 'team_log')),
+                    int(self._cat.mtime * 1000) if self._cat else 0)
+
+    def status_counts(self) -> dict:
+        """{status: number of teams}"""
+        with self.lock:
+            counts = defaultdict(int)
+            for t in self._teams.values():
+                counts[t['status']] += 1
+            return dict(counts)
+
+    def wait_changed(self, version: int, timeout: float) -> int:
+        """Block until the version differs from `version` (or timeout); return it."""
+        with self.lock:
+            self._cond.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def series(self, name: str, start: int = 0) -> list:
+        """One team's graph points from index `start` on."""
+        with self.lock:
+            t = self._teams.get(name)
+            return list(t['series'][start:]) if t else []
+
+    def capture_order(self) -> dict:
+        """Return {flag_id: [team_name, ...]} ordered by capture (earliest first)."""
+        with self.lock:
+            return {fid: list(order) for fid, order in self._order.items() if order}
+
+    def scoreboard(self) -> list:
+        """Return all teams ranked by score desc, last capture asc."""
+        with self.lock:
+            if self._board is None:
+                board = []
+                for name in sorted(self._teams):
+                    t = self._teams[name]
+                    board.append({
+                        'name':           name,
+                        'status':         t['status'],
+                        'score':          t['points'] - t['deduct'],
+                        'flag_ids':       set(t['flags']),
+                        'flag_positions': dict(t['flags']),
+                        'last_capture':   t['last_capture'],
+                        '_sort_key':      t['last_capture_ms'] or float('inf'),
+                    })
+                board.sort(key=lambda r: (-r['score'], r['_sort_key']))
+                self._board = board
+            return self._board
+
+    def timeline(self) -> tuple:
+        """Return (graph_data, graph_min, graph_max) for the score-over-time chart.
+
+        graph_data is {team_name: [{'x': unix_ms, 'y': score}, ...]} for every
+        team with at least one event.
+        """
+        with self.lock:
+            graph_data = {name: list(t['series'])
+                          for name, t in self._teams.items() if t['series']}
+            if not graph_data:
+                return {}, 0, 100
+            return graph_data, self._y_min, self._y_max
+
+
+scores = ScoreEngine()
+
+# How often each process pulls in database changes made by the others (and
+# by challenge/scripts/*.sh) when it has no writes of its own to sync after
+DB_SYNC_SECONDS       = 0.5
+# team_log rows older than this are pruned; every process reads far more often
+TEAM_LOG_KEEP_SECONDS = 3600
+
+
+def sync_db_changes():
+    """Apply committed writes to the score engine and drop stale team states.
+
+    Writers call this right after committing, so their own change is visible
+    at once; the sync thread and (with WORKERS) each request catch the rest.
+    """
+    for name in scores.sync():
+        invalidate_team_state(name)
+
+
+def _sync_loop():
+    pruned = time.time()
+    while True:
+        time.sleep(DB_SYNC_SECONDS)
+        try:
+            sync_db_changes()
+            if MANAGER_ROLE != 'web' and time.time() - pruned > TEAM_LOG_KEEP_SECONDS / 4:
+                pruned = time.time()
+                with get_db() as db:
+                    db.execute('DELETE FROM team_log WHERE at_ms < ?',
+                               (int((pruned - TEAM_LOG_KEEP_SECONDS) * 1000),))
+                    db.commit()
+        except (sqlite3.Error, OSError):
+            logging.exception('Database sync failed')
+
+# ---------------------------------------------------------------------------
+# Scoreboard snapshot cache
+# ---------------------------------------------------------------------------
+
+# {key: {'version', 'etag', 'body', 'gzip'}} — one rendered body per key,
+# rebuilt only when the score engine's version moves on. Between score
+# changes a scoreboard hit is a dictionary lookup plus a version compare.
+_snapshots: dict = {}
+# ETags and live-update event ids are the score engine's position(), which
+# every worker process computes alike from the database. The epoch, shared
+# by all processes of one manager run (gunicorn.conf.py sets it before the
+# workers start), keeps an id from before a restart on a new database from
+# matching.
+_snapshot_epoch = os.environ.setdefault('MANAGER_EPOCH', os.urandom(4).hex())
+
+
+def _position_id(position: tuple) -> str:
+    return f'{_snapshot_epoch}-{".".join(map(str, position))}'
+
+
+def _parse_position_id(eid: str):
+    """The position in an id made by _position_id, or None if from another run."""
+    epoch, _, pos = eid.rpartition('-')
+    parts = pos.split('.')
+    if epoch != _snapshot_epoch or not all(p.isdigit() for p in parts):
+        return None
+    return tuple(map(int, parts))
+
+
+def _covered(position: tuple, seen: tuple) -> bool:
+    """True if everything applied at `position` was already applied at `seen`."""
+    return len(position) == len(seen) and all(a <= b for a, b in zip(position, seen))
+
+
+def _snapshot_response(key: str, build, mimetype: str):
+    """Serve the cached snapshot for `key`, rebuilding it if the scores changed.
+
+    Honours If-None-Match (304) and serves the precompressed body to clients
+    that accept gzip. The two encodings are different representations, so
+    each has its own strong ETag (the gzip one ends in -gz).
+    """
+    snap = _snapshots.get(key)
+    if snap is None or snap['version'] != scores.version:
+        # Render under the lock so the body is exactly the state the tag names
+        with scores.lock:
+            version, position = scores.version, scores.position()
+            body = build().encode()
+        snap = {
+            'version': version,
+            'etag':    f'{key}-{_position_id(position)}',
+            'body':    body,
+            'gzip':    gzip.compress(body, compresslevel=6, mtime=0),
+        }
+        _snapshots[key] = snap
+
+    packed = 'gzip' in request.accept_encodings
+    etag   = snap['etag'] + '-gz' if packed else snap['etag']
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    elif packed:
+        resp = app.response_class(snap['gzip'], mimetype=mimetype)
+        resp.headers['Content-Encoding'] = 'gzip'
+    else:
+        resp = app.response_class(snap['body'], mimetype=mimetype)
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.vary.add('Accept-Encoding')
+    return resp
+
+# ---------------------------------------------------------------------------
+# Live updates (Server-Sent Events)
+# ---------------------------------------------------------------------------
+
+# Push scoreboard deltas and instance status changes to open pages instead of
+# having them reload (0 = off; pages fall back to refreshing)
+LIVE_UPDATES           = os.environ.get('LIVE_UPDATES', '1') != '0'
+# Open event streams served at once; later ones get 503 and fall back
+LIVE_MAX_CLIENTS       = int(os.environ.get('LIVE_MAX_CLIENTS', '2000'))
+# Comment line sent on idle streams so proxies keep them open and dead
+# clients are noticed
+LIVE_KEEPALIVE_SECONDS = float(os.environ.get('LIVE_KEEPALIVE_SECONDS', '15'))
+# Let a burst of score changes settle into one delta
+LIVE_COALESCE_SECONDS  = 0.25
+# Events kept for clients resuming with Last-Event-ID
+LIVE_BACKLOG           = 512
+
+
+class LiveFeed:
+    """One publisher fanning score and status deltas out to every open stream.
+
+    A single thread waits for the score engine's version to move, diffs the
+    ranking against what it last published and appends the result to a
+    backlog as ready-to-send bytes. Streams only copy new backlog entries out,
+    so a change costs one diff however many browsers are watching.
+
+    Public events (scoreboard stream): `scoreboard` with the changed rows,
+    bare rank moves, new captures and new graph points, and `reset` when the
+    page has to be reloaded (a team was deleted or the catalog changed).
+    Team events (that team's dashboard stream): `status`. Deltas carry
+    absolute values, so seeing an event twice is harmless.
+
+    Event ids are score engine positions, not per-process counters, so a
+    page rendered by one worker (its `since`) or a reconnect's Last-Event-ID
+    resumes on any other: the stream replays each backlog event that holds
+    changes the client has not seen. Workers diff at their own moments, so
+    a replayed event may repeat some of what the client has.
+    """
+
+    def __init__(self, max_clients: int, keepalive: float):
+        self.enabled     = False
+        self.max_clients = max_clients
+        self.keepalive   = keepalive
+        self.clients     = 0
+        self.published   = 0
+        self._cond       = threading.Condition()
+        self._events     = deque()  # (seq, position, team or None, bytes), at most LIVE_BACKLOG
+        self._seq        = 0        # of the newest event; orders this process's backlog
+        self._floor      = None     # position before the oldest event still in the backlog
+        self._seen: dict = {}       # team -> last published row
+        self._cat        = None
+
+    def start(self):
+        if not LIVE_UPDATES:
+            return
+        self.enabled = True
+        with scores.lock:
+            self._baseline()
+            self._floor = scores.position()
+        threading.Thread(target=self._loop, name='live-feed', daemon=True).start()
+
+    @staticmethod
+    def last_id() -> str:
+        """Id of the scores a page is about to be rendered from, to resume from."""
+        return _position_id(scores.position())
+
+    # -- publishing ---------------------------------------------------------
+
+    def publish(self, kind: str, data: dict, position: tuple, team: str = None):
+        """Queue an event for every public stream, or only `team`'s streams."""
+        with self._cond:
+            self._seq += 1
+            if len(self._events) >= LIVE_BACKLOG:
+                self._floor = self._events.popleft()[1]
+            body = json.dumps(data, separators=(',', ':'))
+            self._events.append((self._seq, position, team,
+                                 f'id: {_position_id(position)}\n'
+                                 f'event: {kind}\ndata: {body}\n\n'.encode()))
+            self.published += 1
+            self._cond.notify_all()
+
+    def _loop(self):
+        version = scores.version
+        while True:
+            if scores.wait_changed(version, 60) == version:
+                continue
+            time.sleep(LIVE_COALESCE_SECONDS)
+            try:
+                version = self._diff()
+            except Exception:
+                logging.exception('Live feed: diffing the scoreboard failed')
+                version = scores.version
+
+    @staticmethod
+    def _row(rank: int, e: dict) -> dict:
+        return {'rank': rank, 'name': e['name'], 'score': e['score'],
+                'flag_positions': e['flag_positions'], 'last_capture': e['last_capture']}
+
+    def _baseline(self) -> int:
+        with scores.lock:
+            self._cat  = catalog
+            self._seen = {e['name']: {**self._row(rank, e), 'status': e['status'],
+                                      'points': len(scores.series(e['name']))}
+                          for rank, e in enumerate(get_scoreboard(), start=1)}
+            return scores.version
+
+    def _diff(self) -> int:
+        """Publish what changed since the last pass; return the version diffed."""
+        with scores.lock:
+            version  = scores.version
+            position = scores.position()
+            board    = get_scoreboard()
+            names    = {e['name'] for e in board}
+            if catalog is not self._cat or self._seen.keys() - names:
+                # Positions and graphs were recomputed from scratch
+                self.publish('reset', {'version': version}, position)
+                seen = dict(self._seen)
+                self._baseline()
+                for name, row in self._seen.items():
+                    if name in seen and seen[name]['status'] != row['status']:
+                        self.publish('status', {'status': row['status']}, position, team=name)
+                return version
+            rows, ranks, captures, points, statuses = [], {}, [], {}, []
+            for rank, e in enumerate(board, start=1):
+                row = self._row(rank, e)
+                old = self._seen.get(e['name'])
+                if old is None or (old['score'], old['flag_positions'], old['last_capture']) \
+                        != (row['score'], row['flag_positions'], row['last_capture']):
+                    rows.append(row)
+                    captures += [{'team': e['name'], 'flag': fid, 'position': pos}
+                                 for fid, pos in row['flag_positions'].items()
+                                 if old is None or fid not in old['flag_positions']]
+                    tail = scores.series(e['name'], old['points'] if old else 0)
+                    if tail:
+                        points[e['name']] = tail
+                elif old['rank'] != rank:
+                    ranks[e['name']] = rank
+                if old is None or old['status'] != e['status']:
+                    statuses.append((e['name'], e['status']))
+                self._seen[e['name']] = {
+                    **row, 'status': e['status'],
+                    'points': (old['points'] if old else 0) + len(points.get(e['name'], ())),
+                }
+        if rows or ranks:
+            self.publish('scoreboard', {'version': version, 'teams': len(board), 'rows': rows,
+                                        'ranks': ranks, 'captures': captures,
+                                        'points': points}, position)
+        for name, status in statuses:
+            self.publish('status', {'status': status}, position, team=name)
+        return version
+
+    # -- streams ------------------------------------------------------------
+
+    def _resume_point(self, seen: tuple) -> int:
+        """Seq after which a stream starts, or None if events it missed are gone."""
+        if not _covered(self._floor, seen):
+            return None
+        for seq, position, _, _ in self._events:
+            if not _covered(position, seen):
+                return seq - 1
+        return self._seq
+
+    def stream(self, since: str, team: str = None):
+        """Generator of SSE bytes for one client: public events, or `team`'s."""
+        with self._cond:
+            seen = _parse_position_id(since) if since else scores.position()
+            last = self._resume_point(seen) if seen else None
+            self.clients += 1
+        try:
+            yield b'retry: 3000\n\n'
+            if last is None:
+                yield b'event: reset\ndata: {}\n\n'
+                return
+            sent = time.monotonic()
+            while True:
+                with self._cond:
+                    if self._seq == last:
+                        self._cond.wait(max(0.1, self.keepalive - (time.monotonic() - sent)))
+                    oldest = self._events[0][0] if self._events else self._seq + 1
+                    if last + 1 < oldest:
+                        # Fell further behind than the backlog reaches
+                        out = [b'event: reset\ndata: {}\n\n']
+                    else:
+                        out = [body for _, position, t, body in
+                               itertools.islice(self._events, last + 1 - oldest, None)
+                               if t == team and not _covered(position, seen)]
+                    last = self._seq
+                if out:
+                    yield b''.join(out)
+                elif time.monotonic() - sent >= self.keepalive:
+                    yield b': keepalive\n\n'
+                else:
+                    continue
+                sent = time.monotonic()
+        finally:
+            with self._cond:
+                self.clients -= 1
+
+    def response(self, since: str, team: str = None):
+        if not self.enabled:
+            return app.response_class(status=204)
+        if self.clients >= self.max_clients:
+            resp = app.response_class('Too many live connections', status=503)
+            resp.headers['Retry-After'] = '60'
+            return resp
+        resp = app.response_class(self.stream(since, team), mimetype='text/event-stream')
+        resp.headers['Cache-Control']     = 'no-cache'
+        resp.headers['X-Accel-Buffering'] = 'no'
+        return resp
+
+    def snapshot(self) -> dict:
+        return {'enabled': self.enabled, 'clients': self.clients, 'published': self.published}
+
+
+live = LiveFeed(LIVE_MAX_CLIENTS, LIVE_KEEPALIVE_SECONDS)
 
 # ---------------------------------------------------------------------------
 # Docker helpers
 # ---------------------------------------------------------------------------
 
+# Drive containers through the Engine API on DOCKER_SOCKET instead of forking
+# the docker CLI. DOCKER_API=0 (or a compose file the API runner can't handle)
+# falls back to `docker compose`.
+DOCKER_API    = os.environ.get('DOCKER_API', '1') != '0'
+DOCKER_SOCKET = os.environ.get('DOCKER_SOCKET', '/var/run/docker.sock')
+# Built-in instance proxy port (0 = off). When on, instances publish no host
+# ports; see "Instance proxy" below.
+PROXY_PORT    = int(os.environ.get('PROXY_PORT', '0'))
+# Docker daemons to place team instances on, comma-separated entries of
+#   name=<endpoint> [host_ip=<address>] [max=<instances>] [tls=<cert dir>]
+# where endpoint is a unix socket path, a unix:// or tcp:// URL, or
+# context:<docker context name>. Empty = DOCKER_SOCKET alone, as "local".
+DOCKER_HOSTS       = os.environ.get('DOCKER_HOSTS', '')
+# Seconds between health checks (ping + memory) of each Docker host
+HOST_CHECK_SECONDS = float(os.environ.get('HOST_CHECK_SECONDS', '15'))
+
+
+def _parse_hosts(spec: str) -> list:
+    """Host dicts (name, endpoint, tls, cli, host_ip, max, local) from DOCKER_HOSTS."""
+    if not spec.strip():
+        return [{'name': 'local', 'endpoint': DOCKER_SOCKET, 'tls': None, 'cli': ['docker'],
+                 'host_ip': HOST_IP, 'max': 0, 'local': True}]
+    found = []
+    for entry in filter(None, (e.strip() for e in spec.split(','))):
+        first, *rest = entry.split()
+        name, _, endpoint = first.partition('=')
+        opts = dict(o.partition('=')[::2] for o in rest)
+        if not re.fullmatch(r'[a-z0-9_-]{1,32}', name) or not endpoint \
+                or any(h['name'] == name for h in found) \
+                or set(opts) - {'host_ip', 'max', 'tls'}:
+            raise ValueError(f'DOCKER_HOSTS: bad entry {entry!r}')
+        tls = opts.get('tls')
+        if endpoint.startswith('context:'):
+            context        = endpoint[len('context:'):]
+            endpoint, ctls = context_endpoint(context)
+            tls            = tls or ctls
+            cli            = ['docker', '--context', context]
+        else:
+            cli = ['docker', '--host', endpoint if '://' in endpoint else f'unix://{endpoint}']
+            if tls:
+                cli += ['--tlsverify', '--tlscacert', os.path.join(tls, 'ca.pem'),
+                        '--tlscert', os.path.join(tls, 'cert.pem'),
+                        '--tlskey', os.path.join(tls, 'key.pem')]
+        remote = endpoint.startswith(('tcp://', 'http://', 'https://'))
+        found.append({
+            'name':     name,
+            'endpoint': endpoint,
+            'tls':      tls,
+            'cli':      cli,
+            # Teams reach a remote daemon's published ports on its own address
+            'host_ip':  opts.get('host_ip') or (
+                endpoint.split('://', 1)[1].rsplit(':', 1)[0] if remote else HOST_IP),
+            'max':      int(opts.get('max', 0)),
+            'local':    not remote,
+        })
+    return found
+
+
+def _load_hosts() -> dict:
+    """{name: host} with a ComposeEngine each, or engine None to use the docker CLI.
+
+    Health, memory and capacity are filled in by the allocator's checks.
+    """
+    model = None
+    if DOCKER_API:
+        try:
+            model = ComposeModel.load(CTF_COMPOSE_FILE, CHALLENGE_DIR or None)
+        except (OSError, ValueError, ImportError) as exc:
+            logging.warning('Docker Engine API disabled, using the docker CLI: %s', exc)
+    found = {}
+    for host in _parse_hosts(DOCKER_HOSTS):
+        host.update(engine=None, subnets=None, healthy=True, error='',
+                    memory_mb=0, capacity=None)
+        if model:
+            # The proxy reaches instances on its own host directly; remote
+            # ones only through their published ports
+            host['engine'] = ComposeEngine(
+                model, DockerClient(host['endpoint'], tls_dir=host['tls']),
+                publish_ports=not (PROXY_PORT and host['local']))
+        found[host['name']] = host
+    if model:
+        logging.info('Docker Engine API on %s: services %s from %s',
+                     ', '.join(f'{h["name"]}={h["endpoint"]}' for h in found.values()),
+                     ', '.join(model.order), CTF_COMPOSE_FILE)
+    return found
+
+
+hosts          = _load_hosts()
+# Teams placed nowhere (rows from before DOCKER_HOSTS) live on the first host,
+# which also runs the warm pool and the shared database
+default_host   = next(iter(hosts.values()))
+compose_engine = default_host['engine']
+
+
+def host_of(team: dict) -> dict:
+    """The Docker host a team row is placed on."""
+    return hosts.get(team.get('host')) or default_host
+
+
+def team_host(team_name: str) -> dict:
+    return host_of(get_team_by_name(team_name) or {})
+
+
+def _project_name(team_name: str) -> str:
+    return f'ctf_{team_name.lower()}'
+
+
 def _compose_env(port: int, team_name: str) -> dict:
     env = {**os.environ, 'PORT': str(port)}
-    for f in FLAGS:
+    for f in catalog.flags:
         env[f['id']] = _team_flag(f['id'], team_name)
     return env
 
 
-def _compose_cmd(team_name: str) -> list:
+def _compose_cmd(team_name: str, host: dict = None) -> list:
     """Build the base `docker compose` command with correct file + project-directory."""
-    cmd = ['docker', 'compose', '-p', f'ctf_{team_name.lower()}', '-f', CTF_COMPOSE_FILE]
+    cmd = (host or default_host)['cli'] + ['compose', '-p', _project_name(team_name),
+                                           '-f', CTF_COMPOSE_FILE]
     if CHALLENGE_DIR:
         cmd += ['--project-directory', CHALLENGE_DIR]
     return cmd
 
 
-# Serialize docker compose up calls — concurrent MySQL inits can deadlock health checks
-_compose_lock = threading.Lock()
+def _docker_timed(op: str):
+    """Record calls of a docker_up/docker_down-like function in the metrics;
+    it returns False when it failed."""
+    def wrap(fn):
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            ok    = fn(*args, **kwargs)
+            docker_seconds.observe(time.perf_counter() - start, op)
+            if ok is False:
+                docker_failures.inc(op)
+            return ok
+        return timed
+    return wrap
+
+
+@_docker_timed('up')
+def docker_up(team_name: str, port: int, instance: str = None) -> bool:
+    """Start CTF containers for a team. Callers go through `orchestrator`.
+    Returns False if that failed (already logged).
+
+    With the Engine API, a team already bound to a warm-pool instance, or
+    handed a freshly claimed `instance`, is attached to it instead of
+    cold-started.
+    """
+    if SHARED_DB:
+        return shared_db_up(team_name, port)
+    host   = team_host(team_name)
+    engine = host['engine']
+    if engine:
+        project = _project_name(team_name)
+        env     = _compose_env(port, team_name)
+        try:
+            bound = instance or engine.project_label(project, POOL_LABEL)
+            if not bound:
+                engine.up(project, env)
+            else:
+                try:
+                    pool.bind(bound, project, env, {f['id']: env[f['id']] for f in catalog.flags})
+                except (DockerError, OSError, ValueError) as exc:
+                    if not instance:
+                        raise
+                    logging.warning('Warm instance %s failed for %s, cold-starting: %s',
+                                    instance, team_name, exc)
+                    engine.down(project)
+                    pool.discard(instance)
+                    bound = None
+                    engine.up(project, env)
+        except (DockerError, OSError, ValueError) as exc:
+            logging.error('docker_up failed for %s (port %s): %s', team_name, port, exc)
+            return False
+        logging.info('docker_up started containers for team %s on %s port %s%s', team_name,
+                     host['name'], port, f' (warm instance {bound})' if bound else '')
+        return True
+    result = subprocess.run(
+        _compose_cmd(team_name, host) + ['up', '-d'],
+        env=_compose_env(port, team_name),
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        logging.error('docker_up failed for %s (port %s):\nSTDOUT: %s\nSTDERR: %s',
+                      team_name, port, result.stdout, result.stderr)
+        return False
+    logging.info('docker_up started containers for team %s on %s port %s',
+                 team_name, host['name'], port)
+    return True
+
+
+@_docker_timed('down')
+def docker_down(team_name: str, port: int, host: dict = None) -> bool:
+    """Stop and wipe CTF containers + volumes for a team. Returns False if
+    that failed.
+
+    Pass `host` when the team row may be gone by the time this runs.
+    """
+    if SHARED_DB:
+        return shared_db_down(team_name, port)
+    host   = host or team_host(team_name)
+    engine = host['engine']
+    if engine:
+        try:
+            project  = _project_name(team_name)
+            instance = engine.project_label(project, POOL_LABEL)
+            engine.down(project)
+            if instance:
+                engine.down(instance)
+        except (DockerError, OSError) as exc:
+            logging.error('docker_down failed for %s: %s', team_name, exc)
+            return False
+        return True
+    result = subprocess.run(
+        _compose_cmd(team_name, host) + ['down', '-v'],
+        env=_compose_env(port, team_name),
+        check=False,
+    )
+    return result.returncode == 0
+
 
+# ---------------------------------------------------------------------------
+# Shared MySQL (one schema per team)
+# ---------------------------------------------------------------------------
 
-def docker_up(team_name: str, port: int):
-    """Start CTF containers for a team (serialized to prevent concurrent init races)."""
-    with _compose_lock:
+# Container name of a MySQL server shared by all teams (the shared-db service
+# in manager/docker-compose.yaml). Set, each team gets a bankingai_<team>
+# schema and user on it instead of its own db container. Empty = off.
+SHARED_DB     = os.environ.get('SHARED_DB', '')
+# bankingai.sql as mounted in the shared container
+SHARED_DB_SQL = os.environ.get('SHARED_DB_SQL', '/srv/bankingai.sql')
+# The service the shared server replaces; also its alias on team networks,
+# so the web container's "db" host name keeps working
+_SHARED_DB_SERVICE = 'db'
+
+# Run as root over the container's local socket. The team user can only read
+# its own schema and log logins, so UNION injection through lookup.php (and
+# information_schema) sees nothing of other teams. A failed import is rolled
+# back so the next docker_up retries it.
+_SHARED_DB_CREATE = r'''
+set -e
+export MYSQL_PWD="$MYSQL_ROOT_PASSWORD"
+if [ -z "$(mysql -uroot -N -e "SELECT 1 FROM information_schema.schemata WHERE schema_name = '$TEAM_DB'")" ]; then
+    sed -e "s/^CREATE DATABASE IF NOT EXISTS \`bankingai\`/CREATE DATABASE \`$TEAM_DB\`/" \
+        -e "s/^USE \`bankingai\`/USE \`$TEAM_DB\`/" "$SQL_FILE" | mysql -uroot \
+        || { mysql -uroot -e "DROP DATABASE IF EXISTS \`$TEAM_DB\`"; exit 1; }
+fi
+mysql -uroot -e "
+    CREATE USER IF NOT EXISTS '$TEAM_USER'@'%' IDENTIFIED BY '$TEAM_PASSWORD';
+    ALTER USER '$TEAM_USER'@'%' IDENTIFIED BY '$TEAM_PASSWORD' WITH MAX_USER_CONNECTIONS 20;
+    GRANT SELECT ON \`$TEAM_DB\`.* TO '$TEAM_USER'@'%';
+    GRANT INSERT ON \`$TEAM_DB\`.login_attempts TO '$TEAM_USER'@'%';
+    UPDATE \`$TEAM_DB\`.users SET username = '$TEAM_FLAG' WHERE id = 22;"
+'''
+
+_SHARED_DB_DROP = r'''
+export MYSQL_PWD="$MYSQL_ROOT_PASSWORD"
+mysql -uroot -e "DROP USER IF EXISTS '$TEAM_USER'@'%'; DROP DATABASE IF EXISTS \`$TEAM_DB\`;"
+'''
+
+
+def _shared_db_account(team_name: str) -> dict:
+    """The team's schema and credentials, as the web container's DB_* variables."""
+    name = team_name.lower()
+    user = f'ctf_{name}'
+    if len(user) > 32:          # MySQL's user name limit
+        user = f'ctf_{name[:19]}_{hashlib.sha256(name.encode()).hexdigest()[:8]}'
+    password = hmac.new(FLAG_SECRET.encode(), f'db:{name}'.encode(),
+                        hashlib.sha256).hexdigest()[:24]
+    return {'DB_NAME': f'bankingai_{name}', 'DB_USER': user, 'DB_PASSWORD': password}
+
+
+def _shared_db_exec(script: str, team_name: str, **extra):
+    """Run a root script in the shared MySQL container for one team's account."""
+    account = _shared_db_account(team_name)
+    env = {'TEAM_DB': account['DB_NAME'], 'TEAM_USER': account['DB_USER'],
+           'TEAM_PASSWORD': account['DB_PASSWORD'], 'SQL_FILE': SHARED_DB_SQL, **extra}
+    cmd = ['sh', '-c', script]
+    if compose_engine:
+        code, out = compose_engine.client.exec(SHARED_DB, cmd, env=env)
+    else:
         result = subprocess.run(
-            _compose_cmd(team_name) + ['up', '-d'],
-            env=_compose_env(port, team_name),
+            ['docker', 'exec'] + [a for k, v in env.items() for a in ('-e', f'{k}={v}')]
+            + [SHARED_DB] + cmd,
             capture_output=True, text=True,
         )
-    if result.returncode != 0:
+        code, out = result.returncode, result.stdout + result.stderr
+    if code != 0:
+        raise DockerError(500, f'{SHARED_DB}: exited with {code}: {out.strip()[-200:]}')
+
+
+def shared_db_up(team_name: str, port: int) -> bool:
+    """docker_up in shared mode: the team's schema, then every service but db."""
+    project = _project_name(team_name)
+    env     = {**_compose_env(port, team_name), **_shared_db_account(team_name)}
+    flag    = env['FLAG_SQL_INJECTION'].replace('\\', '\\\\').replace("'", "''")
+    try:
+        _shared_db_exec(_SHARED_DB_CREATE, team_name, TEAM_FLAG=flag)
+        if compose_engine:
+            compose_engine.attach(project, SHARED_DB, [_SHARED_DB_SERVICE])
+            compose_engine.up(project, env,
+                              services=[s for s in compose_engine.model.order
+                                        if s != _SHARED_DB_SERVICE],
+                              peers={_SHARED_DB_SERVICE: SHARED_DB})
+        else:
+            listed = subprocess.run(_compose_cmd(team_name) + ['config', '--services'],
+                                    env=env, capture_output=True, text=True, check=True)
+            services = [s for s in listed.stdout.split() if s != _SHARED_DB_SERVICE]
+            subprocess.run(_compose_cmd(team_name) + ['up', '-d', '--no-deps'] + services,
+                           env=env, capture_output=True, text=True, check=True)
+            connect = subprocess.run(['docker', 'network', 'connect', '--alias',
+                                      _SHARED_DB_SERVICE, f'{project}_default', SHARED_DB],
+                                     capture_output=True, text=True)
+            if connect.returncode != 0 and 'already exists' not in connect.stderr:
+                raise DockerError(500, connect.stderr.strip())
+    except subprocess.CalledProcessError as exc:
         logging.error('docker_up failed for %s (port %s):\nSTDOUT: %s\nSTDERR: %s',
-                      team_name, port, result.stdout, result.stderr)
+                      team_name, port, exc.stdout, exc.stderr)
+    except (DockerError, OSError, ValueError) as exc:
+        logging.error('docker_up failed for %s (port %s): %s', team_name, port, exc)
     else:
-        logging.info('docker_up started containers for team %s on port %s', team_name, port)
+        logging.info('docker_up started containers for team %s on port %s (schema %s on %s)',
+                     team_name, port, env['DB_NAME'], SHARED_DB)
+        return True
+    return False
 
 
-def docker_down(team_name: str, port: int):
-    """Stop and wipe CTF containers + volumes for a team."""
-    subprocess.run(
-        _compose_cmd(team_name) + ['down', '-v'],
-        env=_compose_env(port, team_name),
-        check=False,
-    )
+def shared_db_down(team_name: str, port: int) -> bool:
+    """docker_down in shared mode: the team's containers, then its schema and user."""
+    project = _project_name(team_name)
+    try:
+        if compose_engine:
+            compose_engine.down(project)        # detaches the shared server too
+        else:
+            subprocess.run(['docker', 'network', 'disconnect', '-f',
+                            f'{project}_default', SHARED_DB], capture_output=True)
+            subprocess.run(_compose_cmd(team_name) + ['down', '-v'],
+                           env=_compose_env(port, team_name), check=False)
+        _shared_db_exec(_SHARED_DB_DROP, team_name)
+    except (DockerError, OSError) as exc:
+        logging.error('docker_down failed for %s: %s', team_name, exc)
+        return False
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Readiness watcher
+# ---------------------------------------------------------------------------
+
+# How long a launched instance may take to come up before it is marked 'error'
+READY_TIMEOUT           = int(os.environ.get('READY_TIMEOUT', '180'))
+# Full reconcile interval when no events arrive (events trigger one at once)
+READY_RECONCILE_SECONDS = float(os.environ.get('READY_RECONCILE_SECONDS', '5'))
+# Let a burst of events settle into a single reconcile pass
+_READY_COALESCE_SECONDS = 0.1
+# Minimum gap between `docker start` fallbacks for a web container stuck in Created
+_READY_KICK_SECONDS     = 10
 
 
-def _web_container_state(team_name: str) -> str:
-    """Return the Docker state of the web container: 'running', 'created', 'exited', or ''."""
-    project = f'ctf_{team_name.lower()}'
+def _web_states() -> tuple:
+    """({team_name: (state, status)} of every CTF web container, names of failed hosts).
+
+    One call per host. state is Docker's lowercase state ('running',
+    'created', 'exited', …); status is the human string, which carries
+    '(healthy)' when the container has a healthcheck. A host that can't
+    be listed is reported as failed (its teams are missing from the
+    states) unless it is the only one, which raises.
+    """
+    out, failed = {}, set()
+    for host in hosts.values():
+        try:
+            out.update(_host_web_states(host))
+        except (DockerError, OSError, RuntimeError, subprocess.SubprocessError):
+            if len(hosts) == 1:
+                raise
+            failed.add(host['name'])
+    return out, failed
+
+
+def _host_web_states(host: dict) -> dict:
+    out = {}
+    if host['engine']:
+        for c in host['engine'].client.list_containers(['com.docker.compose.service=web']):
+            project = (c.get('Labels') or {}).get('com.docker.compose.project', '')
+            if project.startswith('ctf_'):
+                out[project[4:]] = ((c.get('State') or '').lower(), c.get('Status') or '')
+        return out
     result = subprocess.run(
-        ['docker', 'ps', '-a',
-         '--filter', f'name={project}-web',
-         '--format', '{{.State}}'],
+        host['cli'] + ['ps', '-a',
+         '--filter', 'label=com.docker.compose.service=web',
+         '--format', '{{json .}}'],
         capture_output=True, text=True, timeout=10,
     )
-    output = result.stdout.strip().lower()
-    if 'running' in output:
-        return 'running'
-    if 'created' in output:
-        return 'created'
-    if 'exited' in output:
-        return 'exited'
-    return ''
+    if result.returncode != 0:
+        raise RuntimeError(f'docker ps failed: {result.stderr.strip()}')
+    for line in result.stdout.splitlines():
+        try:
+            c = json.loads(line)
+        except ValueError:
+            continue
+        labels  = dict(kv.split('=', 1) for kv in c.get('Labels', '').split(',') if '=' in kv)
+        project = labels.get('com.docker.compose.project', '')
+        if project.startswith('ctf_'):
+            out[project[4:]] = ((c.get('State') or '').lower(), c.get('Status') or '')
+    return out
+
+
+def _docker_events(host: dict):
+    """Yield a host's container events for compose projects until the stream ends."""
+    if host['engine']:
+        yield from host['engine'].client.stream('/events', params={'filters': {
+            'type': ['container'], 'label': ['com.docker.compose.project']}})
+        return
+    proc = subprocess.Popen(
+        host['cli'] + ['events', '--format', '{{json .}}',
+         '--filter', 'type=container', '--filter', 'label=com.docker.compose.project'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    try:
+        for line in proc.stdout:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def _start_web(team_name: str):
+    """`docker start` fallback for a web container compose left in Created."""
+    project = _project_name(team_name)
+    host    = team_host(team_name)
+    if host['engine']:
+        host['engine'].start_service(project, 'web')
+    else:
+        subprocess.run(host['cli'] + ['start', f'{project}-web-1'],
+                       capture_output=True, timeout=15)
 
 
-def _poll_until_ready(team_name: str, port: int, timeout: int = 180):
-    """Background thread: poll via Docker socket until the web container is running.
+class ReadinessWatcher:
+    """Drives teams.status from the docker events stream of each host.
 
-    If the web container is stuck in 'created' state (db health check raced with
-    a concurrent compose up), we start it explicitly rather than waiting for compose.
+    Launch jobs call expect() before `compose up`, launched() after it, and
+    block on the returned Event. Events only wake the reconciler: every
+    decision is made from a single batched listing of web containers, which
+    also covers missed events, timeouts and the Created-state fallback.
+    Teams already up are tracked too, so a web container that dies flips
+    its team to 'error' and back to 'ready' when it runs again.
     """
-    project  = f'ctf_{team_name.lower()}'
-    deadline = time.time() + timeout
-    logging.info('Polling started for team %s (timeout %ss)', team_name, timeout)
-    while time.time() < deadline:
-        try:
-            state = _web_container_state(team_name)
-            if state == 'running':
-                time.sleep(2)
-                set_team_status(team_name, 'ready')
-                logging.info('Team %s is ready', team_name)
+
+    def __init__(self, timeout: int, interval: float):
+        self.timeout    = timeout
+        self.interval   = interval
+        self._lock      = threading.Lock()
+        self._wake      = threading.Event()
+        self._waiting   = {}    # team -> {'done', 'deadline', 'kicked'}
+        self._live      = {}    # team -> status we last set ('ready' / 'error')
+        self._new       = {}    # team -> registration time, during its first launch
+        self._last_err  = None
+        self._started   = False
+        self._down      = {}    # host name -> when listing it first failed, while it fails
+        self._last_pass = time.time()
+
+    def start(self, teams: list):
+        """Begin watching; `teams` (get_all_teams()) resumes tracking after a restart."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for t in teams:
+            if t['status'] == 'starting':
+                # Launch job was lost with the old process; give it a fresh deadline
+                self.expect(t['name'])
+                self.launched(t['name'])
+            elif t['status'] in ('ready', 'error'):
+                self._live[t['name']] = t['status']
+        for host in hosts.values():
+            threading.Thread(target=self._events_loop, args=(host,),
+                             name=f'ready-events-{host["name"]}', daemon=True).start()
+        threading.Thread(target=self._reconcile_loop, name='ready-reconcile', daemon=True).start()
+
+    def expect(self, team_name: str) -> threading.Event:
+        with self._lock:
+            self._live.pop(team_name, None)
+            old = self._waiting.get(team_name)
+            if old:
+                old['done'].set()
+            entry = {'done': threading.Event(), 'deadline': None, 'kicked': 0.0}
+            self._waiting[team_name] = entry
+        return entry['done']
+
+    def registered(self, team_name: str):
+        """A new team's first launch: time its registration to ready."""
+        with self._lock:
+            self._new[team_name] = time.time()
+
+    def launched(self, team_name: str):
+        """compose up has returned — start the readiness clock."""
+        with self._lock:
+            entry = self._waiting.get(team_name)
+            if entry:
+                entry['deadline'] = time.time() + self.timeout
+        self._wake.set()
+
+    def forget(self, team_name: str):
+        """Stop tracking a team (stopped or deleted by an admin)."""
+        with self._lock:
+            self._live.pop(team_name, None)
+            self._new.pop(team_name, None)
+            entry = self._waiting.pop(team_name, None)
+        if entry:
+            entry['done'].set()
+
+    def _events_loop(self, host: dict):
+        delay = 1
+        while True:
+            try:
+                for ev in _docker_events(host):
+                    delay   = 1
+                    action  = (ev.get('Action') or ev.get('status') or '').split(':')[0]
+                    attrs   = (ev.get('Actor') or {}).get('Attributes') or {}
+                    project = attrs.get('com.docker.compose.project', '')
+                    if action not in ('start', 'die', 'health_status') or not project.startswith('ctf_'):
+                        continue
+                    team = project[4:]
+                    with self._lock:
+                        tracked = team in self._waiting or team in self._live
+                        # Up and not being taken down (that forgets the team first)
+                        crashed = action == 'die' and team in self._live
+                    if crashed:
+                        container_stats.crashed(team)
+                    if tracked:
+                        self._wake.set()
+            except Exception as exc:
+                logging.warning('Docker events stream error (%s): %s', host['name'], exc)
+                delay = min(delay * 2, 30)      # host down: don't spin on it
+            # Stream ended: reconnect, and reconcile anything missed meanwhile
+            time.sleep(delay)
+            self._wake.set()
+
+    def _reconcile_loop(self):
+        while True:
+            self._wake.wait(self.interval)
+            time.sleep(_READY_COALESCE_SECONDS)
+            self._wake.clear()
+            try:
+                self.reconcile()
+                self._last_err = None
+            except Exception as exc:
+                if str(exc) != self._last_err:
+                    logging.warning('Readiness reconcile failed: %s', exc)
+                self._last_err = str(exc)
+
+    def reconcile(self):
+        """One pass: list every web container once and apply all transitions."""
+        started = time.time()
+        paused, self._last_pass = started - self._last_pass, started
+        with self._lock:
+            if not self._waiting and not self._live:
                 return
-            elif state == 'created':
-                # Compose left the container in Created — db health check wasn't
-                # done when compose exited. Start the container directly.
-                logging.info('Web container for %s is Created; starting it now', team_name)
-                subprocess.run(
-                    ['docker', 'start', f'{project}-web-1'],
-                    capture_output=True, timeout=15,
-                )
-        except Exception as exc:
-            logging.warning('Poll check error for %s: %s', team_name, exc)
-        time.sleep(5)
-    logging.error('Team %s timed out waiting for web container', team_name)
-    set_team_status(team_name, 'error')
-
-
-def launch_and_poll(team_name: str, port: int):
-    """Start containers then poll in a background thread."""
-    docker_up(team_name, port)
-    t = threading.Thread(target=_poll_until_ready, args=(team_name, port), daemon=True)
-    t.start()
+        states, failed = _web_states()
+        now     = time.time()
+        changes = []
+        kick    = []
+        for name in list(self._down):
+            if name not in failed:
+                del self._down[name]
+        for name in failed:
+            self._down.setdefault(name, now)
+        # A listing that fails for less than a health-check period is a blip:
+        # teams on that host keep their status and their launch deadline
+        blind = {name for name, since in self._down.items() if now - since < HOST_CHECK_SECONDS}
+        placed = {}
+        if blind:
+            with get_db() as db:
+                placed = {r['name']: r['host'] for r in db.execute('SELECT name, host FROM teams')}
+        unseen = lambda team: (hosts.get(placed.get(team)) or default_host)['name'] in blind
+        with self._lock:
+            for team, entry in list(self._waiting.items()):
+                if entry['deadline'] is None:
+                    continue                    # compose up still running
+                if blind and unseen(team):
+                    entry['deadline'] += paused
+                    continue
+                state, status = states.get(team, ('', ''))
+                if state == 'running' and ('(health' not in status or '(healthy)' in status):
+                    new = 'ready'
+                elif now > entry['deadline']:
+                    new = 'error'
+                else:
+                    if state == 'created' and now - entry['kicked'] > _READY_KICK_SECONDS:
+                        entry['kicked'] = now
+                        kick.append(team)
+                    continue
+                del self._waiting[team]
+                self._live[team] = new
+                registered = self._new.pop(team, None)
+                if registered and new == 'ready':
+                    ready_seconds.observe(now - registered)
+                entry['done'].set()
+                changes.append((team, new))
+            for team, last in self._live.items():
+                if blind and unseen(team):
+                    continue
+                state, status = states.get(team, ('', ''))
+                if state == 'running' and '(unhealthy)' not in status and '(health:' not in status:
+                    new = 'ready'
+                elif state in ('exited', 'dead', '') or '(unhealthy)' in status:
+                    new = 'error'
+                else:
+                    continue                    # restarting / paused: wait and see
+                if new != last:
+                    self._live[team] = new
+                    changes.append((team, new))
+        for team, status in changes:
+            set_team_status(team, status)
+            log = logging.info if status == 'ready' else logging.error
+            log('Team %s is %s', team, status)
+        for team in kick:
+            logging.info('Web container for %s is Created; starting it now', team)
+            try:
+                _start_web(team)
+            except Exception as exc:
+                logging.warning('docker start fallback failed for %s: %s', team, exc)
+
+
+readiness = ReadinessWatcher(READY_TIMEOUT, READY_RECONCILE_SECONDS)
+
+
+def until_ready(team_name: str, start):
+    """Run start() as the team's launch and block until the watcher has
+    settled it: ready, or error on timeout."""
+    done = readiness.expect(team_name)
+    try:
+        start()
+    finally:
+        readiness.launched(team_name)
+    # The watcher enforces READY_TIMEOUT; this only guards against it dying
+    done.wait(READY_TIMEOUT + 60)
+
+
+def launch_and_poll(team_name: str, port: int, instance: str = None):
+    """Start containers and block until the web container is ready (or timeout)."""
+    until_ready(team_name, partial(docker_up, team_name, port, instance))
+
+# ---------------------------------------------------------------------------
+# Orchestration scheduler
+# ---------------------------------------------------------------------------
+
+# Instances brought up at the same time (each job holds a slot until ready)
+ORCH_CONCURRENCY     = int(os.environ.get('ORCH_CONCURRENCY', '4'))
+# Minimum gap between job starts, so MySQL inits don't all hit the disk at once
+ORCH_STAGGER_SECONDS = float(os.environ.get('ORCH_STAGGER_SECONDS', '3'))
+
+orchestrator = Orchestrator(ORCH_CONCURRENCY, ORCH_STAGGER_SECONDS)
+
+# ---------------------------------------------------------------------------
+# Warm instance pool
+# ---------------------------------------------------------------------------
+
+# Booted, unassigned instances to keep ready (0 disables; needs the Engine API)
+POOL_SIZE      = int(os.environ.get('POOL_SIZE', '0'))
+# Slow services that are pre-booted; the rest start per team at assignment
+POOL_SERVICES  = [s.strip() for s in os.environ.get('POOL_SERVICES', 'db').split(',') if s.strip()]
+# service:command run in the pooled container at assignment with the team's
+# flags in its environment — re-applies what the init scripts did with defaults
+POOL_BIND_EXEC = os.environ.get('POOL_BIND_EXEC',
+                                'db:bash /docker-entrypoint-initdb.d/02_init_flags.sh')
+
+# Booted instances run on the first host; the allocator is set up below
+pool = WarmPool(POOL_SIZE, compose_engine, POOL_SERVICES, POOL_BIND_EXEC, orchestrator,
+                spare=lambda: allocator.spare())
+
+
+# ---------------------------------------------------------------------------
+# Capacity allocator
+# ---------------------------------------------------------------------------
+
+# Team networks get consecutive /NETWORK_SUBNET_PREFIX subnets of this range
+# instead of whatever Docker's default address pools have left (those run out
+# after a few dozen networks). Empty = leave it to Docker. Engine API only.
+NETWORK_SUBNET_POOL   = os.environ.get('NETWORK_SUBNET_POOL', '')
+NETWORK_SUBNET_PREFIX = int(os.environ.get('NETWORK_SUBNET_PREFIX', '24'))
+# Memory budget of one running instance (MySQL + Apache); 0 = don't limit
+INSTANCE_MEMORY_MB    = int(os.environ.get('INSTANCE_MEMORY_MB', '512'))
+# Share of each Docker host's memory that instances may take in total
+ADMIT_MEMORY_PERCENT  = int(os.environ.get('ADMIT_MEMORY_PERCENT', '90'))
+# Team statuses whose containers hold memory (paused hibernation adds
+# 'hibernated', see _instances_by_host)
+_HOLDING_STATUSES = ('starting', 'ready', 'error')
+
+
+def _instances_by_host() -> dict:
+    """{host name (None = the first host): teams whose instance takes memory there}."""
+    statuses = _HOLDING_STATUSES + (('hibernated',) if HIBERNATE_MODE == 'pause' else ())
+    with get_db() as db:
+        return dict(db.execute(
+            f'SELECT host, COUNT(*) FROM teams '
+            f'WHERE status IN ({",".join("?" * len(statuses))}) GROUP BY host',
+            statuses).fetchall())
+
+
+def _place_team(team_name: str, host_name: str):
+    """Record where an admitted team's instance runs; it is now 'starting'."""
+    with get_db() as db:
+        db.execute("UPDATE teams SET host = ?, status = 'starting' WHERE name = ?",
+                   (host_name, team_name))
+        db.commit()
+    sync_db_changes()
+
+
+allocator = Allocator(
+    PORT_RANGE_START, PORT_RANGE_END, hosts, pool,
+    count_instances=_instances_by_host, placed=_place_team,
+    queued=lambda team_name: set_team_status(team_name, 'waiting'),
+    launch=lambda team_name, port: _launch_admitted(team_name, port),
+    project_of=_project_name,
+    instance_memory_mb=INSTANCE_MEMORY_MB, admit_percent=ADMIT_MEMORY_PERCENT,
+    check_seconds=HOST_CHECK_SECONDS,
+    subnet_pool=NETWORK_SUBNET_POOL, subnet_prefix=NETWORK_SUBNET_PREFIX,
+    # With the proxy on one host, instances publish no ports to collide with
+    check_ports=not (PROXY_PORT and len(hosts) == 1),
+    # The shared database is only reachable from its own host
+    first_host_only=bool(SHARED_DB))
+
+
+def launch_instance(team_name: str, port: int) -> str:
+    """Bring up a new team's instance, if the allocator admits it.
+
+    Returns 'warm' when a pre-booted instance was bound (no queueing — it
+    takes about a second), 'queued' for a cold start through the
+    orchestrator, or 'waiting' when every host is full and the team waits
+    for capacity.
+    """
+    readiness.registered(team_name)
+    if not allocator.admit(team_name, port):
+        return 'waiting'
+    return _launch_admitted(team_name, port)
+
+
+def _launch_admitted(team_name: str, port: int) -> str:
+    # The warm pool runs on the first host only
+    instance = pool.claim() if team_host(team_name) is default_host else None
+    if instance:
+        threading.Thread(target=launch_and_poll, args=(team_name, port, instance),
+                         daemon=True).start()
+        return 'warm'
+    orchestrator.submit(team_name, partial(launch_and_poll, team_name, port), PRIO_REGISTER)
+    return 'queued'
+
+
+# ---------------------------------------------------------------------------
+# Idle hibernation
+# ---------------------------------------------------------------------------
+
+# Minutes without activity before an instance is hibernated (0 disables;
+# needs the Engine API). Activity is the team using the manager, or traffic
+# reaching its web container.
+HIBERNATE_IDLE_MINUTES = float(os.environ.get('HIBERNATE_IDLE_MINUTES', '0'))
+# stop:  containers are stopped, which frees their memory. Woken by the
+#        team's next dashboard visit (or any other manager page).
+# pause: containers are frozen in place. Memory stays allocated (reclaimable
+#        only through swap), but waking takes milliseconds and a request to
+#        the instance URL wakes it too.
+HIBERNATE_MODE         = os.environ.get('HIBERNATE_MODE', 'stop')
+# How often paused instances are checked for incoming traffic
+HIBERNATE_POLL_SECONDS = float(os.environ.get('HIBERNATE_POLL_SECONDS', '2'))
+
+
+def _hibernating(team_name: str):
+    """Before a team's containers go to sleep: nothing should flag or route to them."""
+    readiness.forget(team_name)
+    if proxy:
+        proxy.forget(team_name)
+
+
+hibernator = Hibernator(
+    HIBERNATE_IDLE_MINUTES * 60, HIBERNATE_MODE, HIBERNATE_POLL_SECONDS, orchestrator,
+    engine_api=compose_engine is not None,
+    engine_of=lambda team_name: team_host(team_name)['engine'],
+    project_of=_project_name,
+    teams=lambda: [t for t in get_all_teams() if host_of(t)['healthy']],
+    port_of=lambda team_name: (get_team_by_name(team_name) or {}).get('port'),
+    set_status=set_team_status, start_instance=docker_up, until_ready=until_ready,
+    on_sleep=_hibernating, on_freed=allocator.kick)
+
+# ---------------------------------------------------------------------------
+# Container stats
+# ---------------------------------------------------------------------------
+
+# Seconds between resource samples of every instance, shown on the admin
+# page (0 disables; needs the Engine API)
+STATS_SECONDS = float(os.environ.get('STATS_SECONDS', '10'))
+
+
+def _team_of_project(project: str):
+    """The team a compose project belongs to (see _project_name), or None."""
+    return project[len('ctf_'):] if project.startswith('ctf_') else None
+
+
+container_stats = ContainerStats(STATS_SECONDS, hosts, _team_of_project)
+
+# ---------------------------------------------------------------------------
+# Instance proxy
+# ---------------------------------------------------------------------------
+
+# With PROXY_PORT set, teams reach their instance through the built-in proxy
+# (proxy.py) instead of a published port, at <team>.PROXY_DOMAIN behind a
+# wildcard DNS record. There is no shared-host fallback: each team needs an
+# origin of its own (see proxy.py).
+PROXY_DOMAIN      = os.environ.get('PROXY_DOMAIN', '')
+if PROXY_PORT and not PROXY_DOMAIN:
+    raise ValueError('PROXY_PORT needs PROXY_DOMAIN: the proxy serves <team>.PROXY_DOMAIN')
+# Port teams connect to, if the proxy's port is mapped to another one
+PROXY_PUBLIC_PORT = int(os.environ.get('PROXY_PUBLIC_PORT', str(PROXY_PORT)))
+# Name of the manager's own container, joined to each instance's network so
+# the proxy can reach it. Empty when the manager runs on the Docker host.
+PROXY_CONTAINER   = os.environ.get('PROXY_CONTAINER', '')
+_PROXY_UPSTREAM_PORT = 80
+
+
+def _proxy_upstream(team_name: str):
+    """(status, (ip, port) or None) — where the proxy sends a team's requests."""
+    state = get_team_state(team_name)
+    if state is None:
+        return None, None
+    status = state.team['status']
+    if status != 'ready':
+        return status, None
+    host = host_of(state.team)
+    if not host['local']:
+        # Remote instances publish their port (see _load_hosts)
+        return status, (host['host_ip'], state.team['port'])
+    try:
+        client = host['engine'].client
+        info   = client.inspect_container(f'{_project_name(team_name)}-web-1')
+        for network, endpoint in (((info or {}).get('NetworkSettings') or {})
+                                  .get('Networks') or {}).items():
+            if PROXY_CONTAINER:
+                client.connect_network(network, PROXY_CONTAINER)
+            if endpoint.get('IPAddress'):
+                return status, (endpoint['IPAddress'], _PROXY_UPSTREAM_PORT)
+    except (DockerError, OSError) as exc:
+        logging.warning('Proxy: no route to %s: %s', team_name, exc)
+    return 'error', None
+
+
+def instance_url(team: dict) -> str:
+    """The URL a team uses to reach its instance."""
+    if not proxy:
+        return f'http://{host_of(team)["host_ip"]}:{team["port"]}'
+    port = '' if PROXY_PUBLIC_PORT == 80 else f':{PROXY_PUBLIC_PORT}'
+    return f'http://{team["name"]}.{PROXY_DOMAIN}{port}/'
+
+
+proxy = None
+if PROXY_PORT:
+    if compose_engine:
+        proxy = InstanceProxy(_proxy_upstream, hibernator.touch, domain=PROXY_DOMAIN)
+    else:
+        logging.warning('Instance proxy disabled: it needs the Docker Engine API')
+
+# ---------------------------------------------------------------------------
+# Control channel (web workers -> orchestrator process)
+# ---------------------------------------------------------------------------
+
+# Everything below acts on the Docker subsystems and their in-memory state,
+# which only the 'all' or 'orchestrator' process runs. Web workers reach them
+# through `control`, a ControlClient on CONTROL_SOCKET; in one process it is
+# the same functions called directly. Arguments and results stay JSON-able.
+
+# Web workers batch team activity for the hibernator and send it this often
+TOUCH_FLUSH_SECONDS = 5
+
+
+def instance_status(team_name: str) -> dict:
+    """Launch progress shown on a team's dashboard."""
+    return {'job':     orchestrator.status(team_name),
+            'waking':  hibernator.waking(team_name),
+            'waiting': allocator.position(team_name)}
+
+
+def stop_instance(team_name: str):
+    team = get_team_by_name(team_name)
+    if not team:
+        return
+    orchestrator.cancel(team_name)
+    allocator.forget(team_name)
+    readiness.forget(team_name)
+    hibernator.forget(team_name)
+    threading.Thread(
+        target=lambda: (docker_down(team_name, team['port']),
+                        set_team_status(team_name, 'stopped'),
+                        allocator.kick()),
+        daemon=True
+    ).start()
+
+
+def restart_instance(team_name: str):
+    team = get_team_by_name(team_name)
+    if not team:
+        return
+    allocator.forget(team_name)
+    hibernator.forget(team_name)
+    set_team_status(team_name, 'starting')
+    # Admin restarts jump ahead of queued registrations
+    orchestrator.submit(team_name, partial(launch_and_poll, team_name, team['port']), PRIO_ADMIN)
+
+
+def remove_instance(team_name: str, port: int, host_name: str = None):
+    """Best-effort Docker cleanup of a team whose row is being deleted."""
+    orchestrator.cancel(team_name)
+    allocator.forget(team_name)
+    readiness.forget(team_name)
+    hibernator.forget(team_name)
+    container_stats.forget(team_name)
+    # The port is reused only once the old containers are gone
+    host = hosts.get(host_name) or default_host
+    threading.Thread(
+        target=lambda: (docker_down(team_name, port, host),
+                        allocator.release_port(port),
+                        allocator.kick()),
+        daemon=True
+    ).start()
+
+
+def touch_teams(team_names: list):
+    for name in team_names:
+        hibernator.touch(name)
+
+
+def subsystem_snapshot() -> dict:
+    """Admin page counters of the background subsystems."""
+    return {'orch':  orchestrator.snapshot(), 'warm': pool.snapshot(),
+            'sleep': hibernator.snapshot(),   'alloc': allocator.snapshot(),
+            'jobs':  orchestrator.statuses(), 'stats': container_stats.snapshot()}
+
+
+_worker_metrics      = {}    # pid -> (received, export) of each web worker
+_worker_metrics_lock = threading.Lock()
+
+
+def push_metrics(pid: int, export: dict):
+    """Keep a web worker's metrics until its next push."""
+    with _worker_metrics_lock:
+        _worker_metrics[pid] = (time.time(), export)
+
+
+def prometheus_text() -> str:
+    """/metrics: this process's metrics plus those of every live web worker."""
+    now = time.time()
+    with _worker_metrics_lock:
+        for pid, (received, _) in list(_worker_metrics.items()):
+            if now - received > METRICS_STALE_SECONDS:
+                del _worker_metrics[pid]
+        exports = [export for _, export in _worker_metrics.values()]
+    return metrics.render([registry.export()] + exports)
+
+
+if MANAGER_ROLE != 'web':
+    # Read once, where the Docker subsystems run
+    registry.gauge('manager_teams', 'Teams by instance status', ['status'],
+                   lambda: {(k,): n for k, n in scores.status_counts().items()})
+    registry.gauge('manager_launch_jobs', 'Instance launch jobs by state', ['state'],
+                   lambda: {(k,): n for k, n in orchestrator.snapshot().items() if k != 'workers'})
+    registry.gauge('manager_capacity_waiting', 'Teams waiting for room on a Docker host', [],
+                   lambda: {(): allocator.snapshot()['waiting']})
+if MANAGER_ROLE != 'orchestrator':
+    registry.gauge('manager_live_streams', 'Open live-update streams', [],
+                   lambda: {(): live.clients})
+    registry.gauge('manager_hash_pending', 'Password hashes queued or running', [],
+                   lambda: {(): hasher.pending})
+
+control_ops = {
+    'reserve_port':    allocator.reserve_port,
+    'release_port':    allocator.release_port,
+    'launch':          launch_instance,
+    'instance_status': instance_status,
+    'stop_instance':   stop_instance,
+    'restart_instance': restart_instance,
+    'remove_instance': remove_instance,
+    'touch':           touch_teams,
+    'snapshot':        subsystem_snapshot,
+    'reload_catalog':  lambda: reload_catalog(),
+    'push_metrics':    push_metrics,
+    'metrics':         prometheus_text,
+    'diag_set':        diagnostics.configure,
+    'diag_sync':       diagnostics.receive,
+    'diag_view':       diagnostics.view,
+    'diag_folded':     diagnostics.folded,
+}
+
+if MANAGER_ROLE == 'web':
+    control = ControlClient(CONTROL_SOCKET)
+else:
+    control = SimpleNamespace(**control_ops)
+
+_touched      = set()
+_touched_lock = threading.Lock()
+
+
+@app.errorhandler(ControlError)
+def _control_unavailable(exc):
+    # The orchestrator process is restarting (gunicorn.conf.py brings it back)
+    logging.warning('Control call failed: %s', exc)
+    return 'Instance service restarting — try again in a few seconds.', 503
+
+
+def touch_team(team_name: str):
+    """Record team activity for the hibernator, from any process."""
+    if MANAGER_ROLE != 'web':
+        hibernator.touch(team_name)
+        return
+    standing = scores.team(team_name)
+    if standing and standing['status'] == 'hibernated':
+        control.touch([team_name])      # wake it now, not at the next flush
+        return
+    with _touched_lock:
+        _touched.add(team_name)
+
+
+def _touch_flush_loop():
+    while True:
+        time.sleep(TOUCH_FLUSH_SECONDS)
+        with _touched_lock:
+            names = list(_touched)
+            _touched.clear()
+        if names:
+            try:
+                control.touch(names)
+            except ControlError as exc:
+                logging.warning('Sending team activity failed: %s', exc)
+
+
+def _metrics_push_loop():
+    while True:
+        time.sleep(METRICS_PUSH_SECONDS)
+        try:
+            control.push_metrics(os.getpid(), registry.export())
+        except ControlError as exc:
+            logging.warning('Sending metrics failed: %s', exc)
+
+# ---------------------------------------------------------------------------
+# Password hashing
+# ---------------------------------------------------------------------------
+
+# bcrypt cost of new hashes; a login with an older cost re-hashes the password
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+# Processes that hash passwords (in each web worker with WORKERS); 0 hashes
+# in the request thread
+HASH_WORKERS  = int(os.environ.get(
+    'HASH_WORKERS', str(max(1, (os.cpu_count() or 2) // 2 // max(1, WORKERS)))))
+# Hashes queued or running at once; past this, logins and registrations get a 503
+HASH_QUEUE    = int(os.environ.get('HASH_QUEUE', '32'))
+
+hasher = PasswordHasher(HASH_WORKERS if MANAGER_ROLE != 'orchestrator' else 0,
+                        HASH_QUEUE, BCRYPT_ROUNDS)
+
+
+@app.errorhandler(HasherBusy)
+def _hasher_busy(exc):
+    return ('Too many logins at once — try again in a few seconds.', 503,
+            {'Retry-After': str(exc.retry_after)})
+
+
+def _save_rehash(team_name: str, old_hash: str, new_hash: str):
+    """Store a login's re-hash of `old_hash` with BCRYPT_ROUNDS (see login())."""
+    with get_db() as db:
+        # Unless the password was changed meanwhile
+        db.execute('UPDATE teams SET password_hash = ? WHERE name = ? AND password_hash = ?',
+                   (new_hash, team_name, old_hash))
+        db.commit()
+    invalidate_team_state(team_name)
+    logging.info('Re-hashed password of %s with cost %d', team_name, BCRYPT_ROUNDS)
 
 # ---------------------------------------------------------------------------
 # Auth decorators
@@ -486,6 +2692,7 @@ def login_required(f):
         if 'team' not in session:
             flash('Please log in first.', 'error')
             return redirect(url_for('index'))
+        touch_team(session['team'])
         return f(*args, **kwargs)
     return decorated
 
@@ -526,24 +2733,33 @@ def register():
         flash('Passwords do not match.', 'error')
         return redirect(url_for('index'))
 
-    pw_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-    port    = next_free_port()
+    pw_hash = hasher.hash(password.encode())
+    port    = control.reserve_port()
+    if port is None:
+        flash('Registration is closed: every instance slot is taken.', 'error')
+        return redirect(url_for('index'))
 
     try:
         with get_db() as db:
-            db.execute(
-                'INSERT INTO teams (name, password_hash, port, status) VALUES (?,?,?,?)',
-                (name, pw_hash, port, 'starting')
-            )
+            db.execute('INSERT INTO teams (name, password_hash, port, status) VALUES (?,?,?,?)',
+                       (name, pw_hash, port, 'waiting'))
             db.commit()
     except sqlite3.IntegrityError:
+        control.release_port(port)
         flash('Team name already taken — please log in instead.', 'error')
         return redirect(url_for('index'))
-
-    threading.Thread(target=launch_and_poll, args=(name, port), daemon=True).start()
+    sync_db_changes()
+    _flag_index(FLAG_SECRET, name)      # warm the verification index
 
     session['team'] = name
-    flash(f'Instance for "{name}" is starting up — this takes ~30 seconds.', 'info')
+    launched = control.launch(name, port)
+    if launched == 'warm':
+        flash(f'Instance for "{name}" is starting up — this takes a few seconds.', 'info')
+    elif launched == 'queued':
+        flash(f'Instance for "{name}" is queued for launch — your dashboard shows its progress.', 'info')
+    else:
+        flash(f'The event is at capacity — "{name}" starts as soon as an instance frees up. '
+              f'Your dashboard shows your place in line.', 'info')
     return redirect(url_for('dashboard'))
 
 
@@ -554,9 +2770,14 @@ def login():
     password = request.form.get('password', '').encode()
 
     team = get_team_by_name(name)
-    if not team or not bcrypt.checkpw(password, team['password_hash'].encode()):
+    if not team or not hasher.check(password, team['password_hash']):
         flash('Invalid team name or password.', 'error')
         return redirect(url_for('index'))
+    # In the background and only on an idle worker: the login doesn't wait
+    # for it, and a login rush never sheds logins for it (next login, then)
+    old_hash = team['password_hash']
+    if hash_rounds(old_hash) != BCRYPT_ROUNDS:
+        hasher.hash_later(password, lambda new_hash: _save_rehash(name, old_hash, new_hash))
 
     session['team'] = name
     return redirect(url_for('dashboard'))
@@ -574,39 +2795,53 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    team = get_team_by_name(session['team'])
-    if not team:
+    # Taken first: the stream replays anything published after this point
+    live_since = live.last_id() if live.enabled else None
+    state = get_team_state(session['team'])
+    if not state:
         session.clear()
         return redirect(url_for('index'))
-    capture_order  = get_capture_order()
-    captured       = get_team_submissions(session['team'])
-    hcost          = get_hint_cost(session['team'])
-    name_cost      = len(get_revealed_names(session['team'])) * FLAG_NAME_COST
-    total_deduct   = hcost + name_cost
-    score          = _calc_score(session['team'], captured, capture_order, total_deduct)
-    revealed_names = get_revealed_names(session['team'])
-    # Per-flag position and points earned
-    flag_pos = {}
-    flag_pts = {}
-    for f in FLAGS:
-        if f['id'] in captured:
-            order = capture_order.get(f['id'], [])
-            pos   = order.index(session['team']) + 1 if session['team'] in order else len(order) + 1
-            flag_pos[f['id']] = pos
-            flag_pts[f['id']] = _flag_points(f['points'], f['fb_multiplier'], pos)
-    instance_url = f'http://{HOST_IP}:{team["port"]}'
+    cat            = catalog
+    team           = state.team
+    standing       = scores.team(session['team']) or {'score': 0, 'flag_positions': {}, 'deduct': 0}
+    flag_pos       = standing['flag_positions']
+    captured       = set(flag_pos)
+    total_deduct   = standing['deduct']
+    score          = standing['score']
+    revealed_names = state.revealed
+    # Per-flag points earned
+    flag_pts = {
+        fid: _flag_points(cat.flag_by_id[fid]['points'], cat.flag_by_id[fid]['fb_multiplier'], pos)
+        for fid, pos in flag_pos.items() if fid in cat.flag_by_id
+    }
+    # Only a launching or waiting team has progress to show
+    progress = (control.instance_status(team['name'])
+                if team['status'] in ('starting', 'waiting') else {})
     return render_template('dashboard.html',
                            team=team,
-                           instance_url=instance_url,
-                           flags=FLAGS,
+                           job=progress.get('job') if team['status'] == 'starting' else None,
+                           waking=progress.get('waking', False),
+                           waiting=progress.get('waiting'),
+                           instance_url=instance_url(team),
+                           flags=cat.flags,
                            captured=captured,
                            flag_pos=flag_pos,
                            flag_pts=flag_pts,
                            revealed_names=revealed_names,
-                           flag_name_cost=FLAG_NAME_COST,
+                           flag_name_cost=cat.flag_name_cost,
                            score=score,
                            hint_cost=total_deduct,
-                           max_score=MAX_SCORE)
+                           max_score=cat.max_score,
+                           live_since=live_since)
+
+
+@app.route('/dashboard/events')
+def dashboard_events():
+    # Not login_required: a stream reconnecting is not team activity and
+    # must not wake a hibernated instance
+    if 'team' not in session:
+        return app.response_class(status=204)
+    return live.response(_live_since(), session['team'])
 
 
 @app.route('/submit', methods=['POST'])
@@ -615,25 +2850,21 @@ def submit_flag():
     team_name = session['team']
     submitted = request.form.get('flag', '').strip()
 
-    matched_flag = None
-    for f in FLAGS:
-        if submitted == _team_flag(f['id'], team_name):
-            matched_flag = f
-            break
-
+    matched_flag = match_flag(team_name, submitted)
     if matched_flag is None:
         flash('Incorrect flag.', 'error')
         return redirect(url_for('dashboard'))
 
-    captured = get_team_submissions(team_name)
-    if matched_flag['id'] in captured:
+    state = get_team_state(team_name)
+    if state and matched_flag['id'] in state.captured:
+        flash('You already captured that flag!', 'info')
+        return redirect(url_for('dashboard'))
+
+    position = record_submission(team_name, matched_flag['id'])
+    if position is None:
         flash('You already captured that flag!', 'info')
         return redirect(url_for('dashboard'))
 
-    record_submission(team_name, matched_flag['id'])
-    capture_order = get_capture_order()
-    order    = capture_order.get(matched_flag['id'], [])
-    position = order.index(team_name) + 1 if team_name in order else len(order) + 1
     pts      = _flag_points(matched_flag['points'], matched_flag['fb_multiplier'], position)
 
     if position == 1:
@@ -647,36 +2878,30 @@ def submit_flag():
 @app.route('/hints')
 @login_required
 def hints():
-    team_name = session['team']
-    if not get_team_by_name(team_name):
+    state = get_team_state(session['team'])
+    if not state:
         session.clear()
         flash('Team not found. Please log in again.', 'error')
         return redirect(url_for('index'))
-    purchased = get_purchased_hints(team_name)
-    total_cost = sum(h['cost'] for h in HINTS if h['id'] in purchased)
+    purchased  = state.hints
+    total_cost = state.hint_cost
 
     # Build per-flag hint lists, gating later hints behind earlier purchases
+    cat = catalog
     flag_hints: dict = {}
-    for flag in FLAGS:
-        fid = flag['id']
-        ordered = sorted([h for h in HINTS if h['flag_id'] == fid], key=lambda h: h['order'])
-        visible = []
-        for h in ordered:
-            # Always show hint 1; show hint N only if hint N-1 is purchased
-            if h['order'] == 1 or any(
-                prev['id'] in purchased
-                for prev in ordered if prev['order'] == h['order'] - 1
-            ):
-                visible.append(h)
-        flag_hints[fid] = visible
-
-    revealed_names = get_revealed_names(team_name)
+    for fid, chain in cat.hint_chain.items():
+        # Always show hint 1; show hint N only if hint N-1 is purchased
+        flag_hints[fid] = [
+            h for h in chain
+            if h['order'] == 1 or (cat.hint_prev[h['id']] or {}).get('id') in purchased
+        ]
+
     return render_template('hints.html',
-                           flags=FLAGS,
+                           flags=cat.flags,
                            flag_hints=flag_hints,
                            purchased=purchased,
                            total_cost=total_cost,
-                           revealed_names=revealed_names)
+                           revealed_names=state.revealed)
 
 
 @app.route('/hints/buy', methods=['POST'])
@@ -684,7 +2909,8 @@ def hints():
 @limiter.limit("30 per minute")
 def buy_hint():
     team_name = session['team']
-    if not get_team_by_name(team_name):
+    state     = get_team_state(team_name)
+    if not state:
         session.clear()
         flash('Team not found. Please log in again.', 'error')
         return redirect(url_for('index'))
@@ -694,31 +2920,25 @@ def buy_hint():
         flash('Invalid hint.', 'error')
         return redirect(url_for('hints'))
 
-    hint = next((h for h in HINTS if h['id'] == hint_id), None)
+    cat  = catalog
+    hint = cat.hint_by_id.get(hint_id)
     if not hint:
         flash('Invalid hint.', 'error')
         return redirect(url_for('hints'))
 
     # Enforce sequential unlock: must own previous hint first
-    if hint['order'] > 1:
-        ordered = sorted(
-            [h for h in HINTS if h['flag_id'] == hint['flag_id']],
-            key=lambda h: h['order']
-        )
-        prev = next((h for h in ordered if h['order'] == hint['order'] - 1), None)
-        if prev:
-            purchased = get_purchased_hints(team_name)
-            if prev['id'] not in purchased:
-                flash('Unlock the previous hint first.', 'error')
-                return redirect(url_for('hints'))
+    prev = cat.hint_prev[hint_id]
+    if prev and prev['id'] not in state.hints:
+        flash('Unlock the previous hint first.', 'error')
+        return redirect(url_for('hints'))
 
     try:
         with get_db() as db:
-            db.execute(
-                'INSERT INTO hint_purchases (team_name, hint_id) VALUES (?, ?)',
-                (team_name, hint_id)
-            )
+            db.execute('INSERT INTO hint_purchases (team_id, hint_id) '
+                       'VALUES ((SELECT id FROM teams WHERE name = ?), ?)',
+                       (team_name, hint_id))
             db.commit()
+        sync_db_changes()
         flash(f'Hint unlocked — -{hint["cost"]} pts applied to your score.', 'info')
     except sqlite3.IntegrityError:
         flash('Already purchased.', 'info')
@@ -730,85 +2950,92 @@ def buy_hint():
 @limiter.limit("20 per minute")
 def reveal_name():
     team_name = session['team']
-    if not get_team_by_name(team_name):
+    if not get_team_state(team_name):
         session.clear()
         flash('Team not found. Please log in again.', 'error')
         return redirect(url_for('index'))
     flag_id = request.form.get('flag_id', '').strip()
-    if not any(f['id'] == flag_id for f in FLAGS):
+    cost    = catalog.flag_name_cost
+    if flag_id not in catalog.flag_by_id:
         flash('Invalid flag.', 'error')
         return redirect(url_for('dashboard'))
     try:
         with get_db() as db:
-            db.execute(
-                'INSERT INTO name_purchases (team_name, flag_id) VALUES (?, ?)',
-                (team_name, flag_id)
-            )
+            db.execute('INSERT INTO name_purchases (team_id, flag_id) '
+                       'VALUES ((SELECT id FROM teams WHERE name = ?), ?)',
+                       (team_name, flag_id))
             db.commit()
-        flash(f'Challenge name revealed — -{FLAG_NAME_COST} pts applied.', 'info')
+        sync_db_changes()
+        flash(f'Challenge name revealed — -{cost} pts applied.', 'info')
     except sqlite3.IntegrityError:
         flash('Already revealed.', 'info')
     return redirect(url_for('dashboard'))
 
 
+def _live_since() -> str:
+    # Last-Event-ID on reconnects, else the id the page was rendered at
+    return request.headers.get('Last-Event-ID') or request.args.get('since', '')
+
+
+def _render_scoreboard() -> str:
+    live_since = live.last_id() if live.enabled else None
+    board = get_scoreboard()
+    # Per-team cumulative score series, maintained incrementally by the engine.
+    # Flag captures, hint purchases and name reveals share one timeline so the
+    # score drops at the moment a purchase is made.
+    graph_data, graph_min, graph_max = scores.timeline()
+
+    cat = catalog
+    return render_template('scoreboard.html', board=board, flags=cat.flags,
+                           max_score=cat.max_score, max_possible=cat.max_possible,
+                           graph_data=graph_data, graph_max=graph_max, graph_min=graph_min,
+                           live_since=live_since,
+                           live_board=[{k: e[k] for k in ('name', 'score', 'flag_positions',
+                                                          'last_capture')}
+                                       for e in board] if live_since else None)
+
+
+def _scoreboard_json() -> str:
+    graph_data, _, _ = scores.timeline()
+    cat = catalog
+    return json.dumps({
+        'version':      scores.version,
+        'max_score':    cat.max_score,
+        'max_possible': cat.max_possible,
+        'flags':        [{'id': f['id'], 'name': f['name'], 'points': f['points']} for f in cat.flags],
+        'teams': [
+            {
+                'rank':           rank,
+                'name':           e['name'],
+                'score':          e['score'],
+                'flag_positions': e['flag_positions'],
+                'last_capture':   e['last_capture'],
+            }
+            for rank, e in enumerate(get_scoreboard(), start=1)
+        ],
+        'graph': graph_data,
+    }, separators=(',', ':'))
+
+
 @app.route('/scoreboard')
 def scoreboard():
-    board = get_scoreboard()
+    # Pending flash messages are rendered into the page, so skip the cache
+    if session.get('_flashes'):
+        return _render_scoreboard()
+    # The nav bar differs for logged-in teams
+    variant = 'team' if session.get('team') else 'public'
+    return _snapshot_response(f'scoreboard-{variant}', _render_scoreboard,
+                              'text/html; charset=utf-8')
 
-    # Build per-team cumulative score time series for the graph.
-    # Merge flag captures, hint purchases, and name reveals into a single
-    # timeline so the score drops at the moment a purchase is made.
-    with get_db() as db:
-        team_rows  = db.execute('SELECT name, created_at FROM teams').fetchall()
-        sub_rows   = db.execute(
-            'SELECT team_name, flag_id, captured_at FROM submissions'
-        ).fetchall()
-        hint_rows  = db.execute(
-            'SELECT team_name, hint_id, purchased_at FROM hint_purchases'
-        ).fetchall()
-        name_rows  = db.execute(
-            'SELECT team_name, flag_id AS fid, purchased_at FROM name_purchases'
-        ).fetchall()
-
-    created      = {r['name']: r['created_at'] for r in team_rows}
-    hint_cost_map = {h['id']: h['cost'] for h in HINTS}
-
-    # Build per-team event lists: (timestamp_str, kind, payload)
-    # kind='flag' payload=flag_id  kind='deduct' payload=pts_cost
-    events_by_team: dict = defaultdict(list)
-    for s in sub_rows:
-        events_by_team[s['team_name']].append((s['captured_at'], 'flag', s['flag_id']))
-    for h in hint_rows:
-        cost = hint_cost_map.get(h['hint_id'], 0)
-        events_by_team[h['team_name']].append((h['purchased_at'], 'deduct', cost))
-    for n in name_rows:
-        events_by_team[n['team_name']].append((n['purchased_at'], 'deduct', FLAG_NAME_COST))
-
-    capture_order = get_capture_order()
-    graph_data = {}
-    for team_name, events in events_by_team.items():
-        events.sort(key=lambda e: e[0])
-        start_ts = created.get(team_name) or events[0][0]
-        series = [{'x': _ts_to_ms(start_ts), 'y': 0}]
-        running_ids: set = set()
-        running_deduct = 0
-        for ts, kind, payload in events:
-            if kind == 'flag':
-                running_ids.add(payload)
-            else:
-                running_deduct += payload
-            score = _calc_score(team_name, running_ids, capture_order, running_deduct)
-            series.append({'x': _ts_to_ms(ts), 'y': score})
-        graph_data[team_name] = series
 
-    # Actual min/max across all data points — Y-axis scales to fit whatever teams score
-    all_y = [pt['y'] for series in graph_data.values() for pt in series]
-    graph_max = max(all_y, default=100)
-    graph_min = min(all_y, default=0)
+@app.route('/scoreboard.json')
+def scoreboard_json():
+    return _snapshot_response('scoreboard-json', _scoreboard_json, 'application/json')
+
 
-    return render_template('scoreboard.html', board=board, flags=FLAGS,
-                           max_score=MAX_SCORE, max_possible=MAX_POSSIBLE,
-                           graph_data=graph_data, graph_max=graph_max, graph_min=graph_min)
+@app.route('/scoreboard/events')
+def scoreboard_events():
+    return live.response(_live_since())
 
 # ---------------------------------------------------------------------------
 # Routes — admin
@@ -834,19 +3061,56 @@ def admin_logout():
     return redirect(url_for('admin_login_page'))
 
 
+# Teams per page of the admin table
+ADMIN_PAGE_SIZE  = 50
+# ?sort= keys ordered by the database; the rest by in-memory scores and stats
+_ADMIN_SQL_SORTS = {'id': 'id', 'name': 'name', 'port': 'port', 'status': 'status',
+                    'registered': 'created_at'}
+_ADMIN_MEM_SORTS = {
+    'score':   lambda r, s: r['score'],
+    'flags':   lambda r, s: len(r['flag_ids']),
+    'cpu':     lambda r, s: s.get('cpu') or 0,
+    'mem':     lambda r, s: s.get('mem', 0),
+    'net':     lambda r, s: s.get('rx', 0) + s.get('tx', 0),
+    'crashes': lambda r, s: s.get('crashes', 0),
+}
+
+
 @app.route('/admin')
 @admin_required
 def admin():
-    teams         = get_all_teams()
-    capture_order = get_capture_order()
-    hint_costs    = get_all_hint_costs()
-    name_costs    = get_all_name_reveal_costs()
+    sort = request.args.get('sort', 'id')
+    if sort not in _ADMIN_SQL_SORTS and sort not in _ADMIN_MEM_SORTS:
+        sort = 'id'
+    # Biggest first for the figures, A–Z / oldest first for the rest
+    desc  = request.args.get('dir', 'desc' if sort in _ADMIN_MEM_SORTS else 'asc') == 'desc'
+    page  = max(1, request.args.get('page', 1, type=int))
+    snap  = control.snapshot()
+    stats = snap['stats']['teams']
+    start = (page - 1) * ADMIN_PAGE_SIZE
+    if sort in _ADMIN_SQL_SORTS:
+        total, teams = get_teams_page(_ADMIN_SQL_SORTS[sort], desc, start, ADMIN_PAGE_SIZE)
+    else:
+        key   = _ADMIN_MEM_SORTS[sort]
+        board = sorted(scores.scoreboard(), key=lambda r: r['name'])
+        board.sort(key=lambda r: key(r, stats.get(r['name'], {})), reverse=desc)
+        total = len(board)
+        teams = get_teams_named([r['name'] for r in board[start:start + ADMIN_PAGE_SIZE]])
+    pages = max(1, math.ceil(total / ADMIN_PAGE_SIZE))
+    if page > pages:
+        return redirect(url_for('admin', sort=sort, dir='desc' if desc else 'asc', page=pages))
     for t in teams:
-        captured      = get_team_submissions(t['name'])
-        hcost         = hint_costs.get(t['name'], 0) + name_costs.get(t['name'], 0)
-        t['score']    = _calc_score(t['name'], captured, capture_order, hcost)
-        t['captures'] = len(captured)
-    return render_template('admin.html', teams=teams, max_score=MAX_SCORE)
+        standing      = scores.team(t['name']) or {'score': 0, 'flag_positions': {}}
+        t['score']    = standing['score']
+        t['captures'] = len(standing['flag_positions'])
+        t['job']      = snap['jobs'].get(t['name']) if t['status'] == 'starting' else None
+        t['stats']    = stats.get(t['name'])
+    return render_template('admin.html', teams=teams, total=total, page=page, pages=pages,
+                           sort=sort, desc=desc, desc_first=list(_ADMIN_MEM_SORTS),
+                           max_score=catalog.max_score,
+                           num_flags=len(catalog.flags), orch=snap['orch'],
+                           warm=snap['warm'], sleep=snap['sleep'], stats=snap['stats'],
+                           alloc=snap['alloc'], feed=live.snapshot(), hashing=hasher.snapshot())
 
 
 @app.route('/admin/stop/<team_name>', methods=['POST'])
@@ -857,11 +3121,7 @@ def admin_stop(team_name):
         flash(f'Team "{team_name}" not found.', 'error')
         return redirect(url_for('admin'))
 
-    threading.Thread(
-        target=lambda: (docker_down(team_name, team['port']),
-                        set_team_status(team_name, 'stopped')),
-        daemon=True
-    ).start()
+    control.stop_instance(team_name)
     flash(f'Stopping "{team_name}"…', 'info')
     return redirect(url_for('admin'))
 
@@ -874,10 +3134,7 @@ def admin_restart(team_name):
         flash(f'Team "{team_name}" not found.', 'error')
         return redirect(url_for('admin'))
 
-    set_team_status(team_name, 'starting')
-    threading.Thread(
-        target=launch_and_poll, args=(team_name, team['port']), daemon=True
-    ).start()
+    control.restart_instance(team_name)
     flash(f'Restarting "{team_name}"…', 'info')
     return redirect(url_for('admin'))
 
@@ -895,10 +3152,11 @@ def admin_reset_password(team_name):
         flash('New password must be at least 8 characters.', 'error')
         return redirect(url_for('admin'))
 
-    pw_hash = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
+    pw_hash = hasher.hash(new_password.encode())
     with get_db() as db:
         db.execute('UPDATE teams SET password_hash = ? WHERE name = ?', (pw_hash, team_name))
         db.commit()
+    invalidate_team_state(team_name)
 
     flash(f'Password reset for "{team_name}".', 'success')
     return redirect(url_for('admin'))
@@ -913,26 +3171,124 @@ def admin_delete(team_name):
         return redirect(url_for('admin'))
 
     # Best-effort Docker cleanup (may already be gone if remove_team.sh was used)
-    threading.Thread(
-        target=lambda: docker_down(team_name, team['port']),
-        daemon=True
-    ).start()
+    control.remove_instance(team_name, team['port'], team.get('host'))
 
+    # submissions, hint_purchases and name_purchases cascade via team_id
     with get_db() as db:
-        db.execute('DELETE FROM submissions     WHERE team_name = ?', (team_name,))
-        db.execute('DELETE FROM hint_purchases  WHERE team_name = ?', (team_name,))
-        db.execute('DELETE FROM name_purchases  WHERE team_name = ?', (team_name,))
-        db.execute('DELETE FROM teams           WHERE name = ?',      (team_name,))
+        db.execute('DELETE FROM teams WHERE name = ?', (team_name,))
         db.commit()
+    sync_db_changes()
 
     flash(f'Team "{team_name}" deleted.', 'info')
     return redirect(url_for('admin'))
 
+
+@app.route('/admin/reload-catalog', methods=['POST'])
+@admin_required
+def admin_reload_catalog():
+    if reload_catalog():
+        if MANAGER_ROLE == 'web':
+            control.reload_catalog()    # other workers follow via _watch_catalog
+        flash(f'Catalog reloaded — {len(catalog.flags)} flags, {len(catalog.hints)} hints.', 'success')
+    else:
+        flash('Catalog reload failed; the previous catalog is still active. See logs.', 'error')
+    return redirect(url_for('admin'))
+
+
+@app.route('/admin/diagnostics', methods=['GET', 'POST'])
+@admin_required
+def admin_diagnostics():
+    if request.method == 'POST':
+        action = request.form.get('action')
+        try:
+            if action == 'trace':
+                minutes = min(max(float(request.form.get('minutes', '5')), 0), 60)
+                settings = control.diag_set(minutes * 60, None)
+            elif action == 'profile':
+                seconds = min(max(float(request.form.get('seconds', '30')), 0), 600)
+                mode    = 'wall' if request.form.get('mode') == 'wall' else 'cpu'
+                settings = control.diag_set(None, seconds, mode)
+            else:
+                settings = control.diag_set(0, 0)
+        except ValueError:
+            flash('Enter a number.', 'error')
+            return redirect(url_for('admin_diagnostics'))
+        diagnostics.apply(settings)     # this worker at once, the others within seconds
+        return redirect(url_for('admin_diagnostics'))
+    diag = control.diag_view()
+    for e in diag['slow'] + diag['recent']:
+        e['time'] = datetime.fromtimestamp(e['at'], TZ).strftime('%H:%M:%S')
+    return render_template('admin_diagnostics.html', diag=diag)
+
+
+@app.route('/admin/diagnostics/<kind>.folded')
+@admin_required
+def admin_diagnostics_folded(kind):
+    if kind not in ('profile', 'sql'):
+        return 'Not found', 404
+    return control.diag_folded(kind), 200, {
+        'Content-Type':        'text/plain; charset=utf-8',
+        'Content-Disposition': f'attachment; filename="{kind}-{int(time.time())}.folded"'}
+
+
+@app.route('/metrics')
+def metrics_page():
+    if not METRICS:
+        return 'Not found', 404
+    bearer = request.headers.get('Authorization', '')
+    if not (request.remote_addr in ('127.0.0.1', '::1') or session.get('is_admin')
+            or ADMIN_TOKEN and hmac.compare_digest(bearer, f'Bearer {ADMIN_TOKEN}')):
+        return 'Forbidden', 403
+    if MANAGER_ROLE == 'web':
+        control.push_metrics(os.getpid(), registry.export())
+    return control.metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 # ---------------------------------------------------------------------------
 # Entry point
 # ---------------------------------------------------------------------------
 
+if __name__ == '__main__' and WORKERS and MANAGER_ROLE == 'all':
+    # Hand over to gunicorn; gunicorn.conf.py starts the orchestrator process
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.environ['CONTROL_SOCKET'] = os.path.abspath(CONTROL_SOCKET)
+    os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn',
+                               '--config', os.path.join(here, 'gunicorn.conf.py'),
+                               '--chdir', here, '--workers', str(WORKERS),
+                               '--threads', str(WORKER_THREADS), 'app:app'])
+
 init_db()
+scores.load()
+hasher.start()
+if MANAGER_ROLE != 'orchestrator':
+    live.start()
+if MANAGER_ROLE != 'web':
+    readiness.start(get_all_teams())
+    orchestrator.start()
+    allocator.start(get_all_teams())
+    if SHARED_DB and pool.size > 0:
+        logging.warning('Warm pool disabled: nothing to pre-boot with SHARED_DB')
+    else:
+        pool.start()
+    hibernator.start(get_all_teams())
+    container_stats.start()
+    if proxy:
+        proxy.start('0.0.0.0', PROXY_PORT)
+else:
+    # Each open stream holds one of the worker's threads
+    live.max_clients = min(live.max_clients, WORKER_THREADS // 2)
+    # A request sees every write committed before it, whichever worker made it
+    app.before_request(lambda: sync_db_changes())
+    threading.Thread(target=_touch_flush_loop, name='touch-flush', daemon=True).start()
+    if METRICS:
+        threading.Thread(target=_metrics_push_loop, name='metrics-push', daemon=True).start()
+    threading.Thread(target=_diagnostics_sync_loop, name='diag-sync', daemon=True).start()
+threading.Thread(target=_sync_loop, name='db-sync', daemon=True).start()
+if CATALOG_POLL_SECONDS > 0:
+    threading.Thread(target=_watch_catalog, daemon=True).start()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=80, debug=False)
+    if MANAGER_ROLE == 'orchestrator':
+        logging.info('Orchestrator serving control calls on %s', CONTROL_SOCKET)
+        ControlServer(control_ops, CONTROL_SOCKET).serve_forever()
+    else:
+        app.run(host='0.0.0.0', port=80, debug=False)
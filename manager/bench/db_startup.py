@@ -0,0 +1,123 @@
+"""
+Challenge database startup — stock mysql:8.0 initialisation vs the pre-seeded image.
+
+Starts the db service on its own, --runs times per variant (--parallel at a
+time, to mimic a registration rush), and reports the time from `up` to
+healthy, and how much the container had written to its own layer by then
+(SizeRw). The seeded data directory lives in a read-only image layer, so
+the first write to each InnoDB file copies the whole file up into the
+container's layer: if "after" shows tens of MB written per container and
+its up time creeps back towards "before" as --parallel grows, copy-up is
+eating the gain. "before" is the original service definition: a stock mysql:8.0 that
+imports bankingai.sql through docker-entrypoint-initdb.d, with a 30 s
+start_period. "after" is the db service of challenge/docker-compose.yaml.
+
+Needs a Docker daemon and the ctf-db image (`docker compose build` in
+challenge/). Pointing --socket at bench.fake_docker only checks the plumbing.
+No before/after timings or copy-up figures have been recorded yet: they
+need a real daemon. Take them with --parallel 1 and with --parallel 10.
+
+Usage (from manager/):
+  python -m bench.db_startup [--runs 5] [--parallel 1] [--socket /var/run/docker.sock]
+"""
+
+import argparse
+import copy
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE      = os.path.dirname(os.path.abspath(__file__))
+CHALLENGE = os.path.join(os.path.dirname(os.path.dirname(HERE)), 'challenge')
+
+sys.path.insert(0, os.path.dirname(HERE))
+from docker_api import ComposeEngine, ComposeModel, DockerClient  # noqa: E402
+
+BEFORE_DB = {
+    'image': 'mysql:8.0',
+    'environment': {
+        'MYSQL_ROOT_PASSWORD': 'rootpassword',
+        'MYSQL_DATABASE':      'bankingai',
+        'MYSQL_USER':          'admin',
+        'MYSQL_PASSWORD':      'password',
+        'FLAG_SQL_INJECTION':  '${FLAG_SQL_INJECTION:-CTF{credential_harvester_testmode}}',
+    },
+    'volumes': [
+        './db/bankingai.sql:/docker-entrypoint-initdb.d/01_bankingai.sql',
+        './db/init_flags.sh:/docker-entrypoint-initdb.d/02_init_flags.sh',
+    ],
+    'healthcheck': {
+        'test': ['CMD', 'mysqladmin', 'ping', '-h', 'localhost', '-u', 'root', '-prootpassword'],
+        'interval': '5s', 'timeout': '10s', 'retries': 10, 'start_period': '30s',
+    },
+}
+
+
+def _models(compose_file: str) -> dict:
+    """{variant: ComposeModel} holding only the db service."""
+    import yaml
+    with open(compose_file, encoding='utf-8') as fh:
+        data = yaml.safe_load(fh)
+    after  = copy.deepcopy(data)
+    after['services'] = {'db': data['services']['db']}
+    before = copy.deepcopy(after)
+    before['services'] = {'db': BEFORE_DB}
+    project_dir = os.path.dirname(os.path.abspath(compose_file))
+    return {'before': ComposeModel(before, project_dir, compose_file),
+            'after':  ComposeModel(after,  project_dir, compose_file)}
+
+
+def _one(engine: ComposeEngine, project: str) -> tuple:
+    """(seconds from up to healthy, bytes in the container's own layer or None)."""
+    engine.down(project)
+    t0 = time.perf_counter()
+    try:
+        engine.up(project, {'FLAG_SQL_INJECTION': f'CTF{{{project}}}'})
+        engine.wait_ready(project, ['db'])
+        elapsed = time.perf_counter() - t0
+        info = engine.client.get(f'/containers/{project}-db-1/json', params={'size': 1})
+        return elapsed, (info or {}).get('SizeRw')
+    finally:
+        engine.down(project)
+
+
+def run(model: ComposeModel, client: DockerClient, variant: str,
+        runs: int, parallel: int) -> list:
+    engine = ComposeEngine(model, client, health_timeout=300, poll_interval=0.1)
+    names  = [f'bench_db_{variant}_{i}' for i in range(runs)]
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        return list(pool.map(lambda p: _one(engine, p), names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs',     type=int, default=5)
+    parser.add_argument('--parallel', type=int, default=1)
+    parser.add_argument('--socket',   default='/var/run/docker.sock')
+    parser.add_argument('--compose',  default=os.path.join(CHALLENGE, 'docker-compose.yaml'))
+    parser.add_argument('--only',     choices=('before', 'after'))
+    args = parser.parse_args()
+
+    client  = DockerClient(args.socket, timeout=300)
+    models  = _models(args.compose)
+    results = {}
+    for variant, model in models.items():
+        if args.only and variant != args.only:
+            continue
+        results[variant] = run(model, client, variant, args.runs, args.parallel)
+
+    print(f'{args.runs} runs, {args.parallel} at a time — up to healthy (s), '
+          f'written to the container layer (MB)')
+    print(f'{"variant":<8} {"p50":>7} {"min":>7} {"max":>7} {"written":>8}')
+    for variant, samples in results.items():
+        times = sorted(t for t, _ in samples)
+        sizes = [s for _, s in samples if s is not None]
+        written = f'{statistics.median(sizes) / 1e6:>8.1f}' if sizes else f'{"-":>8}'
+        print(f'{variant:<8} {statistics.median(times):>7.2f} '
+              f'{times[0]:>7.2f} {times[-1]:>7.2f} {written}')
+
+
+if __name__ == '__main__':
+    main()
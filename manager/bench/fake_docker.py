@@ -0,0 +1,457 @@
+"""
+Fake Docker Engine API on a unix socket or TCP port — enough of the API for docker_api.py.
+
+Keeps containers, networks, volumes and images in memory. Containers with a
+healthcheck turn healthy `health_delay` seconds after they start, so the
+depends_on: service_healthy path is exercised without MySQL. start, die,
+pause/unpause and health_status events are streamed from /events, and
+traffic() feeds the network counters behind /stats, next to a steady,
+made-up CPU load and memory footprint per container. Speaks
+HTTP/1.1 keep-alive like the real daemon and counts connections and
+requests, which makes it usable both for checking the client and as the
+backend of load tests.
+
+Listens on a unix socket, or on TCP when given tcp://host:port, so several
+fakes can stand in for the daemons of a multi-host (DOCKER_HOSTS) setup.
+
+Usage (from manager/):
+  python -m bench.fake_docker /tmp/fake-docker.sock [--health-delay 2]
+  DOCKER_SOCKET=/tmp/fake-docker.sock CTF_COMPOSE_FILE=../challenge/docker-compose.yaml python app.py
+  python -m bench.fake_docker tcp://127.0.0.1:23750
+
+or in-process:
+  fake = FakeDocker('/tmp/fake-docker.sock', health_delay=0.2).start()
+  ...
+  fake.stop()
+"""
+
+import argparse
+import json
+import os
+import queue
+import re
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urlparse
+
+_PREFIX = re.compile(r'^/v[0-9.]+')
+
+
+class FakeDocker:
+    def __init__(self, socket_path: str, health_delay: float = 1.0,
+                 images=('mysql:8.0', 'ctf-db:latest', 'ctf-web:latest')):
+        self.socket_path  = socket_path
+        self.health_delay = health_delay
+        self.images       = set(images)
+        self.containers   = {}      # id -> container dict
+        self.networks     = {}      # id -> network dict
+        self.volumes      = {}      # name -> volume dict
+        self.execs        = {}      # id -> {'Container', 'Cmd', 'Env'}
+        self.exec_exit    = 0       # exit code every exec reports
+        self.container_ip = '127.0.0.1'     # address reported for every running container
+        self.mem_total    = 16 << 30        # bytes, reported by /info
+        self.connections  = 0
+        self.requests     = 0
+        self.lock         = threading.Lock()
+        self._subscribers = []      # queues fed by _emit, one per /events stream
+        self._open        = set()   # client sockets, closed by stop() like a daemon exit
+        self._server      = None
+
+    # -- lifecycle -------------------------------------------------------
+
+    def start(self):
+        fake = self
+
+        class Handler(_Handler):
+            docker = fake
+
+        if self.socket_path.startswith('tcp://'):
+            host, _, port = self.socket_path[len('tcp://'):].rpartition(':')
+            self._server = _TCPServer((host, int(port)), Handler)
+        else:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self._server = _Server(self.socket_path, Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        for q in list(self._subscribers):
+            q.put(None)
+        for sock in list(self._open):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if not self.socket_path.startswith('tcp://') and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    # -- helpers ---------------------------------------------------------
+
+    def _find(self, ident: str):
+        for c in self.containers.values():
+            if c['Id'] == ident or c['Id'].startswith(ident) or c['Name'] == '/' + ident:
+                return c
+        return None
+
+    def _emit(self, c: dict, action: str):
+        event = {'Type': 'container', 'Action': action, 'status': action, 'id': c['Id'],
+                 'Actor': {'ID': c['Id'], 'Attributes': {**c['Config'].get('Labels', {}),
+                                                         'name': c['Name'][1:]}},
+                 'time': int(time.time())}
+        for q in list(self._subscribers):
+            q.put(event)
+
+    def _became_healthy(self, cid: str, started: float):
+        with self.lock:
+            c = self.containers.get(cid)
+            if c and c['State']['Running'] and c['_started'] == started:
+                self._emit(c, 'health_status: healthy')
+
+    def kill(self, ident: str, exit_code: int = 137):
+        """Simulate a container crash (emits die)."""
+        with self.lock:
+            c = self._find(ident)
+            c['State'] = {'Status': 'exited', 'Running': False, 'ExitCode': exit_code}
+            self._emit(c, 'die')
+
+    def traffic(self, ident: str, nbytes: int = 512):
+        """Simulate a request reaching a container (bumps its rx_bytes)."""
+        with self.lock:
+            self._find(ident)['_rx'] += nbytes
+
+    def _status(self, c: dict) -> str:
+        if c['State'].get('Paused'):
+            return 'Up (Paused)'
+        if not c['State']['Running']:
+            return 'Created' if c['State']['Status'] == 'created' else \
+                   f'Exited ({c["State"]["ExitCode"]})'
+        health = self._state(c).get('Health')
+        return 'Up' + (f' ({health["Status"] if health["Status"] != "starting" else "health: starting"})'
+                       if health else '')
+
+    def _state(self, c: dict) -> dict:
+        state = dict(c['State'])
+        if c['Config'].get('Healthcheck') and state['Running']:
+            healthy = time.time() - c['_started'] >= self.health_delay
+            state['Health'] = {'Status': 'healthy' if healthy else 'starting'}
+        return state
+
+    @staticmethod
+    def _ports(c: dict) -> list:
+        if not c['State']['Running']:
+            return []
+        return [{'PrivatePort': int(key.split('/')[0]), 'PublicPort': int(b['HostPort']),
+                 'Type': key.split('/')[1]}
+                for key, binds in ((c['HostConfig'] or {}).get('PortBindings') or {}).items()
+                for b in binds]
+
+    @staticmethod
+    def _match_labels(labels: dict, wanted: list) -> bool:
+        for cond in wanted:
+            key, _, val = cond.partition('=')
+            if key not in labels or (val and labels[key] != val):
+                return False
+        return True
+
+    # -- API -------------------------------------------------------------
+
+    def handle(self, method: str, path: str, query: dict, body):
+        """Return (status, json-able payload or None)."""
+        parts   = [unquote(p) for p in path.strip('/').split('/')]
+        filters = json.loads(query.get('filters', ['{}'])[0])
+        labels  = filters.get('label', [])
+
+        if parts == ['_ping']:
+            return 200, 'OK'
+
+        if parts == ['info']:
+            return 200, {'MemTotal': self.mem_total, 'NCPU': os.cpu_count(),
+                         'Containers': len(self.containers)}
+
+        if parts[0] == 'images':
+            if method == 'POST' and parts[1:] == ['create']:
+                self.images.add(f'{query["fromImage"][0]}:{query.get("tag", ["latest"])[0]}')
+                return 200, {'status': 'Downloaded newer image'}
+            name = '/'.join(parts[1:-1])
+            if name in self.images or f'{name}:latest' in self.images:
+                return 200, {'Id': 'sha256:' + uuid.uuid5(uuid.NAMESPACE_DNS, name).hex}
+            return 404, {'message': f'No such image: {name}'}
+
+        if parts[0] == 'exec':
+            ex = self.execs.get(parts[1])
+            if not ex:
+                return 404, {'message': 'No such exec instance'}
+            if parts[2:] == ['start']:
+                return 200, None
+            return 200, {'ID': parts[1], 'Running': False, 'ExitCode': self.exec_exit}
+
+        if parts[0] == 'networks':
+            if method == 'POST' and parts[1:] == ['create']:
+                if any(n['Name'] == body['Name'] for n in self.networks.values()):
+                    return 409, {'message': f'network {body["Name"]} already exists'}
+                nid = uuid.uuid4().hex
+                subnets = [c['Subnet'] for c in (body.get('IPAM') or {}).get('Config') or []]
+                if any(sub in subnets for n in self.networks.values()
+                       for sub in (c['Subnet'] for c in n['IPAM']['Config'])):
+                    return 400, {'message': 'Pool overlaps with other one on this address space'}
+                self.networks[nid] = {'Id': nid, 'Name': body['Name'],
+                                      'Labels': body.get('Labels') or {},
+                                      'IPAM': {'Driver': 'default',
+                                               'Config': [{'Subnet': s} for s in subnets]}}
+                return 201, {'Id': nid}
+            if len(parts) == 1:
+                return 200, [n for n in self.networks.values()
+                             if self._match_labels(n['Labels'], labels)]
+            net = next((n for n in self.networks.values()
+                        if parts[1] in (n['Id'], n['Name'])), None)
+            if not net:
+                return 404, {'message': 'network not found'}
+            attached = {c['Id']: {'Name': c['Name'][1:]} for c in self.containers.values()
+                        if (c['HostConfig'] or {}).get('NetworkMode') == net['Name']
+                        or net['Name'] in c['_networks']}
+            if method == 'POST' and parts[2:] == ['connect']:
+                c = self._find(body['Container'])
+                if not c:
+                    return 404, {'message': f'No such container: {body["Container"]}'}
+                if c['Id'] in attached:
+                    return 403, {'message': f'endpoint with name {c["Name"][1:]} already '
+                                            f'exists in network {net["Name"]}'}
+                c['_networks'][net['Name']] = (body.get('EndpointConfig') or {}).get('Aliases') or []
+                return 200, None
+            if method == 'POST' and parts[2:] == ['disconnect']:
+                c = self._find(body['Container'])
+                if not c or c['_networks'].pop(net['Name'], None) is None:
+                    return 404, {'message': 'container is not connected to the network'}
+                return 200, None
+            if method == 'DELETE':
+                if attached:
+                    return 403, {'message': f'error while removing network: network '
+                                            f'{net["Name"]} has active endpoints'}
+                del self.networks[net['Id']]
+                return 204, None
+            return 200, {**net, 'Containers': attached}
+
+        if parts[0] == 'volumes':
+            if method == 'POST' and parts[1:] == ['create']:
+                vol = self.volumes.setdefault(body['Name'], {
+                    'Name': body['Name'], 'Labels': body.get('Labels') or {}})
+                return 201, vol
+            if len(parts) == 1:
+                return 200, {'Volumes': [v for v in self.volumes.values()
+                                         if self._match_labels(v['Labels'], labels)]}
+            if method == 'DELETE':
+                return (204, None) if self.volumes.pop(parts[1], None) else \
+                       (404, {'message': 'no such volume'})
+            return (200, self.volumes[parts[1]]) if parts[1] in self.volumes else \
+                   (404, {'message': 'no such volume'})
+
+        if parts[0] == 'containers':
+            if parts[1:] == ['json']:
+                out = []
+                for c in self.containers.values():
+                    if not query.get('all') and not c['State']['Running']:
+                        continue
+                    if self._match_labels(c['Config']['Labels'], labels):
+                        out.append({'Id': c['Id'], 'Names': [c['Name']],
+                                    'Labels': c['Config']['Labels'],
+                                    'State': c['State']['Status'],
+                                    'Status': self._status(c),
+                                    'Ports': self._ports(c)})
+                return 200, out
+            if method == 'POST' and parts[1:] == ['create']:
+                name = '/' + query['name'][0]
+                if any(c['Name'] == name for c in self.containers.values()):
+                    return 409, {'message': f'Conflict. The container name "{name}" is already in use'}
+                image = body['Image']
+                if image not in self.images and f'{image}:latest' not in self.images:
+                    return 404, {'message': f'No such image: {image}'}
+                cid = uuid.uuid4().hex + uuid.uuid4().hex
+                self.containers[cid] = {
+                    'Id': cid, 'Name': name, 'Config': body, 'HostConfig': body.get('HostConfig'),
+                    'State': {'Status': 'created', 'Running': False, 'ExitCode': 0},
+                    '_started': 0.0, '_rx': 0,
+                    # Made-up steady load: share of one core, resident bytes
+                    '_cpu': int(cid[:4], 16) % 20 / 100, '_mem': (64 + int(cid[4:8], 16) % 256) << 20,
+                    '_networks': {},    # connected later: name -> aliases
+                }
+                return 201, {'Id': cid, 'Warnings': []}
+            c = self._find(parts[1])
+            if not c:
+                return 404, {'message': f'No such container: {parts[1]}'}
+            action = parts[2] if len(parts) > 2 else ''
+            if method == 'DELETE':
+                if c['State']['Running']:
+                    self._emit(c, 'die')
+                del self.containers[c['Id']]
+                return 204, None
+            if action == 'start':
+                if c['State'].get('Paused'):
+                    return 409, {'message': 'cannot start a paused container, try unpause instead'}
+                if c['State']['Running']:
+                    return 304, None
+                c['State'] = {'Status': 'running', 'Running': True, 'ExitCode': 0}
+                c['_started'] = time.time()
+                self._emit(c, 'start')
+                if c['Config'].get('Healthcheck'):
+                    threading.Timer(self.health_delay, self._became_healthy,
+                                    (c['Id'], c['_started'])).start()
+                return 204, None
+            if action == 'stop':
+                if not c['State']['Running']:
+                    return 304, None
+                c['State'] = {'Status': 'exited', 'Running': False, 'ExitCode': 0}
+                self._emit(c, 'die')
+                return 204, None
+            if action in ('pause', 'unpause'):
+                paused = action == 'pause'
+                if not c['State']['Running'] or bool(c['State'].get('Paused')) == paused:
+                    return 409, {'message': f'Container {c["Id"]} is not in the right state'}
+                c['State'] = {'Status': 'paused' if paused else 'running', 'Running': True,
+                              'Paused': paused, 'ExitCode': 0}
+                self._emit(c, action)
+                return 204, None
+            if action == 'stats':
+                if not c['State']['Running']:
+                    return 200, {'cpu_stats': {'cpu_usage': {'total_usage': 0}},
+                                 'memory_stats': {}, 'networks': {}}
+                cache = 16 << 20
+                return 200, {
+                    'cpu_stats':    {'cpu_usage': {'total_usage': int(
+                                         (time.time() - c['_started']) * c['_cpu'] * 1e9)},
+                                     'online_cpus': os.cpu_count()},
+                    'memory_stats': {'usage': c['_mem'] + cache, 'limit': self.mem_total,
+                                     'stats': {'inactive_file': cache}},
+                    'networks':     {'eth0': {'rx_bytes': c['_rx'], 'tx_bytes': c['_rx'] // 2}},
+                }
+            if action == 'exec' and method == 'POST':
+                if not c['State']['Running']:
+                    return 409, {'message': f'Container {c["Id"]} is not running'}
+                eid = uuid.uuid4().hex
+                self.execs[eid] = {'Container': c['Name'][1:], 'Cmd': body.get('Cmd'),
+                                   'Env': body.get('Env') or []}
+                return 201, {'Id': eid}
+            if action == 'json':
+                out = {k: v for k, v in c.items() if not k.startswith('_')}
+                out['State'] = self._state(c)
+                nets = [(c['HostConfig'] or {}).get('NetworkMode'), *c['_networks']]
+                out['NetworkSettings'] = {'Networks': {
+                    n: {'IPAddress': self.container_ip if c['State']['Running'] else ''}
+                    for n in nets if n}}
+                return 200, out
+
+        return 404, {'message': f'fake docker: unsupported {method} {path}'}
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads     = True
+    request_queue_size = 128        # a registration rush opens many connections at once
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads      = True
+    allow_reuse_address = True
+    request_queue_size  = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    docker: FakeDocker = None
+
+    def setup(self):
+        super().setup()
+        with self.docker.lock:
+            self.docker.connections += 1
+            self.docker._open.add(self.connection)
+
+    def finish(self):
+        with self.docker.lock:
+            self.docker._open.discard(self.connection)
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def address_string(self):
+        return 'unix'
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _events(self):
+        q = queue.Queue()
+        self.docker._subscribers.append(q)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            while True:
+                event = q.get()
+                if event is None:
+                    break
+                data = json.dumps(event).encode() + b'\n'
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            self.docker._subscribers.remove(q)
+            self.close_connection = True
+
+    def _dispatch(self, method: str):
+        url    = urlparse(self.path)
+        path   = _PREFIX.sub('', url.path)
+        if method == 'GET' and path == '/events':
+            with self.docker.lock:
+                self.docker.requests += 1
+            return self._events()
+        length = int(self.headers.get('Content-Length') or 0)
+        body   = json.loads(self.rfile.read(length)) if length else None
+        with self.docker.lock:
+            self.docker.requests += 1
+            status, payload = self.docker.handle(method, path, parse_qs(url.query), body)
+        data = b'' if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        if data:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Docker Engine API on a unix socket')
+    parser.add_argument('socket', help='unix socket path, or tcp://host:port')
+    parser.add_argument('--health-delay', type=float, default=1.0)
+    args = parser.parse_args()
+    fake = FakeDocker(args.socket, health_delay=args.health_delay).start()
+    print(f'fake docker listening on {args.socket} (Ctrl-C to stop)')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
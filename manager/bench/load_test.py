@@ -0,0 +1,421 @@
+"""
+Load test — the real manager app under N simulated teams, with no containers.
+
+`run` starts app.py in-process on Werkzeug's threaded HTTP server (the one
+`python app.py` uses) with Docker replaced by bench.fake_docker, or by a
+stub `docker` executable with --docker cli, so registrations go through the
+launch queue and readiness tracking as usual. Then every team registers,
+logs in, and for --duration seconds mixes dashboard and scoreboard polling,
+flag submissions, hint purchases and name reveals, with --think seconds
+between requests. Reports requests/s and p50/p95/p99 latency per route.
+CSRF checks and rate limits are off: every simulated team is 127.0.0.1.
+Passwords use bcrypt cost --rounds (default 4, so the numbers are about the
+app; --rounds 12 adds a realistic kickoff login rush).
+
+`seed` writes synthetic manager.db files with the current schema. The
+random seed is fixed, so the same --teams gives the same file every time.
+`scoreboard` times the scoreboard code paths on such a file: engine
+rebuild, ranking, rendering and cached hits. `run --db` load-tests a copy
+of one.
+
+Usage (from manager/):
+  python -m bench.load_test run [--teams 100] [--duration 30] [--think 1] [--rounds 4]
+                                [--docker api|cli] [--db FILE]
+  python -m bench.load_test seed [--teams 100 1000 10000] [--out bench/data]
+  python -m bench.load_test scoreboard bench/data/manager-1000.db [--runs 50]
+"""
+
+import argparse
+import http.client
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import stat
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+HERE      = os.path.dirname(os.path.abspath(__file__))
+MANAGER   = os.path.dirname(HERE)
+CHALLENGE = os.path.join(os.path.dirname(MANAGER), 'challenge')
+PASSWORD  = 'password1'
+
+# Relative weights of what a logged-in team does next
+ACTIONS = {
+    'dashboard':       30,
+    'scoreboard':      20,
+    'scoreboard.json': 15,
+    'submit':          15,
+    'hints':            8,
+    'buy hint':         6,
+    'reveal name':      6,
+}
+
+# Stand-in for the docker CLI (DOCKER_API=0): compose up records the project,
+# ps lists every recorded project's web container as running.
+_DOCKER_STUB = """#!/bin/sh
+state="$(dirname "$0")/projects"
+case "$*" in
+  "ps "*)
+    [ -f "$state" ] && sort -u "$state" | while read -r p; do
+      echo "{\\"Labels\\":\\"com.docker.compose.project=$p,com.docker.compose.service=web\\",\\"State\\":\\"running\\",\\"Status\\":\\"Up\\"}"
+    done ;;
+  "events"*) exec sleep 86400 ;;
+  "info"*) echo 68719476736 ;;
+  compose*" up "*|compose*" up") echo "$3" >> "$state" ;;
+  compose*" down"*) [ -f "$state" ] && grep -vx "$3" "$state" > "$state.tmp"; mv -f "$state.tmp" "$state" 2>/dev/null ;;
+esac
+exit 0
+"""
+
+
+def _import_app(env: dict):
+    os.environ.update(env)
+    sys.path.insert(0, MANAGER)
+    import app
+    return app
+
+
+def _quantiles(samples: list) -> tuple:
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    return statistics.median(samples), pick(0.95), pick(0.99)
+
+# ---------------------------------------------------------------------------
+# Synthetic databases
+# ---------------------------------------------------------------------------
+
+def seed_db(app, path: str, n_teams: int, seed: int = 1) -> tuple:
+    """Create a current-schema database with n_teams teams and 8 hours of events.
+
+    Teams are 'stopped', so a load test on a copy doesn't try to track
+    instances that don't exist. Returns (captures, hint purchases, reveals).
+    """
+    rng     = random.Random(seed)
+    start   = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    start_ms = int(start.timestamp() * 1000)
+    pw_hash = app.hasher.hash(PASSWORD.encode())
+
+    app.DB_PATH = path
+    app.init_db()
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('BEGIN')
+    subs, hints, names = [], [], []
+    for i in range(n_teams):
+        created = rng.uniform(0, 60)
+        conn.execute('INSERT INTO teams (id, name, password_hash, port, created_at, status) '
+                     "VALUES (?, ?, ?, ?, ?, 'stopped')",
+                     (i + 1, f'team{i:05d}', pw_hash, app.PORT_RANGE_START + i,
+                      (start + timedelta(minutes=created)).strftime('%Y-%m-%d %H:%M:%S')))
+        # Stronger teams capture more, and earlier
+        skill = rng.random()
+        owned = set()
+        for f in app.catalog.flags:
+            if rng.random() < 0.2 + 0.7 * skill:
+                subs.append((i + 1, f['id'], start_ms + int(rng.uniform(created + 5, 480) * 60000)))
+            elif rng.random() < 0.3:
+                names.append((i + 1, f['id'], start_ms + int(rng.uniform(created + 5, 480) * 60000)))
+        for h in app.catalog.hints:
+            prev = app.catalog.hint_prev[h['id']]
+            if (not prev or prev['id'] in owned) and rng.random() < 0.35:
+                owned.add(h['id'])
+                hints.append((i + 1, h['id'], start_ms + int(rng.uniform(created + 5, 480) * 60000)))
+    # Insert in time order, as the live app would
+    conn.executemany('INSERT INTO submissions (team_id, flag_id, captured_ms) VALUES (?,?,?)',
+                     sorted(subs, key=lambda r: r[2]))
+    conn.executemany('INSERT INTO hint_purchases (team_id, hint_id, purchased_ms) VALUES (?,?,?)',
+                     sorted(hints, key=lambda r: r[2]))
+    conn.executemany('INSERT INTO name_purchases (team_id, flag_id, purchased_ms) VALUES (?,?,?)',
+                     sorted(names, key=lambda r: r[2]))
+    conn.execute('DELETE FROM team_log')
+    conn.execute('COMMIT')
+    conn.execute('VACUUM')
+    conn.close()
+    return len(subs), len(hints), len(names)
+
+
+def cmd_seed(args):
+    os.makedirs(args.out, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='ctf-bench-')
+    try:
+        app = _import_app({'MANAGER_DB': os.path.join(tmp, 'scratch.db'), 'DOCKER_API': '0',
+                           'PATH': _stub_docker(tmp) + os.pathsep + os.environ['PATH']})
+        for n in args.teams:
+            path = os.path.join(args.out, f'manager-{n}.db')
+            if os.path.exists(path):
+                os.unlink(path)
+            t0 = time.perf_counter()
+            n_sub, n_hint, n_name = seed_db(app, path, n)
+            print(f'{path}: {n} teams, {n_sub} captures, {n_hint} hint purchases, '
+                  f'{n_name} name reveals ({time.perf_counter() - t0:.1f} s)')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+# ---------------------------------------------------------------------------
+# Scoreboard code paths on a seeded database
+# ---------------------------------------------------------------------------
+
+def cmd_scoreboard(args):
+    tmp = tempfile.mkdtemp(prefix='ctf-bench-')
+    try:
+        path = os.path.join(tmp, 'manager.db')
+        shutil.copy(args.db, path)
+        app = _import_app({'MANAGER_DB': path, 'DOCKER_API': '0', 'LIVE_UPDATES': '0',
+                           'PATH': _stub_docker(tmp) + os.pathsep + os.environ['PATH']})
+        client = app.app.test_client()
+        names  = [e['name'] for e in app.get_scoreboard()]
+        rng    = random.Random(2)
+
+        def uncached_board():
+            with app.scores.lock:
+                app.scores._changed()       # drop the cached ranking
+            app.get_scoreboard()
+
+        def render(build):
+            def run():
+                with app.scores.lock:
+                    app.scores._changed()
+                with app.app.test_request_context('/scoreboard'):
+                    build()
+            return run
+
+        def team_state():
+            name = rng.choice(names)
+            app.invalidate_team_state(name)
+            app.get_team_state(name)
+
+        cases = {
+            'engine rebuild (startup)':      (app.scores.load, max(3, args.runs // 10)),
+            'ranking, uncached':             (uncached_board, args.runs),
+            '/scoreboard.json body':         (render(app._scoreboard_json), args.runs),
+            '/scoreboard page body':         (render(app._render_scoreboard), args.runs),
+            '/scoreboard.json, cached':      (lambda: client.get('/scoreboard.json'), args.runs * 10),
+            'team state (dashboard) uncached': (team_state, args.runs * 10),
+        }
+        print(f'{args.db}: {len(names)} teams\n')
+        print(f'{"path":<34} {"p50":>9} {"p95":>9} {"p99":>9}  (ms)')
+        for label, (fn, runs) in cases.items():
+            fn()                            # warm up
+            samples = []
+            for _ in range(runs):
+                t0 = time.perf_counter()
+                fn()
+                samples.append((time.perf_counter() - t0) * 1000)
+            p50, p95, p99 = _quantiles(samples)
+            print(f'{label:<34} {p50:>9.3f} {p95:>9.3f} {p99:>9.3f}')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+# ---------------------------------------------------------------------------
+# Load test
+# ---------------------------------------------------------------------------
+
+def _stub_docker(tmp: str) -> str:
+    """Write the stub docker executable; returns the directory to put on PATH."""
+    bindir = os.path.join(tmp, 'bin')
+    os.makedirs(bindir, exist_ok=True)
+    path = os.path.join(bindir, 'docker')
+    with open(path, 'w') as f:
+        f.write(_DOCKER_STUB)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return bindir
+
+
+class Stats:
+    def __init__(self):
+        self.lock    = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors  = defaultdict(int)
+
+    def add(self, route: str, seconds: float, ok: bool):
+        with self.lock:
+            self.samples[route].append(seconds * 1000)
+            if not ok:
+                self.errors[route] += 1
+
+
+class Team:
+    """One simulated team: its own cookie and kept-alive connection."""
+
+    def __init__(self, port: int, name: str, stats: Stats):
+        self.port   = port
+        self.name   = name
+        self.stats  = stats
+        self.cookie = ''
+        self.conn   = None
+        self.retry_after = None
+
+    def request(self, route: str, method: str, path: str, form: dict = None):
+        body    = urllib.parse.urlencode(form).encode() if form is not None else None
+        headers = {'Cookie': self.cookie} if self.cookie else {}
+        if body is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        t0 = time.perf_counter()
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            try:
+                self.conn.request(method, path, body, headers)
+                resp = self.conn.getresponse()
+                resp.read()
+                break
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    self.stats.add(route, time.perf_counter() - t0, False)
+                    return None
+        if resp.getheader('Connection', '').lower() == 'close' or resp.version == 10:
+            self.conn.close()
+            self.conn = None
+        self.retry_after = resp.getheader('Retry-After')
+        cookie = resp.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        self.stats.add(route, time.perf_counter() - t0, resp.status < 400)
+        return resp.status
+
+
+def _simulate(app, team: Team, start: threading.Barrier, deadline: list, think: float, seed: int):
+    rng = random.Random(seed)
+    cat = app.catalog
+    # Shed with a 503 (password hashing queue full): wait and retry, as people do
+    for route, path, form in (
+            ('register', '/register', {'name': team.name, 'password': PASSWORD, 'password2': PASSWORD}),
+            ('login',    '/login',    {'name': team.name, 'password': PASSWORD})):
+        team.cookie = ''
+        while team.request(route, 'POST', path, form) == 503:
+            time.sleep(float(team.retry_after or 1) * rng.uniform(1, 1.5))
+    start.wait()
+    actions, weights = list(ACTIONS), list(ACTIONS.values())
+    hints_owned = set()
+    while time.time() < deadline[0]:
+        time.sleep(rng.expovariate(1 / think) if think else 0)
+        action = rng.choices(actions, weights)[0]
+        if action == 'dashboard':
+            team.request(action, 'GET', '/dashboard')
+        elif action == 'scoreboard':
+            team.request(action, 'GET', '/scoreboard')
+        elif action == 'scoreboard.json':
+            team.request(action, 'GET', '/scoreboard.json')
+        elif action == 'hints':
+            team.request(action, 'GET', '/hints')
+        elif action == 'submit':
+            flag_id = rng.choice(cat.flags)['id']
+            flag    = app._team_flag(flag_id, team.name) if rng.random() < 0.5 else 'CTF{wrong}'
+            team.request(action, 'POST', '/submit', {'flag': flag})
+        elif action == 'buy hint':
+            hint = rng.choice([h for h in cat.hints
+                               if not cat.hint_prev[h['id']]
+                               or cat.hint_prev[h['id']]['id'] in hints_owned])
+            hints_owned.add(hint['id'])
+            team.request(action, 'POST', '/hints/buy', {'hint_id': hint['id']})
+        else:
+            team.request(action, 'POST', '/reveal-name', {'flag_id': rng.choice(cat.flags)['id']})
+
+
+def cmd_run(args):
+    from werkzeug.serving import make_server
+
+    tmp = tempfile.mkdtemp(prefix='ctf-bench-')
+    fake = None
+    try:
+        db = os.path.join(tmp, 'manager.db')
+        if args.db:
+            shutil.copy(args.db, db)
+        env = {'MANAGER_DB': db, 'CTF_COMPOSE_FILE': os.path.join(CHALLENGE, 'docker-compose.yaml'),
+               'CHALLENGE_DIR': CHALLENGE, 'ORCH_STAGGER_SECONDS': '0', 'ADMIN_TOKEN': 'bench',
+               'BCRYPT_ROUNDS': str(args.rounds),
+               # Every team gets an instance; the fake daemons have no real memory
+               'INSTANCE_MEMORY_MB': '0',
+               'PORT_RANGE_END': str(8000 + 2 * args.teams + 20000)}
+        if args.docker == 'api':
+            from bench.fake_docker import FakeDocker
+            fake = FakeDocker(os.path.join(tmp, 'docker.sock'), health_delay=0.2).start()
+            env['DOCKER_SOCKET'] = fake.socket_path
+        else:
+            env['DOCKER_API'] = '0'
+            env['PATH'] = _stub_docker(tmp) + os.pathsep + os.environ['PATH']
+        app = _import_app(env)
+        app.app.config['WTF_CSRF_ENABLED'] = False
+        app.limiter.enabled = False
+
+        server = make_server('127.0.0.1', 0, app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f'{args.teams} teams, {args.duration:.0f} s, think time {args.think} s, '
+              f'docker {args.docker}{", db " + args.db if args.db else ""}')
+
+        stats    = Stats()
+        start    = threading.Barrier(args.teams + 1)
+        deadline = [float('inf')]
+        teams    = [Team(server.server_port, f'lt{i:05d}', stats) for i in range(args.teams)]
+        threads  = [threading.Thread(target=_simulate, daemon=True,
+                                     args=(app, t, start, deadline, args.think, i))
+                    for i, t in enumerate(teams)]
+        t0 = time.time()
+        for t in threads:
+            t.start()
+        start.wait()
+        print(f'registered and logged in: {time.time() - t0:.1f} s')
+        t1 = time.time()
+        deadline[0] = t1 + args.duration
+        for t in threads:
+            t.join()
+        elapsed = time.time() - t1
+        ready = sum(1 for t in app.get_all_teams() if t['name'].startswith('lt') and t['status'] == 'ready')
+        print(f'instances ready: {ready}/{args.teams}\n')
+
+        print(f'{"route":<16} {"requests":>9} {"req/s":>8} {"errors":>7} '
+              f'{"p50":>8} {"p95":>8} {"p99":>8}  (ms)')
+        total = 0
+        for route in ['register', 'login'] + list(ACTIONS):
+            samples = stats.samples.get(route)
+            if not samples:
+                continue
+            p50, p95, p99 = _quantiles(samples)
+            # register/login happen before the timed window
+            rate = f'{len(samples) / elapsed:.1f}' if route in ACTIONS else '-'
+            total += len(samples) if route in ACTIONS else 0
+            print(f'{route:<16} {len(samples):>9} {rate:>8} {stats.errors[route]:>7} '
+                  f'{p50:>8.1f} {p95:>8.1f} {p99:>8.1f}')
+        print(f'{"total":<16} {total:>9} {total / elapsed:>8.1f}')
+        server.shutdown()
+    finally:
+        if fake:
+            fake.stop()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub    = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='load-test the app in-process')
+    run.add_argument('--teams',    type=int,   default=100)
+    run.add_argument('--duration', type=float, default=30)
+    run.add_argument('--think',    type=float, default=1.0, help='mean seconds between requests')
+    run.add_argument('--rounds',   type=int,   default=4, help='bcrypt cost of team passwords')
+    run.add_argument('--docker',   choices=['api', 'cli'], default='api',
+                     help='fake Engine API socket, or a stub docker executable')
+    run.add_argument('--db', help='start from a copy of this database (see seed)')
+
+    seed = sub.add_parser('seed', help='write synthetic manager.db files')
+    seed.add_argument('--teams', type=int, nargs='+', default=[100, 1000, 10000])
+    seed.add_argument('--out',   default=os.path.join(HERE, 'data'))
+
+    board = sub.add_parser('scoreboard', help='time scoreboard code paths on a database')
+    board.add_argument('db')
+    board.add_argument('--runs', type=int, default=50)
+
+    args = parser.parse_args()
+    {'run': cmd_run, 'seed': cmd_seed, 'scoreboard': cmd_scoreboard}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
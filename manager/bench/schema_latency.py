@@ -0,0 +1,159 @@
+"""
+Schema latency benchmark — legacy team_name schema vs the migrated schema.
+
+Seeds a synthetic manager.db with the original (migration 1) schema, times
+the hot queries, upgrades the same file in place with init_db(), and times
+the equivalent queries again.
+
+Usage (from manager/):
+  python -m bench.schema_latency [--teams 1000] [--runs 2000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _import_app(db_path: str):
+    """Import the manager app against a throwaway database."""
+    os.environ['MANAGER_DB'] = db_path
+    sys.path.insert(0, os.path.dirname(HERE))
+    import app
+    return app
+
+
+def seed_legacy(app, path: str, n_teams: int, seed: int = 1):
+    """Create a migration-1 database with n_teams teams and synthetic events."""
+    rng   = random.Random(seed)
+    start = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+    def ts(minutes: float) -> str:
+        return (start + timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S')
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('BEGIN')
+    app._migration_1(conn)
+    conn.execute('PRAGMA user_version = 1')
+    subs, hints, names = [], [], []
+    for i in range(n_teams):
+        name = f'team{i:05d}'
+        conn.execute('INSERT INTO teams (name, password_hash, port, created_at, status) '
+                     'VALUES (?, ?, ?, ?, ?)', (name, 'x', 8000 + i, ts(0), 'ready'))
+        for f in app.catalog.flags:
+            if rng.random() < 0.6:
+                subs.append((name, f['id'], ts(rng.uniform(1, 480))))
+            if rng.random() < 0.3:
+                names.append((name, f['id'], ts(rng.uniform(1, 480))))
+        for h in app.catalog.hints:
+            if h['order'] == 1 and rng.random() < 0.4:
+                hints.append((name, h['id'], ts(rng.uniform(1, 480))))
+    # Insert in time order, as the live app would
+    for row in sorted(subs, key=lambda r: r[2]):
+        conn.execute('INSERT INTO submissions (team_name, flag_id, captured_at) VALUES (?,?,?)', row)
+    for row in sorted(hints, key=lambda r: r[2]):
+        conn.execute('INSERT INTO hint_purchases (team_name, hint_id, purchased_at) VALUES (?,?,?)', row)
+    for row in sorted(names, key=lambda r: r[2]):
+        conn.execute('INSERT INTO name_purchases (team_name, flag_id, purchased_at) VALUES (?,?,?)', row)
+    conn.execute('COMMIT')
+    conn.close()
+    return len(subs), len(hints), len(names)
+
+
+LEGACY_QUERIES = {
+    'team state (dashboard)': ("""
+        SELECT t.*,
+               (SELECT group_concat(flag_id) FROM submissions    WHERE team_name = t.name),
+               (SELECT group_concat(hint_id) FROM hint_purchases WHERE team_name = t.name),
+               (SELECT group_concat(flag_id) FROM name_purchases WHERE team_name = t.name)
+          FROM teams t WHERE t.name = ?""", 'name'),
+    'capture order for one flag': (
+        'SELECT team_name FROM submissions WHERE flag_id = ? ORDER BY captured_at, id', 'flag'),
+    'full ordered capture stream': (
+        'SELECT team_name, flag_id, captured_at FROM submissions ORDER BY captured_at, id', None),
+    'hint purchases for one team': (
+        'SELECT hint_id FROM hint_purchases WHERE team_name = ?', 'name'),
+}
+
+CURRENT_QUERIES = {
+    'team state (dashboard)': ("""
+        SELECT t.*,
+               (SELECT group_concat(flag_id) FROM submissions    WHERE team_id = t.id),
+               (SELECT group_concat(hint_id) FROM hint_purchases WHERE team_id = t.id),
+               (SELECT group_concat(flag_id) FROM name_purchases WHERE team_id = t.id)
+          FROM teams t WHERE t.name = ?""", 'name'),
+    'capture order for one flag': (
+        'SELECT team_id FROM submissions WHERE flag_id = ? ORDER BY captured_ms, id', 'flag'),
+    'full ordered capture stream': (
+        'SELECT t.name, s.flag_id, s.captured_ms FROM submissions s '
+        'JOIN teams t ON t.id = s.team_id ORDER BY s.captured_ms, s.id', None),
+    'hint purchases for one team': (
+        'SELECT hint_id FROM hint_purchases WHERE team_id = '
+        '(SELECT id FROM teams WHERE name = ?)', 'name'),
+}
+
+
+def time_queries(app, path: str, queries: dict, n_teams: int, runs: int) -> dict:
+    rng  = random.Random(2)
+    conn = sqlite3.connect(path)
+    results = {}
+    for label, (sql, arg) in queries.items():
+        samples = []
+        n = runs if arg else max(20, runs // 50)
+        for _ in range(n):
+            if arg == 'name':
+                params = (f'team{rng.randrange(n_teams):05d}',)
+            elif arg == 'flag':
+                params = (rng.choice(app.catalog.flags)['id'],)
+            else:
+                params = ()
+            t0 = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - t0) * 1e6)
+        samples.sort()
+        results[label] = (statistics.median(samples), samples[int(len(samples) * 0.95) - 1])
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--teams', type=int, default=1000)
+    parser.add_argument('--runs',  type=int, default=2000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='ctf-bench-')
+    try:
+        app  = _import_app(os.path.join(tmp, 'scratch.db'))
+        path = os.path.join(tmp, 'manager.db')
+        n_sub, n_hint, n_name = seed_legacy(app, path, args.teams)
+        print(f'{args.teams} teams, {n_sub} captures, {n_hint} hint purchases, '
+              f'{n_name} name reveals')
+
+        legacy = time_queries(app, path, LEGACY_QUERIES, args.teams, args.runs)
+
+        app.DB_PATH = path
+        t0 = time.perf_counter()
+        app.init_db()
+        print(f'in-place migration: {(time.perf_counter() - t0) * 1000:.1f} ms\n')
+
+        current = time_queries(app, path, CURRENT_QUERIES, args.teams, args.runs)
+
+        print(f'{"query":<30} {"legacy p50":>11} {"p95":>9} {"current p50":>12} {"p95":>9}  (µs)')
+        for label in LEGACY_QUERIES:
+            (lp50, lp95), (cp50, cp95) = legacy[label], current[label]
+            print(f'{label:<30} {lp50:>11.1f} {lp95:>9.1f} {cp50:>12.1f} {cp95:>9.1f}')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+"""
+Capacity allocator — host ports, Docker hosts, subnets and instance slots.
+
+Allocator hands out team ports from a fixed range and decides where (and
+whether) a new instance runs: each Docker host has room for its memory
+over the per-instance budget, capped by its max=, and a new instance goes
+to the healthy host with the lowest load. When no host has room, teams
+wait in registration order and start as capacity frees up. SubnetPool
+gives each project network its own subnet of a configured range, so
+Docker's default address pools don't run out after a few dozen networks.
+
+Team rows stay the caller's business; the allocator reports through
+callbacks:
+
+  allocator = Allocator(8000, 8999, hosts, pool,
+                        count_instances=by_host,    # () -> {host name: instances}
+                        placed=mark_starting,       # (team, host name)
+                        queued=mark_waiting,        # (team)
+                        launch=start_instance,      # (team, port)
+                        project_of=project_name)    # team -> compose project
+  allocator.start(teams)
+  allocator.admit('team', 8001)         # False: it waits for capacity
+"""
+
+import ipaddress
+import logging
+import socket
+import subprocess
+import threading
+import time
+from collections import deque
+
+from docker_api import DockerClient, DockerError
+
+
+class SubnetPool:
+    """Bitmap of the /prefix subnets of one range, for one Docker host.
+
+    Set as ComposeEngine.subnets: acquire() when a project network is
+    created, release() when down() removes it.
+    """
+
+    def __init__(self, cidr: str, prefix: int):
+        self._lock      = threading.Lock()
+        self._net       = ipaddress.ip_network(cidr)
+        self._prefix    = prefix
+        self._step      = 1 << (self._net.max_prefixlen - prefix)
+        self._slots     = bytearray(1 << (prefix - self._net.prefixlen))
+        self._slot_of   = {}            # project -> slot index
+
+    def recover(self, client: DockerClient):
+        """Mark subnets held by our project networks, and any overlapping
+        a network something else created, as taken."""
+        for net in client.get('/networks') or []:
+            project = (net.get('Labels') or {}).get('com.docker.compose.project')
+            for cfg in (net.get('IPAM') or {}).get('Config') or []:
+                try:
+                    subnet = ipaddress.ip_network(cfg.get('Subnet', ''))
+                except ValueError:
+                    continue
+                with self._lock:
+                    for slot in self._overlapping(subnet):
+                        self._slots[slot] = 1
+                        if project and subnet.prefixlen == self._prefix:
+                            self._slot_of[project] = slot
+
+    def _overlapping(self, subnet) -> range:
+        if subnet.version != self._net.version or not subnet.overlaps(self._net):
+            return range(0)
+        base  = int(self._net.network_address)
+        first = max(int(subnet.network_address), base)
+        last  = min(int(subnet.broadcast_address), int(self._net.broadcast_address))
+        return range((first - base) // self._step, (last - base) // self._step + 1)
+
+    def _take(self, project: str) -> int:
+        slot = self._slot_of.get(project)
+        if slot is None:
+            slot = self._slots.find(0)
+            if slot < 0:
+                raise DockerError(503, f'no free subnet left in {self._net}')
+            self._slots[slot] = 1
+            self._slot_of[project] = slot
+        return slot
+
+    def reserve(self, project: str):
+        """Set a subnet aside for a project whose network is created later
+        (if none is free, creating the network fails instead)."""
+        with self._lock:
+            if project in self._slot_of or self._slots.find(0) >= 0:
+                self._take(project)
+
+    def acquire(self, project: str) -> str:
+        with self._lock:
+            slot = self._take(project)
+        return str(ipaddress.ip_network(
+            (int(self._net.network_address) + slot * self._step, self._prefix)))
+
+    def release(self, project: str):
+        with self._lock:
+            slot = self._slot_of.pop(project, None)
+            if slot is not None:
+                self._slots[slot] = 0
+
+    def free(self) -> int:
+        with self._lock:
+            return self._slots.count(0)
+
+    def __len__(self):
+        return len(self._slots)
+
+
+class Allocator:
+    """Host ports, Docker hosts and instance slots, handed out under one lock.
+
+    Ports are a bitmap over port_start..port_end, reserved at registration
+    and freed when the team is deleted; ports something else already
+    publishes are skipped (unless `check_ports` is off: instances publish
+    nothing). Each Docker host has an instance capacity (its memory over
+    `instance_memory_mb`, capped by its max=) and, with `subnet_pool`, a
+    SubnetPool. A new instance is placed on the healthy host with the
+    lowest load that still has room; when none has, teams wait in
+    registration order and start as capacity frees up. Wakes and admin
+    restarts stay on their host and are not held back.
+
+    The first host also runs the warm pool, whose instances count against
+    it; with `first_host_only` (a shared database only it can reach) every
+    instance is placed there.
+    """
+
+    def __init__(self, port_start: int, port_end: int, hosts: dict, pool, *,
+                 count_instances, placed, queued, launch, project_of,
+                 instance_memory_mb: int = 0, admit_percent: int = 100,
+                 check_seconds: float = 15, subnet_pool: str = '', subnet_prefix: int = 24,
+                 check_ports: bool = True, first_host_only: bool = False):
+        self.hosts              = hosts
+        self.default_host       = next(iter(hosts.values()))
+        self.pool               = pool
+        self.count_instances    = count_instances
+        self.placed             = placed
+        self.queued             = queued
+        self.launch             = launch
+        self.project_of         = project_of
+        self.instance_memory_mb = instance_memory_mb
+        self.admit_percent      = admit_percent
+        self.check_seconds      = check_seconds
+        self.subnet_pool        = subnet_pool
+        self.subnet_prefix      = subnet_prefix
+        self.check_ports        = check_ports
+        self.first_host_only    = first_host_only
+        self._lock       = threading.Lock()
+        self._port_start = port_start
+        self._ports      = bytearray(max(0, port_end - port_start + 1))
+        self._waiting    = deque()      # (team, port), registration order
+
+    # -- startup and host health -------------------------------------------
+
+    def start(self, teams: list):
+        with self._lock:
+            for t in teams:
+                self._mark_port(t['port'], 1)
+        for host in self.hosts.values():
+            if not self.subnet_pool:
+                break
+            if host['engine'] is None:
+                logging.warning('NETWORK_SUBNET_POOL ignored: it needs the Docker Engine API')
+                break
+            host['subnets'] = host['engine'].subnets = SubnetPool(
+                self.subnet_pool, self.subnet_prefix)
+            try:
+                host['subnets'].recover(host['engine'].client)
+            except (DockerError, OSError) as exc:
+                logging.warning('Allocator: could not list networks on %s: %s',
+                                host['name'], exc)
+        for host in self.hosts.values():
+            self._check_host(host)
+            logging.info('Allocator: host %s (%s) %s, room for %s instances (%d MB), %s subnets',
+                         host['name'], host['endpoint'],
+                         'up' if host['healthy'] else f'unreachable: {host["error"]}',
+                         'unlimited' if host['capacity'] is None else host['capacity'],
+                         host['memory_mb'], len(host['subnets'] or ()) or 'Docker-managed')
+        # Teams still waiting from before a restart keep their place
+        with self._lock:
+            self._waiting.extend((t['name'], t['port']) for t in sorted(
+                (t for t in teams if t['status'] == 'waiting'), key=lambda t: t['created_at']))
+        threading.Thread(target=self._health_loop, name='host-health', daemon=True).start()
+        self.kick()
+
+    def _check_host(self, host: dict):
+        """Ping a host and refresh its memory and capacity."""
+        try:
+            if host['engine']:
+                host['engine'].client.get('/_ping')
+                memory = host['engine'].client.info().get('MemTotal', 0)
+            else:
+                out = subprocess.run(host['cli'] + ['info', '--format', '{{.MemTotal}}'],
+                                     capture_output=True, text=True, timeout=10)
+                if out.returncode != 0:
+                    raise RuntimeError(out.stderr.strip() or 'docker info failed')
+                memory = int(out.stdout.strip() or 0)
+        except (DockerError, OSError, RuntimeError, ValueError,
+                subprocess.SubprocessError) as exc:
+            if host['healthy']:
+                logging.error('Docker host %s is unreachable: %s', host['name'], exc)
+            host['healthy'], host['error'] = False, str(exc)
+            return
+        if not host['healthy']:
+            logging.info('Docker host %s is back', host['name'])
+        host['healthy'], host['error'] = True, ''
+        host['memory_mb'] = memory >> 20
+        capacity = None
+        if self.instance_memory_mb > 0 and host['memory_mb']:
+            capacity = (host['memory_mb'] * self.admit_percent // 100
+                        // self.instance_memory_mb)
+        if host['max']:
+            capacity = host['max'] if capacity is None else min(capacity, host['max'])
+        host['capacity'] = capacity
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.check_seconds)
+            for host in self.hosts.values():
+                self._check_host(host)
+            if self._waiting:
+                self.kick()             # a host came back, or grew
+
+    # -- ports -----------------------------------------------------------
+
+    def _mark_port(self, port: int, value: int):
+        i = port - self._port_start
+        if 0 <= i < len(self._ports):
+            self._ports[i] = value
+
+    def _published_ports(self) -> set:
+        """Host ports already bound by containers on any host."""
+        if not self.check_ports:
+            return set()        # instances publish nothing
+        found = set()
+        for host in self.hosts.values():
+            if not host['engine'] or not host['healthy']:
+                continue
+            try:
+                found |= {p['PublicPort'] for c in host['engine'].client.list_containers([])
+                          for p in c.get('Ports') or [] if p.get('PublicPort')}
+            except (DockerError, OSError) as exc:
+                logging.warning('Allocator: could not list published ports on %s: %s',
+                                host['name'], exc)
+        return found
+
+    def _bindable(self, port: int) -> bool:
+        """False if a process in our network namespace (the host's, outside
+        a container) already listens on the port."""
+        if not self.check_ports:
+            return True
+        with socket.socket() as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.bind(('0.0.0.0', port))
+                return True
+            except OSError:
+                return False
+
+    def reserve_port(self):
+        """Lowest free port in the range, now reserved; None when all are taken."""
+        published = self._published_ports()
+        with self._lock:
+            i = 0
+            while True:
+                i = self._ports.find(0, i)
+                if i < 0:
+                    return None
+                port = self._port_start + i
+                if port not in published and self._bindable(port):
+                    self._ports[i] = 1
+                    return port
+                i += 1
+
+    def release_port(self, port: int):
+        with self._lock:
+            self._mark_port(port, 0)
+
+    # -- placement and admission -------------------------------------------
+
+    def _holding(self) -> dict:
+        """{host name: instances taking memory there}, teams' and the warm pool's."""
+        counts = dict.fromkeys(self.hosts, 0)
+        for host, count in self.count_instances().items():
+            counts[host if host in self.hosts else self.default_host['name']] += count
+        warm = self.pool.snapshot()
+        counts[self.default_host['name']] += warm['ready'] + warm['booting']
+        return counts
+
+    @staticmethod
+    def _room(host: dict, holding: dict) -> int:
+        """New instances that fit on a host right now (a large number when unlimited)."""
+        if not host['healthy']:
+            return 0
+        room = 1 << 30
+        if host['capacity'] is not None:
+            room = min(room, host['capacity'] - holding[host['name']])
+        if host['subnets']:
+            room = min(room, host['subnets'].free())
+        return room
+
+    def _place(self):
+        """The least-loaded healthy host with room, or None. Lock held."""
+        holding = self._holding()
+        best    = None
+        for host in ([self.default_host] if self.first_host_only else self.hosts.values()):
+            if self._room(host, holding) <= 0:
+                continue
+            load = (holding[host['name']] / (host['capacity'] or 1 << 30), holding[host['name']])
+            if best is None or load < best[0]:
+                best = (load, host)
+        return best[1] if best else None
+
+    def spare(self) -> int:
+        """Room on the warm pool's host once every waiting team has started."""
+        with self._lock:
+            return self._room(self.default_host, self._holding()) - len(self._waiting)
+
+    def _fits(self, team_name: str) -> bool:
+        """Place the team if its instance fits somewhere (taking its subnet
+        there); lock held. A ready warm instance always fits: binding it
+        moves it from the pool to the team."""
+        if self.pool.snapshot()['ready'] and self.default_host['healthy']:
+            host = self.default_host
+        else:
+            host = self._place()
+            if host is None:
+                return False
+            if host['subnets']:
+                host['subnets'].reserve(self.project_of(team_name))
+        self.placed(team_name, host['name'])
+        return True
+
+    def admit(self, team_name: str, port: int) -> bool:
+        """Place the team and mark it 'starting' if its instance fits, else
+        queue it as 'waiting'."""
+        with self._lock:
+            if not self._waiting and self._fits(team_name):
+                return True
+            if all(t != team_name for t, _ in self._waiting):
+                self._waiting.append((team_name, port))
+            self.queued(team_name)
+        logging.info('Team %s waiting for capacity (%d in line)', team_name, len(self._waiting))
+        return False
+
+    def kick(self):
+        """Start waiting teams that fit now; call after an instance went away."""
+        while True:
+            with self._lock:
+                if not self._waiting or not self._fits(self._waiting[0][0]):
+                    break
+                team_name, port = self._waiting.popleft()
+            self.launch(team_name, port)
+        self.pool.refill()
+
+    def forget(self, team_name: str):
+        """Drop a team from the waiting line (deleted, stopped or restarted by admin)."""
+        with self._lock:
+            self._waiting = deque((t, p) for t, p in self._waiting if t != team_name)
+
+    def position(self, team_name: str):
+        """1-based place in the waiting line, or None."""
+        with self._lock:
+            for i, (t, _) in enumerate(self._waiting, 1):
+                if t == team_name:
+                    return i
+        return None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            holding = self._holding()
+            return {'waiting':    len(self._waiting),
+                    'ports_free': self._ports.count(0),
+                    'ports':      len(self._ports),
+                    'hosts':      [{'name':         h['name'],
+                                    'healthy':      h['healthy'],
+                                    'error':        h['error'],
+                                    'holding':      holding[h['name']],
+                                    'capacity':     h['capacity'],
+                                    'subnets_free': h['subnets'].free() if h['subnets'] else 0,
+                                    'subnets':      len(h['subnets'] or ())}
+                                   for h in self.hosts.values()]}
@@ -0,0 +1,125 @@
+"""
+Control channel — web workers calling into the orchestrator process.
+
+JSON over HTTP/1.1 on a unix socket. The server exposes a dict of plain
+functions; the client makes them look like local calls. Arguments and
+results must be JSON-serialisable; an exception in a handler comes back as
+ControlError, as does an unreachable server.
+
+  ControlServer({'launch': launch_instance}, 'data/control.sock').serve_forever()
+  control = ControlClient('data/control.sock')
+  control.launch('team', 8001)          # -> launch_instance('team', 8001)
+
+Knows nothing about the manager itself; see MANAGER_ROLE in app.py.
+"""
+
+import http.client
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+from http.server import BaseHTTPRequestHandler
+
+
+class ControlError(Exception):
+    pass
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+class ControlClient:
+    """Calls handlers on a ControlServer, over a small pool of kept-alive
+    connections (LIFO, like the SQLite pool)."""
+
+    def __init__(self, path: str, timeout: float = 30, pool_size: int = 8):
+        self.path    = path
+        self.timeout = timeout
+        self._idle   = queue.LifoQueue(maxsize=pool_size)
+
+    def call(self, name: str, *args):
+        body = json.dumps(args).encode()
+        while True:
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = _UnixConnection(self.path, self.timeout), False
+            try:
+                conn.request('POST', f'/{name}', body, {'Content-Type': 'application/json'})
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                # A kept-alive connection may have been closed by a restarted
+                # server: nothing was delivered, so sending again is safe
+                if reused:
+                    continue
+                raise ControlError(f'{name}: orchestrator unreachable: {exc}') from exc
+            try:
+                resp = conn.getresponse()
+                data = json.loads(resp.read() or b'null')
+            except (OSError, http.client.HTTPException, ValueError) as exc:
+                # The call may have run: never repeat it (launches, deletes...)
+                conn.close()
+                raise ControlError(f'{name}: no reply from the orchestrator: {exc}') from exc
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+            if resp.status != 200:
+                raise ControlError(f'{name}: {data.get("error") if isinstance(data, dict) else data}')
+            return data
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args: self.call(name, *args)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        fn = self.server.handlers.get(self.path.lstrip('/'))
+        try:
+            args = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'[]')
+            if fn is None:
+                status, result = 404, {'error': f'no such call {self.path!r}'}
+            else:
+                status, result = 200, fn(*args)
+        except Exception as exc:
+            logging.exception('Control call %s failed', self.path)
+            status, result = 500, {'error': f'{type(exc).__name__}: {exc}'}
+        body = json.dumps(result, separators=(',', ':')).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ControlServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, handlers: dict, path: str):
+        self.handlers = handlers
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o600)
+
+    def get_request(self):
+        # Unix sockets have no peer address; BaseHTTPRequestHandler wants one
+        conn, _ = super().get_request()
+        return conn, ('control', 0)
@@ -0,0 +1,800 @@
+"""
+Minimal Docker Engine API client + compose runner for the CTF manager.
+
+Talks HTTP/1.1 to a Docker daemon (unix socket, or tcp:// with optional TLS)
+with one keep-alive connection per thread, instead of forking `docker` / `docker compose` for
+every lifecycle call. The challenge compose file is parsed once into a
+ComposeModel; each team's project is rendered from it by substituting that
+team's environment (PORT, FLAG_*), the way `docker compose` would.
+
+Only the compose features the challenge uses are supported (image, build,
+ports, volumes, environment, depends_on, healthcheck, command, entrypoint,
+restart, top-level named volumes). Anything else is rejected when the file
+is loaded, so the manager can fall back to the docker CLI.
+
+Containers, networks and volumes carry the same com.docker.compose.* labels
+as the compose CLI, so `docker compose -p ctf_<team> ps/down` and the
+challenge/scripts/*.sh helpers keep working on projects started here.
+"""
+
+import hashlib
+import http.client
+import json
+import logging
+import os
+import re
+import shlex
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import quote, urlencode
+
+API_VERSION = 'v1.41'       # Docker Engine 20.10+
+
+# ---------------------------------------------------------------------------
+# HTTP client
+# ---------------------------------------------------------------------------
+
+
+class DockerError(Exception):
+    """Engine API request failed (non-2xx response or unusable reply)."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f'{status}: {message}')
+        self.status  = status
+        self.message = message
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self._socket_path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self._socket_path)
+        self.sock = sock
+
+
+def context_endpoint(name: str, config_dir: str = None):
+    """(host URL, TLS directory or None) of a `docker context`, from its metadata."""
+    config_dir = config_dir or os.environ.get('DOCKER_CONFIG') or os.path.expanduser('~/.docker')
+    digest     = hashlib.sha256(name.encode()).hexdigest()
+    with open(os.path.join(config_dir, 'contexts', 'meta', digest, 'meta.json'),
+              encoding='utf-8') as fh:
+        endpoint = json.load(fh)['Endpoints']['docker']
+    tls_dir = os.path.join(config_dir, 'contexts', 'tls', digest, 'docker')
+    return endpoint['Host'], tls_dir if os.path.isdir(tls_dir) else None
+
+
+class DockerClient:
+    """Engine API client, one keep-alive connection per thread.
+
+    `endpoint` is a unix socket path (or unix:// URL) or a tcp://host:port
+    URL; with `tls_dir` (ca.pem, cert.pem, key.pem, as for `docker
+    --tlsverify`) a tcp endpoint is spoken to over TLS.
+    """
+
+    def __init__(self, endpoint: str = '/var/run/docker.sock',
+                 api_version: str = API_VERSION, timeout: float = 60,
+                 tls_dir: str = None):
+        self.endpoint    = endpoint
+        self.api_version = api_version
+        self.timeout     = timeout
+        self._local      = threading.local()
+        self._tls        = None
+        if endpoint.startswith(('tcp://', 'http://', 'https://')):
+            hostport = endpoint.split('://', 1)[1].rstrip('/')
+            host, sep, port = hostport.rpartition(':')
+            self._host = host if sep else hostport
+            self._port = int(port if sep else (2376 if tls_dir else 2375))
+            if tls_dir:
+                self._tls = ssl.create_default_context(cafile=os.path.join(tls_dir, 'ca.pem'))
+                self._tls.load_cert_chain(os.path.join(tls_dir, 'cert.pem'),
+                                          os.path.join(tls_dir, 'key.pem'))
+            self.socket_path = None
+        else:
+            self.socket_path = endpoint[len('unix://'):] if endpoint.startswith('unix://') else endpoint
+
+    def _new_connection(self, timeout):
+        if self.socket_path:
+            return _UnixHTTPConnection(self.socket_path, timeout)
+        if self._tls:
+            return http.client.HTTPSConnection(self._host, self._port, timeout=timeout,
+                                               context=self._tls)
+        return http.client.HTTPConnection(self._host, self._port, timeout=timeout)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._new_connection(self.timeout)
+            self._local.used = False
+        return conn
+
+    def _url(self, path: str, params: dict = None) -> str:
+        url = f'/{self.api_version}{path}'
+        if params:
+            url += '?' + urlencode({k: json.dumps(v) if isinstance(v, dict) else v
+                                    for k, v in params.items()})
+        return url
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    def request(self, method: str, path: str, params: dict = None, body=None,
+                ok: tuple = (200, 201, 204, 304), raw: bool = False):
+        """Send one request; return the decoded JSON body, or text if raw / not JSON."""
+        url     = self._url(path, params)
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        while True:
+            conn   = self._connection()
+            reused = self._local.used
+            try:
+                conn.request(method, url, body=payload, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (OSError, http.client.HTTPException):
+                self._drop_connection()
+                # The daemon may close an idle keep-alive connection; retry
+                # once on a fresh one, but never mask a failure on a new socket.
+                if reused:
+                    continue
+                raise
+            self._local.used = True
+            if resp.will_close:
+                self._drop_connection()
+            break
+
+        if resp.status not in ok:
+            try:
+                message = json.loads(data).get('message', '')
+            except (ValueError, AttributeError):
+                message = data.decode(errors='replace').strip()
+            raise DockerError(resp.status, message or resp.reason)
+        if not data:
+            return None
+        if not raw and 'json' in (resp.getheader('Content-Type') or ''):
+            return json.loads(data)
+        return data.decode(errors='replace')
+
+    def stream(self, path: str, params: dict = None):
+        """Yield JSON objects from a streaming endpoint (e.g. /events).
+
+        Uses its own connection with no read timeout; closing the generator
+        closes the connection.
+        """
+        conn = self._new_connection(None)
+        try:
+            conn.request('GET', self._url(path, params))
+            resp = conn.getresponse()
+            if resp.status != 200:
+                raise DockerError(resp.status, resp.read().decode(errors='replace').strip())
+            for line in resp:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+    def get(self, path: str, **kw):
+        return self.request('GET', path, **kw)
+
+    def post(self, path: str, **kw):
+        return self.request('POST', path, **kw)
+
+    def delete(self, path: str, **kw):
+        return self.request('DELETE', path, **kw)
+
+    # -- objects ---------------------------------------------------------
+
+    def inspect_container(self, ident: str):
+        """Container JSON, or None if it does not exist."""
+        try:
+            return self.get(f'/containers/{quote(ident)}/json')
+        except DockerError as exc:
+            if exc.status == 404:
+                return None
+            raise
+
+    def info(self) -> dict:
+        """Daemon-wide facts: MemTotal, NCPU, …"""
+        return self.get('/info') or {}
+
+    def list_containers(self, labels: list) -> list:
+        return self.get('/containers/json',
+                        params={'all': 1, 'filters': {'label': labels}}) or []
+
+    def start_container(self, ident: str):
+        # 304 = already running
+        self.post(f'/containers/{quote(ident)}/start')
+
+    def stop_container(self, ident: str, timeout: int = 10):
+        # 304 = already stopped
+        self.post(f'/containers/{quote(ident)}/stop', params={'t': timeout}, ok=(204, 304))
+
+    def pause_container(self, ident: str):
+        # 409 = not running, or already paused
+        self.post(f'/containers/{quote(ident)}/pause', ok=(204, 409))
+
+    def unpause_container(self, ident: str):
+        # 409 = not paused
+        self.post(f'/containers/{quote(ident)}/unpause', ok=(204, 409))
+
+    def stats(self, ident: str) -> dict:
+        """One resource sample of a container: cpu_stats, memory_stats, networks."""
+        return self.get(f'/containers/{quote(ident)}/stats',
+                        params={'stream': 0, 'one-shot': 1}) or {}
+
+    def rx_bytes(self, ident: str) -> int:
+        """Bytes received on all of a container's networks (0 if not running)."""
+        stats = self.stats(ident)
+        return sum(n.get('rx_bytes', 0) for n in (stats.get('networks') or {}).values())
+
+    def remove_container(self, ident: str):
+        self.delete(f'/containers/{quote(ident)}', params={'force': 1, 'v': 1},
+                    ok=(200, 204, 404))
+
+    def connect_network(self, network: str, container: str, aliases: list = None):
+        # 403/409 = already connected
+        self.post(f'/networks/{quote(network)}/connect', ok=(200, 403, 409), body={
+            'Container':      container,
+            'EndpointConfig': {'Aliases': aliases or []},
+        })
+
+    def disconnect_network(self, network: str, container: str):
+        self.post(f'/networks/{quote(network)}/disconnect', ok=(200, 404),
+                  body={'Container': container, 'Force': True})
+
+    def exec(self, ident: str, cmd: list, env: dict = None):
+        """Run a command in a running container; returns (exit code, output)."""
+        ex = self.post(f'/containers/{quote(ident)}/exec', body={
+            'Cmd':          cmd,
+            'Env':          [f'{k}={v}' for k, v in (env or {}).items()],
+            'AttachStdout': True,
+            'AttachStderr': True,
+        })
+        # Output comes back as a multiplexed stream; callers only log it
+        out  = self.post(f'/exec/{ex["Id"]}/start', body={'Detach': False, 'Tty': False},
+                         raw=True) or ''
+        info = self.get(f'/exec/{ex["Id"]}/json')
+        return info.get('ExitCode'), out
+
+    def has_image(self, name: str) -> bool:
+        try:
+            self.get(f'/images/{quote(name, safe="")}/json')
+            return True
+        except DockerError as exc:
+            if exc.status == 404:
+                return False
+            raise
+
+    def pull_image(self, name: str):
+        repo, tag = name, 'latest'
+        if ':' in name.rsplit('/', 1)[-1]:
+            repo, tag = name.rsplit(':', 1)
+        # Streams newline-delimited JSON progress; errors arrive in-band
+        out = self.post('/images/create', params={'fromImage': repo, 'tag': tag}, raw=True)
+        for line in (out or '').splitlines():
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            if 'error' in msg:
+                raise DockerError(500, f'pull {name}: {msg["error"]}')
+
+# ---------------------------------------------------------------------------
+# Compose model
+# ---------------------------------------------------------------------------
+
+_VAR_NAME = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+def interpolate(value: str, env: dict) -> str:
+    """Compose-style variable substitution: $VAR, ${VAR}, ${VAR:-default},
+    ${VAR-default}, ${VAR:?error}, ${VAR:+alt}, and $$ for a literal $.
+    Defaults may contain balanced braces, e.g. ${FLAG:-CTF{test}}.
+    """
+    out, i, n = [], 0, len(value)
+    while i < n:
+        c = value[i]
+        if c != '$':
+            out.append(c)
+            i += 1
+        elif value.startswith('$$', i):
+            out.append('$')
+            i += 2
+        elif value.startswith('${', i):
+            depth, j = 1, i + 2
+            while j < n and depth:
+                if value[j] == '{':
+                    depth += 1
+                elif value[j] == '}':
+                    depth -= 1
+                j += 1
+            if depth:
+                raise ValueError(f'unterminated ${{ in {value!r}')
+            out.append(_expand(value[i + 2:j - 1], env))
+            i = j
+        else:
+            m = _VAR_NAME.match(value, i + 1)
+            if m:
+                out.append(env.get(m.group(0), ''))
+                i = m.end()
+            else:
+                out.append('$')
+                i += 1
+    return ''.join(out)
+
+
+def _expand(expr: str, env: dict) -> str:
+    m = _VAR_NAME.match(expr)
+    if not m:
+        raise ValueError(f'invalid substitution ${{{expr}}}')
+    name, rest = m.group(0), expr[m.end():]
+    val = env.get(name)
+    if not rest:
+        return val or ''
+    for op in (':-', ':?', ':+', '-', '?', '+'):
+        if rest.startswith(op):
+            arg   = interpolate(rest[len(op):], env)
+            unset = val is None or (op[0] == ':' and val == '')
+            if op[-1] == '-':
+                return arg if unset else val
+            if op[-1] == '?':
+                if unset:
+                    raise ValueError(f'{name}: {arg or "required variable is missing"}')
+                return val
+            return '' if unset else arg
+    raise ValueError(f'invalid substitution ${{{expr}}}')
+
+
+def _interpolate_tree(node, env: dict):
+    if isinstance(node, str):
+        return interpolate(node, env)
+    if isinstance(node, list):
+        return [_interpolate_tree(v, env) for v in node]
+    if isinstance(node, dict):
+        return {k: _interpolate_tree(v, env) for k, v in node.items()}
+    return node
+
+
+_DURATION = re.compile(r'(\d+(?:\.\d+)?)(ns|us|ms|s|m|h)')
+_NS       = {'ns': 1, 'us': 10**3, 'ms': 10**6, 's': 10**9, 'm': 60 * 10**9, 'h': 3600 * 10**9}
+
+
+def _duration_ns(value) -> int:
+    """'1m30s' / '500ms' / 5 (seconds) -> nanoseconds."""
+    if isinstance(value, (int, float)):
+        return int(value * 10**9)
+    total, pos = 0, 0
+    for m in _DURATION.finditer(value):
+        if m.start() != pos:
+            break
+        total += int(float(m.group(1)) * _NS[m.group(2)])
+        pos = m.end()
+    if pos != len(value) or not value:
+        raise ValueError(f'invalid duration {value!r}')
+    return total
+
+
+class ComposeModel:
+    """A compose file parsed once; render() produces per-project container specs."""
+
+    SERVICE_KEYS = {'image', 'build', 'ports', 'volumes', 'environment', 'depends_on',
+                    'healthcheck', 'command', 'entrypoint', 'restart'}
+    TOP_KEYS     = {'services', 'volumes', 'version', 'name'}
+
+    def __init__(self, data: dict, project_dir: str, config_file: str = ''):
+        self.project_dir = project_dir
+        self.config_file = config_file
+        if not isinstance(data, dict) or not isinstance(data.get('services'), dict):
+            raise ValueError('compose file has no services')
+        extra = set(data) - self.TOP_KEYS - {k for k in data if k.startswith('x-')}
+        if extra:
+            raise ValueError(f'unsupported top-level keys: {", ".join(sorted(extra))}')
+        self.services = data['services']
+        self.volumes  = data.get('volumes') or {}
+        for name, svc in self.services.items():
+            extra = set(svc) - self.SERVICE_KEYS
+            if extra:
+                raise ValueError(f'service {name}: unsupported keys: {", ".join(sorted(extra))}')
+            if 'image' not in svc:
+                raise ValueError(f'service {name}: an image name is required '
+                                 f'(build it once with `docker compose build`)')
+        self.order = self._start_order()
+
+    @classmethod
+    def load(cls, path: str, project_dir: str = None):
+        try:
+            import yaml
+        except ImportError as exc:
+            raise ImportError('PyYAML is required to parse the compose file') from exc
+        with open(path, encoding='utf-8') as fh:
+            try:
+                data = yaml.safe_load(fh)
+            except yaml.YAMLError as exc:
+                raise ValueError(f'{path}: {exc}') from exc
+        return cls(data, project_dir or os.path.dirname(os.path.abspath(path)), path)
+
+    @staticmethod
+    def _depends(svc: dict) -> dict:
+        """{service: condition} from either depends_on syntax."""
+        deps = svc.get('depends_on') or {}
+        if isinstance(deps, list):
+            return {d: 'service_started' for d in deps}
+        return {d: (opts or {}).get('condition', 'service_started') for d, opts in deps.items()}
+
+    def _start_order(self) -> list:
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f'dependency cycle: {" -> ".join(path + [name])}')
+            if name not in self.services:
+                raise ValueError(f'{path[-1]} depends on unknown service {name}')
+            state[name] = 'visiting'
+            for dep in self._depends(self.services[name]):
+                visit(dep, path + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.services:
+            visit(name, [])
+        return order
+
+    # -- rendering -------------------------------------------------------
+
+    def labels(self, project: str, **extra) -> dict:
+        labels = {'com.docker.compose.project': project,
+                  'com.docker.compose.project.working_dir': self.project_dir}
+        if self.config_file:
+            labels['com.docker.compose.project.config_files'] = self.config_file
+        labels.update({f'com.docker.compose.{k}': v for k, v in extra.items()})
+        return labels
+
+    def volume_name(self, project: str, name: str) -> str:
+        spec = self.volumes.get(name) or {}
+        if spec.get('external'):
+            return spec.get('name', name)
+        return spec.get('name') or f'{project}_{name}'
+
+    def network_name(self, project: str) -> str:
+        return f'{project}_default'
+
+    def _mount(self, project: str, vol) -> str:
+        if isinstance(vol, dict):
+            src, dst = vol.get('source', ''), vol['target']
+            mode = 'ro' if vol.get('read_only') else ''
+        else:
+            parts = vol.split(':')
+            if len(parts) == 1:
+                return parts[0]           # anonymous volume; handled by the daemon
+            src, dst, mode = parts[0], parts[1], (parts[2] if len(parts) > 2 else '')
+        if src.startswith(('.', '/', '~')):
+            src = os.path.normpath(os.path.join(self.project_dir, os.path.expanduser(src)))
+        else:
+            if src not in self.volumes:
+                raise ValueError(f'undeclared volume {src}')
+            src = self.volume_name(project, src)
+        return f'{src}:{dst}' + (f':{mode}' if mode else '')
+
+    @staticmethod
+    def _ports(ports: list):
+        exposed, bindings = {}, {}
+        for p in ports or []:
+            if isinstance(p, dict):
+                key  = f'{p["target"]}/{p.get("protocol", "tcp")}'
+                host = {'HostIp': p.get('host_ip', ''), 'HostPort': str(p.get('published', ''))}
+            else:
+                spec, _, proto = str(p).partition('/')
+                parts = spec.rsplit(':', 2)
+                key   = f'{parts[-1]}/{proto or "tcp"}'
+                host  = {'HostIp': parts[0] if len(parts) == 3 else '',
+                         'HostPort': parts[-2] if len(parts) >= 2 else ''}
+            exposed[key] = {}
+            bindings.setdefault(key, []).append(host)
+        return exposed, bindings
+
+    @staticmethod
+    def _env_list(environment, env: dict) -> list:
+        if isinstance(environment, list):
+            items = [e.split('=', 1) if '=' in e else [e, None] for e in environment]
+        else:
+            items = list((environment or {}).items())
+        out = []
+        for k, v in items:
+            if v is None:
+                if k not in env:
+                    continue          # bare KEY: pass through only if set
+                v = env[k]
+            out.append(f'{k}={"" if v is None else v}')
+        return out
+
+    @staticmethod
+    def _healthcheck(hc: dict):
+        if hc.get('disable'):
+            return {'Test': ['NONE']}
+        test = hc.get('test')
+        if isinstance(test, str):
+            test = ['CMD-SHELL', test]
+        out = {'Test': test}
+        for key, api in (('interval', 'Interval'), ('timeout', 'Timeout'),
+                         ('start_period', 'StartPeriod')):
+            if key in hc:
+                out[api] = _duration_ns(hc[key])
+        if 'retries' in hc:
+            out['Retries'] = int(hc['retries'])
+        return out
+
+    @staticmethod
+    def _restart(policy: str):
+        name, _, count = (policy or 'no').partition(':')
+        out = {'Name': '' if name == 'no' else name}
+        if count:
+            out['MaximumRetryCount'] = int(count)
+        return out
+
+    def _named_volumes(self, svc: dict) -> list:
+        out = []
+        for vol in svc.get('volumes') or []:
+            if isinstance(vol, dict):
+                src = vol.get('source', '')
+            else:
+                parts = vol.split(':')
+                src   = parts[0] if len(parts) > 1 else ''
+            if src in self.volumes:
+                out.append(src)
+        return out
+
+    def render(self, project: str, env: dict, network: str = None,
+               labels: dict = None, publish: bool = True) -> list:
+        """Container specs for one project, in start order.
+
+        Each spec is {'service', 'name', 'image', 'build', 'depends', 'volumes',
+        'body'}; body is the POST /containers/create payload, including a
+        config-hash label used to decide whether an existing container can be
+        reused. `network` joins the containers to another project's network;
+        `labels` are added to every container (outside the config hash).
+        With publish=False, `ports` are exposed but not bound on the host.
+        """
+        network = network or self.network_name(project)
+        specs   = []
+        for name in self.order:
+            svc = _interpolate_tree(self.services[name], env)
+            exposed, bindings = self._ports(svc.get('ports'))
+            if not publish:
+                bindings = {}
+            body = {
+                'Image':        svc['image'],
+                'Env':          self._env_list(svc.get('environment'), env),
+                'ExposedPorts': exposed,
+                'HostConfig': {
+                    'PortBindings':  bindings,
+                    'Binds':         [self._mount(project, v) for v in svc.get('volumes') or []],
+                    'NetworkMode':   network,
+                    'RestartPolicy': self._restart(svc.get('restart')),
+                },
+                'NetworkingConfig': {'EndpointsConfig': {network: {'Aliases': [name]}}},
+            }
+            for key, api in (('command', 'Cmd'), ('entrypoint', 'Entrypoint')):
+                if key in svc:
+                    val = svc[key]
+                    body[api] = shlex.split(val) if isinstance(val, str) else val
+            if 'healthcheck' in svc:
+                body['Healthcheck'] = self._healthcheck(svc['healthcheck'])
+            config_hash = hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+            body['Labels'] = {**(labels or {}),
+                              **self.labels(project, service=name, oneoff='False',
+                                            **{'container-number': '1',
+                                               'config-hash': config_hash})}
+            specs.append({
+                'service': name,
+                'name':    f'{project}-{name}-1',
+                'image':   svc['image'],
+                'build':   'build' in svc,
+                'depends': self._depends(svc),
+                'volumes': self._named_volumes(svc),
+                'body':    body,
+            })
+        return specs
+
+# ---------------------------------------------------------------------------
+# Compose runner
+# ---------------------------------------------------------------------------
+
+
+class ComposeEngine:
+    """`docker compose up -d / down -v / ps` for one model, over the Engine API."""
+
+    def __init__(self, model: ComposeModel, client: DockerClient,
+                 health_timeout: float = 180, poll_interval: float = 1.0,
+                 publish_ports: bool = True, subnets=None):
+        self.model          = model
+        self.client         = client
+        self.publish_ports  = publish_ports
+        # Optional subnet allocator: acquire(project) -> CIDR for the project
+        # network, release(project) once that network is removed
+        self.subnets        = subnets
+        self.health_timeout = health_timeout
+        self.poll_interval  = poll_interval
+        self._images_ok     = set()
+
+    def _project_labels(self, project: str, service: str = None) -> list:
+        labels = [f'com.docker.compose.project={project}']
+        if service:
+            labels.append(f'com.docker.compose.service={service}')
+        return labels
+
+    def _ensure_network(self, project: str):
+        name = self.model.network_name(project)
+        try:
+            self.client.get(f'/networks/{quote(name)}')
+            return
+        except DockerError as exc:
+            if exc.status != 404:
+                raise
+        body = {'Name': name, 'Labels': self.model.labels(project, network='default')}
+        subnet = self.subnets.acquire(project) if self.subnets else None
+        if subnet:
+            body['IPAM'] = {'Driver': 'default', 'Config': [{'Subnet': subnet}]}
+        try:
+            self.client.post('/networks/create', body=body, ok=(200, 201, 409))
+        except (DockerError, OSError):
+            if subnet:
+                self.subnets.release(project)
+            raise
+
+    def _ensure_volumes(self, project: str, names):
+        for vol in names:
+            if (self.model.volumes.get(vol) or {}).get('external'):
+                continue
+            # Idempotent: returns the existing volume if already there
+            self.client.post('/volumes/create', body={
+                'Name':   self.model.volume_name(project, vol),
+                'Labels': self.model.labels(project, volume=vol),
+            })
+
+    def _ensure_image(self, spec: dict):
+        image = spec['image']
+        if image in self._images_ok:
+            return
+        if not self.client.has_image(image):
+            if spec['build']:
+                raise DockerError(404, f'image {image} not found — build it once with '
+                                       f'`docker compose build` in the challenge directory')
+            logging.info('Pulling image %s', image)
+            self.client.pull_image(image)
+        self._images_ok.add(image)
+
+    def _wait_for(self, ident: str, condition: str):
+        """Block until a dependency satisfies its depends_on condition."""
+        deadline = time.monotonic() + self.health_timeout
+        while True:
+            info  = self.client.inspect_container(ident)
+            state = (info or {}).get('State') or {}
+            if condition == 'service_completed_successfully':
+                if state.get('Status') == 'exited':
+                    if state.get('ExitCode') == 0:
+                        return
+                    raise DockerError(500, f'{ident} exited with code {state.get("ExitCode")}')
+            elif condition == 'service_healthy':
+                health = (state.get('Health') or {}).get('Status')
+                if health == 'healthy':
+                    return
+                if health == 'unhealthy':
+                    raise DockerError(500, f'{ident} is unhealthy')
+                if state.get('Status') in ('exited', 'dead'):
+                    raise DockerError(500, f'{ident} exited before becoming healthy')
+            elif state.get('Running'):
+                return
+            if time.monotonic() > deadline:
+                raise DockerError(504, f'timed out waiting for {ident} ({condition})')
+            time.sleep(self.poll_interval)
+
+    def up(self, project: str, env: dict, services: list = None, network: str = None,
+           labels: dict = None, peers: dict = None):
+        """Create (or reuse) and start services, honouring depends_on.
+
+        By default every service runs on the project's own network. With
+        `services`, only those are started; dependencies outside the set must
+        be named in `peers` ({service: container name}), e.g. when `network`
+        points at another project that already runs them.
+        """
+        specs = self.model.render(project, env, network=network, labels=labels,
+                                  publish=self.publish_ports)
+        if services is not None:
+            specs = [s for s in specs if s['service'] in services]
+        for spec in specs:
+            self._ensure_image(spec)
+        if network is None:
+            self._ensure_network(project)
+        self._ensure_volumes(project, {v for s in specs for v in s['volumes']})
+
+        existing = {c['Labels'].get('com.docker.compose.service'): c
+                    for c in self.client.list_containers(self._project_labels(project))}
+        names = {**(peers or {}), **{s['service']: s['name'] for s in specs}}
+        for spec in specs:
+            for dep, condition in spec['depends'].items():
+                self._wait_for(names[dep], condition)
+            current = existing.get(spec['service'])
+            wanted  = spec['body']['Labels']['com.docker.compose.config-hash']
+            if current and current['Labels'].get('com.docker.compose.config-hash') != wanted:
+                self.client.remove_container(current['Id'])
+                current = None
+            if current is None:
+                self.client.post('/containers/create', params={'name': spec['name']},
+                                 body=spec['body'])
+            self.client.start_container(spec['name'])
+
+    def wait_ready(self, project: str, services: list):
+        """Block until the services run (and are healthy, if they have a healthcheck)."""
+        for name in services:
+            condition = ('service_healthy' if 'healthcheck' in self.model.services[name]
+                         else 'service_started')
+            self._wait_for(f'{project}-{name}-1', condition)
+
+    def attach(self, project: str, container: str, aliases: list):
+        """Connect an outside container to the project's network under `aliases`."""
+        self._ensure_network(project)
+        self.client.connect_network(self.model.network_name(project), container, aliases)
+
+    def project_label(self, project: str, key: str):
+        """Value of a label on any of the project's containers, or None."""
+        for c in self.client.list_containers(self._project_labels(project)):
+            if key in (c.get('Labels') or {}):
+                return c['Labels'][key]
+        return None
+
+    def down(self, project: str):
+        """Remove the project's containers, network and volumes (`down -v`)."""
+        labels = self._project_labels(project)
+        for c in self.client.list_containers(labels):
+            self.client.remove_container(c['Id'])
+        nets = self.client.get('/networks', params={'filters': {'label': labels}}) or []
+        for net in nets:
+            # Outside containers joined with attach() would block the removal
+            info = self.client.get(f'/networks/{net["Id"]}', ok=(200, 404)) or {}
+            for ident in info.get('Containers') or {}:
+                self.client.disconnect_network(net['Id'], ident)
+            self.client.delete(f'/networks/{net["Id"]}', ok=(200, 204, 404))
+        if self.subnets:
+            self.subnets.release(project)
+        vols = (self.client.get('/volumes', params={'filters': {'label': labels}})
+                or {}).get('Volumes') or []
+        for vol in vols:
+            self.client.delete(f'/volumes/{quote(vol["Name"])}', ok=(200, 204, 404))
+
+    def service_state(self, project: str, service: str) -> str:
+        """Lowercase container state ('running', 'created', 'exited', …) or ''."""
+        found = self.client.list_containers(self._project_labels(project, service))
+        return (found[0].get('State') or '').lower() if found else ''
+
+    def start_service(self, project: str, service: str):
+        self.client.start_container(f'{project}-{service}-1')
+
+    def _by_start_order(self, project: str, reverse: bool = False) -> list:
+        rank = {s: i for i, s in enumerate(self.model.order)}
+        found = self.client.list_containers(self._project_labels(project))
+        return sorted(found, reverse=reverse, key=lambda c: rank.get(
+            (c.get('Labels') or {}).get('com.docker.compose.service'), -1))
+
+    def stop(self, project: str):
+        """`docker compose stop`: dependents first; containers and data are kept."""
+        for c in self._by_start_order(project, reverse=True):
+            self.client.stop_container(c['Id'])
+
+    def pause(self, project: str):
+        for c in self._by_start_order(project, reverse=True):
+            self.client.pause_container(c['Id'])
+
+    def unpause(self, project: str):
+        for c in self._by_start_order(project):
+            self.client.unpause_container(c['Id'])
@@ -0,0 +1,87 @@
+"""
+gunicorn settings for the multi-worker mode (WORKERS > 0 in app.py).
+
+`python app.py` execs gunicorn with this file plus --workers/--threads.
+Workers run app.py with MANAGER_ROLE=web. Before they start, the arbiter
+spawns `python app.py` with MANAGER_ROLE=orchestrator — the one process
+that drives Docker — waits until its control socket answers, and restarts
+it if it dies. It is stopped with the arbiter.
+"""
+
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+bind         = '0.0.0.0:80'
+worker_class = 'gthread'
+raw_env      = ['MANAGER_ROLE=web']
+# Live-update streams stay open for minutes; workers are busy, not stuck
+timeout      = 60
+graceful_timeout = 10
+
+_HERE          = os.path.dirname(os.path.abspath(__file__))
+_START_TIMEOUT = 120
+_RESTART_DELAY = 1
+
+_orchestrator = None
+_stopping     = threading.Event()
+
+
+def _spawn():
+    env = dict(os.environ, MANAGER_ROLE='orchestrator')
+    return subprocess.Popen([sys.executable, os.path.join(_HERE, 'app.py')],
+                            cwd=_HERE, env=env)
+
+
+def _wait_ready(proc, path: str):
+    deadline = time.time() + _START_TIMEOUT
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'orchestrator exited with {proc.returncode}')
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.connect(path)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'orchestrator did not open {path} in {_START_TIMEOUT}s')
+
+
+def _supervise():
+    global _orchestrator
+    while not _stopping.is_set():
+        # The arbiter reaps every child, so the exit status is not reliable here
+        _orchestrator.wait()
+        if _stopping.is_set():
+            return
+        logging.error('Orchestrator process exited; restarting')
+        time.sleep(_RESTART_DELAY)
+        _orchestrator = _spawn()
+
+
+def on_starting(server):
+    global _orchestrator
+    # One epoch for every process of this run: live-update ids and ETags
+    # made by one worker must be understood by the others
+    os.environ.setdefault('MANAGER_EPOCH', os.urandom(4).hex())
+    path = os.environ['CONTROL_SOCKET']
+    if os.path.exists(path):
+        os.unlink(path)         # left by a crash; would look ready
+    _orchestrator = _spawn()
+    _wait_ready(_orchestrator, path)
+    server.log.info('Orchestrator running (pid %d) on %s', _orchestrator.pid, path)
+    threading.Thread(target=_supervise, name='orchestrator', daemon=True).start()
+
+
+def on_exit(server):
+    _stopping.set()
+    if _orchestrator and _orchestrator.poll() is None:
+        _orchestrator.terminate()
+        try:
+            _orchestrator.wait(10)
+        except subprocess.TimeoutExpired:
+            _orchestrator.kill()
@@ -0,0 +1,255 @@
+"""
+Idle hibernation — put instances nobody uses to sleep, wake them on return.
+
+An instance counts as active while its team uses the manager (touch(), on
+every logged-in request) or while its web container receives traffic (the
+rx byte counter, sampled once a minute, and every `poll_seconds` while
+paused). After `idle_seconds` without either it is stopped (memory freed,
+woken by the team's next manager visit) or paused (memory kept, woken in
+milliseconds, also by traffic to the instance URL).
+
+Team rows, readiness tracking and the proxy stay the caller's; the
+hibernator works through callbacks:
+
+  hibernator = Hibernator(3600, 'pause', 2, orchestrator, engine_api=True,
+                          engine_of=engine_of, project_of=project_of, teams=teams,
+                          port_of=port_of, set_status=set_status,
+                          start_instance=start_instance, until_ready=until_ready,
+                          on_sleep=on_sleep, on_freed=on_freed)
+  hibernator.start(teams)
+  hibernator.touch('team')              # activity; wakes it if asleep
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from docker_api import DockerError
+from scheduler import PRIO_WAKE
+from warm_pool import POOL_LABEL
+
+# How often running instances' traffic counters are sampled for the idle check
+_SWEEP_SECONDS = 60
+
+
+class Hibernator:
+    """Puts idle team instances to sleep and wakes them when the team is back.
+
+    Teams used to idle instances for hours on long events, holding their
+    MySQL and Apache memory. Activity comes from two places: touch(), called
+    on every logged-in manager request, and the web container's rx byte
+    counter, sampled once a minute (and every `poll_seconds` while paused).
+    A hibernated team has status 'hibernated'; waking goes through the
+    orchestrator ahead of registrations and is timed.
+
+    Callbacks: engine_of(team) -> ComposeEngine of its host; project_of(team)
+    -> compose project; teams() -> rows of teams on reachable hosts;
+    port_of(team) -> port, or None once deleted; set_status(team, status);
+    start_instance(team, port) brings a stopped instance up;
+    until_ready(team, start) runs start() as the team's launch and returns
+    once it is up (or failed); on_sleep(team) before its containers go
+    down; on_freed() once a stopped instance released its memory.
+    """
+
+    def __init__(self, idle_seconds: float, mode: str, poll_seconds: float, orchestrator, *,
+                 engine_api: bool, engine_of, project_of, teams, port_of, set_status,
+                 start_instance, until_ready, on_sleep, on_freed):
+        self.idle_seconds   = idle_seconds
+        self.mode           = mode
+        self.poll_seconds   = poll_seconds
+        self.orchestrator   = orchestrator
+        self.engine_api     = engine_api
+        self.engine_of      = engine_of
+        self.project_of     = project_of
+        self.teams          = teams
+        self.port_of        = port_of
+        self.set_status     = set_status
+        self.start_instance = start_instance
+        self.until_ready    = until_ready
+        self.on_sleep       = on_sleep
+        self.on_freed       = on_freed
+        self.enabled        = False
+        self._lock          = threading.Lock()
+        self._last          = {}      # team -> time of last activity
+        self._rx            = {}      # team -> last sampled web rx_bytes
+        self._asleep        = {}      # team -> wake start time, None until woken
+        self._stopping      = set()   # hibernation in progress
+        self._latencies     = deque(maxlen=50)
+
+    def start(self, teams: list):
+        """Begin watching; teams hibernated before a restart can always be woken."""
+        for t in teams:
+            if t['status'] == 'hibernated':
+                self._asleep[t['name']] = None
+        if self.idle_seconds <= 0:
+            return
+        if not self.engine_api:
+            logging.warning('Hibernation disabled: it needs the Docker Engine API')
+            return
+        if self.mode not in ('stop', 'pause'):
+            logging.warning('Hibernation disabled: HIBERNATE_MODE must be stop or pause, not %r',
+                            self.mode)
+            return
+        self.enabled = True
+        now = time.time()
+        for t in teams:
+            self._last[t['name']] = now
+        threading.Thread(target=self._loop, name='hibernate', daemon=True).start()
+
+    def touch(self, team_name: str):
+        """Record activity; wakes the instance if it is hibernated."""
+        self._last[team_name] = time.time()
+        if team_name in self._asleep:
+            self.wake(team_name)
+
+    def _projects(self, team_name: str):
+        """(engine, projects) of a team: its own and a bound warm instance."""
+        engine  = self.engine_of(team_name)
+        project = self.project_of(team_name)
+        bound   = engine.project_label(project, POOL_LABEL)
+        return engine, [project, bound] if bound else [project]
+
+    def _loop(self):
+        last_sweep = time.time()
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                if self.mode == 'pause':
+                    self._check_paused()
+                if time.time() - last_sweep >= _SWEEP_SECONDS:
+                    last_sweep = time.time()
+                    self._sweep()
+            except Exception as exc:
+                logging.warning('Hibernation check failed: %s', exc)
+
+    def _traffic(self, team_name: str) -> bool:
+        """True if the team's web container received anything since the last sample."""
+        rx = self.engine_of(team_name).client.rx_bytes(f'{self.project_of(team_name)}-web-1')
+        old, self._rx[team_name] = self._rx.get(team_name), rx
+        return old is not None and rx != old
+
+    def _sweep(self):
+        now = time.time()
+        for t in self.teams():
+            name = t['name']
+            if t['status'] != 'ready' or name in self._asleep:
+                continue
+            if self._traffic(name):
+                self._last[name] = now
+            idle = now - self._last.setdefault(name, now)
+            if idle >= self.idle_seconds:
+                self.hibernate(name, idle)
+
+    def _check_paused(self):
+        with self._lock:
+            sleeping = [t for t, woke in self._asleep.items()
+                        if woke is None and t not in self._stopping]
+        for name in sleeping:
+            if self._traffic(name):
+                logging.info('Traffic to hibernated instance of %s', name)
+                self.touch(name)
+
+    def hibernate(self, team_name: str, idle: float = 0):
+        with self._lock:
+            if team_name in self._asleep:
+                return
+            self._asleep[team_name] = None
+            self._stopping.add(team_name)
+        # Before the containers go down, so the watcher doesn't flag them
+        self.on_sleep(team_name)
+        self.set_status(team_name, 'hibernated')
+        try:
+            engine, projects = self._projects(team_name)
+            for project in projects:
+                if self.mode == 'pause':
+                    engine.pause(project)
+                else:
+                    engine.stop(project)
+            # Paused counters keep their value; stopped ones restart from 0
+            self._rx.pop(team_name, None)
+            if self.mode == 'pause':
+                self._traffic(team_name)
+            logging.info('Team %s hibernated (%s) after %.0f min idle',
+                         team_name, self.mode, idle / 60)
+        except (DockerError, OSError) as exc:
+            logging.error('Hibernating %s failed: %s', team_name, exc)
+        finally:
+            with self._lock:
+                self._stopping.discard(team_name)
+                woken = self._asleep.get(team_name) is not None
+        if woken:
+            self._submit_wake(team_name)
+        elif self.mode == 'stop':
+            self.on_freed()             # its memory is free for waiting teams
+
+    def wake(self, team_name: str):
+        with self._lock:
+            if self._asleep.get(team_name, 0) is not None:
+                return                          # awake, or already waking
+            self._asleep[team_name] = time.time()
+            stopping = team_name in self._stopping
+        self.set_status(team_name, 'starting')
+        if not stopping:                        # else hibernate() submits it when done
+            self._submit_wake(team_name)
+
+    def waking(self, team_name: str) -> bool:
+        return self._asleep.get(team_name) is not None
+
+    def _submit_wake(self, team_name: str):
+        port = self.port_of(team_name)
+        if port is None:
+            self.forget(team_name)
+            return
+        if self.mode == 'pause' and self.engine_api:
+            threading.Thread(target=self._wake_job, args=(team_name, port),
+                             daemon=True).start()
+        else:
+            self.orchestrator.submit(team_name, partial(self._wake_job, team_name, port),
+                                     PRIO_WAKE)
+
+    def _unpause(self, team_name: str):
+        engine, projects = self._projects(team_name)
+        for project in projects:
+            engine.unpause(project)
+
+    def _wake_job(self, team_name: str, port: int):
+        def start():
+            try:
+                if self.mode == 'pause' and self.engine_api:
+                    self._unpause(team_name)
+                else:
+                    self.start_instance(team_name, port)
+            except (DockerError, OSError) as exc:
+                logging.error('Waking %s failed: %s', team_name, exc)
+
+        self.until_ready(team_name, start)
+        with self._lock:
+            started = self._asleep.pop(team_name, None)
+        self._last[team_name] = time.time()
+        self._rx.pop(team_name, None)
+        if started:
+            latency = time.time() - started
+            self._latencies.append(latency)
+            logging.info('Team %s woke in %.1fs', team_name, latency)
+
+    def forget(self, team_name: str):
+        """Drop a team that an admin stops, restarts or deletes (unpausing it first)."""
+        with self._lock:
+            asleep = self._asleep.pop(team_name, 0) is None
+        self._last.pop(team_name, None)
+        self._rx.pop(team_name, None)
+        if asleep and self.mode == 'pause' and self.engine_api:
+            try:
+                self._unpause(team_name)
+            except (DockerError, OSError) as exc:
+                logging.warning('Unpausing %s failed: %s', team_name, exc)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            asleep = sum(1 for woke in self._asleep.values() if woke is None)
+            lat    = sorted(self._latencies)
+        return {'enabled': self.enabled, 'mode': self.mode, 'asleep': asleep,
+                'wakes': len(lat), 'wake_p50': lat[len(lat) // 2] if lat else None,
+                'wake_max': lat[-1] if lat else None}
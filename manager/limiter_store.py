@@ -0,0 +1,88 @@
+"""
+SQLite storage for flask-limiter — rate limits shared by every process.
+
+The default memory:// storage counts per process, so with several web
+workers each one would allow the full limit. Importing this module registers
+a `sqlite://<path>` storage scheme with the `limits` library that keeps
+fixed-window counters in a small SQLite file instead: one UPSERT per hit,
+WAL mode, no durability (a crash just forgets the current windows).
+
+  import limiter_store  # noqa: F401
+  Limiter(..., storage_uri='sqlite://data/ratelimit.db')
+"""
+
+import sqlite3
+import threading
+import time
+
+from limits.storage import Storage
+
+# Expired windows are deleted every this many hits
+_PRUNE_EVERY = 1000
+
+
+class SQLiteStorage(Storage):
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        self.path   = uri.split('://', 1)[1]
+        self._local = threading.local()
+        self._hits  = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS windows (
+                key     TEXT PRIMARY KEY,
+                count   INTEGER NOT NULL,
+                expires REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute('PRAGMA busy_timeout = 5000')
+        return conn
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        now = time.time()
+        self._hits += 1
+        if self._hits % _PRUNE_EVERY == 0:
+            self._conn().execute('DELETE FROM windows WHERE expires <= ?', (now,))
+        # A window that has run out starts over
+        return self._conn().execute("""
+            INSERT INTO windows (key, count, expires) VALUES (:key, :amount, :expires)
+            ON CONFLICT (key) DO UPDATE SET
+                count   = CASE WHEN expires <= :now THEN :amount  ELSE count + :amount END,
+                expires = CASE WHEN expires <= :now THEN :expires ELSE expires END
+            RETURNING count
+        """, {'key': key, 'amount': amount, 'expires': now + expiry, 'now': now}).fetchone()[0]
+
+    def get(self, key: str) -> int:
+        row = self._conn().execute('SELECT count FROM windows WHERE key = ? AND expires > ?',
+                                   (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        row = self._conn().execute('SELECT expires FROM windows WHERE key = ? AND expires > ?',
+                                   (key, time.time())).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._conn().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        return self._conn().execute('DELETE FROM windows').rowcount
+
+    def clear(self, key: str) -> None:
+        self._conn().execute('DELETE FROM windows WHERE key = ?', (key,))
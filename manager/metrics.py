@@ -0,0 +1,163 @@
+"""
+Prometheus-style metrics — counters, histograms and gauges, rendered in the
+text exposition format for a /metrics endpoint.
+
+Recording is a dict lookup and an add under one lock, cheap enough for every
+request and every database block. Gauges are callbacks read at export time,
+so the paths they describe do no counting at all.
+
+Each process keeps its own Registry. export() gives a JSON-able copy of it,
+and render() sums the copies of several processes into one page:
+
+  registry = Registry()
+  latency  = registry.histogram('http_seconds', 'Request latency', ['endpoint'])
+  latency.observe(0.012, 'dashboard')
+  render([registry.export(), export_from_another_process])
+"""
+
+import bisect
+import logging
+import math
+import threading
+
+# Seconds; from a cached page to a slow request
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help: str, labels):
+        self.name    = name
+        self.help    = help
+        self.labels  = list(labels)
+        self._lock   = threading.Lock()
+        self._values = {}       # label values (tuple) -> value
+
+    def export(self) -> dict:
+        with self._lock:
+            samples = [[list(k), list(v) if isinstance(v, list) else v]
+                       for k, v in self._values.items()]
+        return {'type': self.kind, 'help': self.help, 'labels': self.labels,
+                'samples': samples}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Histogram(_Metric):
+    """Per label set: a count per bucket (the last one is +Inf), then the sum."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = list(buckets)
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i]  += 1
+            counts[-1] += value
+
+    def export(self) -> dict:
+        return {**super().export(), 'buckets': self.buckets}
+
+
+class Gauge(_Metric):
+    """Read from fn() at export time: {label values (tuple): value}."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, labels, fn):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def export(self) -> dict:
+        try:
+            values = self.fn()
+        except Exception:
+            logging.exception('Reading gauge %s failed', self.name)
+            values = {}
+        return {'type': self.kind, 'help': self.help, 'labels': self.labels,
+                'samples': [[list(k), v] for k, v in values.items()]}
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric: _Metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, labels, fn) -> Gauge:
+        return self._add(Gauge(name, help, labels, fn))
+
+    def export(self) -> dict:
+        return {name: m.export() for name, m in self._metrics.items()}
+
+
+def _merge(exports: list) -> dict:
+    merged = {}
+    for export in exports:
+        for name, m in export.items():
+            into = merged.setdefault(name, {**m, 'samples': {}})
+            for labels, value in m['samples']:
+                key = tuple(labels)
+                old = into['samples'].get(key)
+                if old is None:
+                    into['samples'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(old, list):
+                    into['samples'][key] = [a + b for a, b in zip(old, value)]
+                else:
+                    into['samples'][key] = old + value
+    return merged
+
+
+def _number(v) -> str:
+    if v == math.inf:
+        return '+Inf'
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def _label_set(pairs) -> str:
+    if not pairs:
+        return ''
+    esc = lambda v: str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    return '{' + ','.join(f'{k}="{esc(v)}"' for k, v in pairs) + '}'
+
+
+def render(exports: list) -> str:
+    """Prometheus text format (version 0.0.4) of the sum of several exports."""
+    lines = []
+    for name, m in sorted(_merge(exports).items()):
+        lines.append(f'# HELP {name} {m["help"]}')
+        lines.append(f'# TYPE {name} {m["type"]}')
+        for key in sorted(m['samples'], key=lambda k: tuple(map(str, k))):
+            value = m['samples'][key]
+            pairs = list(zip(m['labels'], key))
+            if m['type'] != 'histogram':
+                lines.append(f'{name}{_label_set(pairs)} {_number(value)}')
+                continue
+            running = 0
+            for bound, n in zip(m['buckets'] + [math.inf], value[:-1]):
+                running += n
+                lines.append(f'{name}_bucket{_label_set(pairs + [("le", _number(bound))])} {running}')
+            lines.append(f'{name}_sum{_label_set(pairs)} {_number(value[-1])}')
+            lines.append(f'{name}_count{_label_set(pairs)} {running}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,154 @@
+"""
+Password hashing — bcrypt off the request threads, with a bounded queue.
+
+Each bcrypt hash costs a few hundred ms of CPU. PasswordHasher runs them on
+a small process pool, at most `workers` at a time, and sheds what doesn't
+fit in the queue with HasherBusy, so a login rush gets quick 503s with a
+Retry-After instead of slowing every other request down.
+
+  hasher = PasswordHasher(workers=2, max_pending=32, rounds=12)
+  hasher.start()                        # before any other thread exists
+  password_hash = hasher.hash(b'secret')
+  hasher.check(b'secret', password_hash)
+  hasher.hash_later(b'secret', save)    # save(password_hash) in the background
+"""
+
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f'password hashing queue full, retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+def _timed(fn, *args):
+    """Run fn in a pool process; returns (result, seconds it took there)."""
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+
+def hash_rounds(password_hash: str):
+    """Cost factor of a '$2b$12$...' hash, or None."""
+    parts = password_hash.split('$')
+    return int(parts[2]) if len(parts) > 3 and parts[2].isdigit() else None
+
+
+class PasswordHasher:
+    """bcrypt on a small process pool with a bounded queue.
+
+    Each hash costs a few hundred ms of CPU. With hundreds of request threads,
+    a login rush would run them all at once and slow every other request;
+    here at most `workers` run at a time, up to `max_pending` wait, and the
+    rest are shed with HasherBusy (a 503 with Retry-After).
+
+    The pool is forked once, before other threads exist. Should it break
+    later, hashing moves to the request threads, `workers` at a time:
+    forking a new pool then would copy locks other threads hold.
+    """
+
+    def __init__(self, workers: int, max_pending: int, rounds: int):
+        self.workers     = workers
+        self.max_pending = max(1, max_pending)
+        self.rounds      = rounds
+        self._pool       = None
+        self._lock       = threading.Lock()
+        # Hashes run at once in request threads once the pool has broken
+        self._slots      = threading.Semaphore(workers) if workers else nullcontext()
+        self.pending     = 0
+        self.peak        = 0
+        self.shed        = 0
+        self._durations  = deque(maxlen=200)
+
+    def start(self):
+        """Fork the pool processes. Call before any other thread starts."""
+        if self.workers:
+            self._pool = self._new_pool()
+
+    def _new_pool(self):
+        pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'))
+        pool.submit(int).result()       # forks every process now
+        return pool
+
+    def _in_thread(self, fn, *args):
+        with self._slots:
+            return _timed(fn, *args)
+
+    def hash(self, password: bytes) -> str:
+        return self._run(bcrypt.hashpw, password, bcrypt.gensalt(self.rounds)).decode()
+
+    def check(self, password: bytes, password_hash: str) -> bool:
+        return self._run(bcrypt.checkpw, password, password_hash.encode())
+
+    def hash_later(self, password: bytes, done) -> bool:
+        """Hash in the background and call done(password_hash), if a worker is idle.
+
+        For work nobody waits on: it never queues behind requests, and is
+        skipped (False) while every worker is busy.
+        """
+        with self._lock:
+            if self.pending >= max(1, self.workers):
+                return False
+
+        def run():
+            try:
+                password_hash = self.hash(password)
+            except HasherBusy:
+                return                  # filled up meanwhile
+            try:
+                done(password_hash)
+            except Exception:
+                logging.exception('Background password hash callback failed')
+
+        threading.Thread(target=run, name='hash-later', daemon=True).start()
+        return True
+
+    def _hash_seconds(self) -> float:
+        return sum(self._durations) / len(self._durations) if self._durations else 0.3
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.shed += 1
+                waves = self.pending // max(1, self.workers) + 1
+                raise HasherBusy(max(1, math.ceil(waves * self._hash_seconds())))
+            self.pending += 1
+            self.peak = max(self.peak, self.pending)
+        try:
+            pool = self._pool
+            if pool is None:
+                result, took = self._in_thread(fn, *args)
+            else:
+                try:
+                    result, took = pool.submit(_timed, fn, *args).result()
+                except BrokenProcessPool:
+                    # A pool process died (OOM killer?)
+                    with self._lock:
+                        if self._pool is pool:
+                            logging.error('Password hashing pool broke; hashing in request '
+                                          'threads until the manager restarts')
+                            self._pool = None
+                            pool.shutdown(wait=False)
+                    result, took = self._in_thread(fn, *args)
+            self._durations.append(took)
+            return result
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'workers': self.workers, 'broken': bool(self.workers) and self._pool is None,
+                    'pending': self.pending, 'queue': self.max_pending,
+                    'peak': self.peak, 'shed': self.shed, 'rounds': self.rounds,
+                    'hash_ms': round(self._hash_seconds() * 1000) if self._durations else None}
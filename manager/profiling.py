@@ -0,0 +1,116 @@
+"""
+Sampling profiler — every thread's Python stack, a few hundred times a
+second, for as long as asked.
+
+One background thread reads sys._current_frames() each interval and counts
+the stacks it sees. Nothing is hooked into the code being profiled, so the
+cost is the sampling thread itself, and only while it runs. Threads parked
+in a wait (locks, events, selectors) are skipped, so idle workers don't
+bury the busy ones. In 'cpu' mode (the default) so is any thread whose CPU
+clock did not move since the previous sample — sleeping loops, blocking
+I/O, waiting for the GIL; 'wall' mode keeps those, to see where a slow
+request waits.
+
+Results are folded stacks, one line per distinct stack with its sample
+count — the input of flamegraph.pl, speedscope and inferno:
+
+  sampler = Sampler(interval=0.005)
+  sampler.run_until(time.time() + 30, mode='cpu')
+  ...
+  open('profile.folded', 'w').write(folded(sampler.take()))
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# Leaf frames of a thread that is blocked, not working
+IDLE_FRAMES = frozenset({
+    'Condition.wait', 'Event.wait', 'Semaphore.acquire', 'Thread._wait_for_tstate_lock',
+    'EpollSelector.select', '_PollLikeSelector.select', 'SelectSelector.select',
+    'KqueueSelector.select', 'socket.accept', '_worker',
+})
+
+
+def _frame_name(code) -> str:
+    return f'{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class Sampler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples  = 0           # stacks counted since the last take()
+        self.mode     = 'cpu'
+        self._lock    = threading.Lock()
+        self._counts  = Counter()
+        self._until   = 0.0
+        self._thread  = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def run_until(self, until: float, mode: str = 'cpu'):
+        """Sample until the wall-clock time `until`; moves the end if running."""
+        with self._lock:
+            self._until = until
+            self.mode   = mode
+            if not self.running and until > time.time():
+                self._thread = threading.Thread(target=self._loop, name='profiler', daemon=True)
+                self._thread.start()
+
+    def take(self) -> Counter:
+        """The counts gathered so far, and start over."""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self.samples = 0
+        return counts
+
+    def _loop(self):
+        me  = threading.get_ident()
+        cpu = {}        # thread -> its CPU clock at the previous sample
+        while time.time() < self._until:
+            names  = {t.ident: re.sub(r'\d+', 'N', t.name) for t in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me or frame.f_code.co_qualname in IDLE_FRAMES:
+                    continue
+                if self.mode == 'cpu':
+                    try:
+                        now = time.clock_gettime(time.pthread_getcpuclockid(ident))
+                    except (OSError, OverflowError):
+                        continue            # exited meanwhile
+                    ran, cpu[ident] = now - cpu.get(ident, now), now
+                    if ran < self.interval / 20:
+                        continue            # woke up at most for a moment
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, 'thread'))
+                stacks.append(';'.join(reversed(stack)))
+            with self._lock:
+                self._counts.update(stacks)
+                self.samples += len(stacks)
+            time.sleep(self.interval)
+
+
+def folded(counts: Counter) -> str:
+    """Folded-stack text of stack counts, heaviest first."""
+    return ''.join(f'{stack} {n}\n' for stack, n in counts.most_common())
+
+
+def top_frames(counts: Counter, limit: int = 20) -> list:
+    """[(frame, self samples, total samples)] — where time goes, for a quick look."""
+    own, total = Counter(), Counter()
+    for stack, n in counts.items():
+        frames = stack.split(';')[1:]
+        if not frames:
+            continue
+        own[frames[-1]] += n
+        for f in set(frames):
+            total[f] += n
+    return [(f, n, total[f]) for f, n in own.most_common(limit)]
@@ -0,0 +1,354 @@
+"""
+Asyncio reverse proxy — one port in front of every team instance.
+
+Routes <team>.<domain> to the team's web container over the Docker network,
+so instances don't need to publish host ports. Each team gets its own host
+name, hence its own origin: the sites use root-absolute links, and a team
+that owns its instance must not be able to script another team's pages or
+read its cookies, which a shared origin with per-team path prefixes would
+allow. HTTP/1.1 keep-alive on both sides, a small pool of idle
+upstream connections per instance, and bodies streamed through in both
+directions (Content-Length, chunked or close-delimited) without buffering.
+
+The proxy knows nothing about Docker or the manager's database: the caller
+supplies resolve(team) -> (status, (host, port) or None) and
+on_request(team). While a team's status is 'starting' or 'hibernated' a
+request waits (up to wake_timeout) for the instance to come up, so the
+first hit on a sleeping instance wakes it and is then served.
+
+  proxy = InstanceProxy(resolve, on_request, domain='ctf.example')
+  proxy.start('0.0.0.0', 8080)        # background thread with its own loop
+"""
+
+import asyncio
+import logging
+import re
+import threading
+import time
+
+MAX_HEAD_BYTES = 64 * 1024
+_CHUNK         = 64 * 1024
+_TEAM          = re.compile(r'[a-z0-9_-]{1,32}')
+# Transfer-Encoding is hop-by-hop too, but chunked bodies are relayed with
+# their framing intact, so the header has to go along with them
+_HOP_BY_HOP    = {'connection', 'keep-alive', 'proxy-connection', 'proxy-authenticate',
+                  'proxy-authorization', 'te', 'trailer', 'upgrade', 'expect'}
+_WAITING       = ('starting', 'hibernated')
+_REASONS       = {400: 'Bad Request', 404: 'Not Found', 431: 'Request Header Fields Too Large',
+                  502: 'Bad Gateway', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+def _header(headers: list, name: str, default=None):
+    name = name.lower()
+    for k, v in headers:
+        if k.lower() == name:
+            return v
+    return default
+
+
+async def _read_head(reader: asyncio.StreamReader, timeout: float):
+    """(start line, [(name, value)]) of the next message."""
+    data  = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+    lines = data[:-4].decode('latin-1').split('\r\n')
+    headers = []
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if not sep or not name or name != name.strip():
+            raise ValueError(f'malformed header line {line!r}')
+        headers.append((name, value.strip()))
+    return lines[0], headers
+
+
+async def _copy(reader, writer, n: int):
+    while n > 0:
+        data = await reader.read(min(n, _CHUNK))
+        if not data:
+            raise ConnectionError('connection closed mid-body')
+        writer.write(data)
+        n -= len(data)
+        await writer.drain()
+
+
+async def _relay_body(reader, writer, headers: list, until_close: bool = False):
+    """Stream one message body from reader to writer, framing included."""
+    if 'chunked' in _header(headers, 'transfer-encoding', '').lower():
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            writer.write(line)
+            size = int(line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                while True:                     # trailers, then the blank line
+                    line = await reader.readuntil(b'\r\n')
+                    writer.write(line)
+                    if line == b'\r\n':
+                        break
+                break
+            await _copy(reader, writer, size + 2)
+    elif _header(headers, 'content-length') is not None:
+        await _copy(reader, writer, int(_header(headers, 'content-length')))
+    elif until_close:
+        while True:
+            data = await reader.read(_CHUNK)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    await writer.drain()
+
+
+def _has_body(headers: list) -> bool:
+    return ('chunked' in _header(headers, 'transfer-encoding', '').lower()
+            or int(_header(headers, 'content-length', '0') or 0) > 0)
+
+
+class InstanceProxy:
+    def __init__(self, resolve, on_request=None, *, domain: str, pool_size: int = 8,
+                 idle_timeout: float = 60, upstream_timeout: float = 60,
+                 connect_timeout: float = 5, wake_timeout: float = 60, route_ttl: float = 15):
+        self.resolve          = resolve
+        self.on_request       = on_request
+        self.domain           = domain.lower().strip('.')
+        self.pool_size        = pool_size
+        self.idle_timeout     = idle_timeout
+        self.upstream_timeout = upstream_timeout
+        self.connect_timeout  = connect_timeout
+        self.wake_timeout     = wake_timeout
+        self.route_ttl        = route_ttl
+        self.stats            = {'requests': 0, 'upstream_opened': 0, 'upstream_reused': 0,
+                                 'errors': 0, 'client_connections': 0}
+        self._idle    = {}      # (host, port) -> [(reader, writer, idle since)]
+        self._routes  = {}      # team -> ((host, port), expires)
+        self._touched = {}      # team -> last on_request call
+        self._loop    = None
+
+    # -- lifecycle -------------------------------------------------------
+
+    async def serve(self, host: str, port: int):
+        self._loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self._client, host, port, limit=MAX_HEAD_BYTES)
+        logging.info('Instance proxy listening on %s:%s (*.%s)', host, port, self.domain)
+        async with server:
+            await server.serve_forever()
+
+    def start(self, host: str, port: int):
+        threading.Thread(target=lambda: asyncio.run(self.serve(host, port)),
+                         name='instance-proxy', daemon=True).start()
+        return self
+
+    def forget(self, team: str):
+        """Drop a cached route (thread-safe), e.g. when the team's containers change."""
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._routes.pop, team, None)
+
+    # -- routing ---------------------------------------------------------
+
+    def _route(self, host: str):
+        """The team a Host header names, or None."""
+        name = host.split(':', 1)[0].lower()
+        if name.endswith('.' + self.domain):
+            team = name[:-len(self.domain) - 1]
+            if _TEAM.fullmatch(team):
+                return team
+        return None
+
+    async def _resolve(self, team: str):
+        """(host, port), or (None, status) once the team is gone or didn't come up.
+
+        A team that exists is touched first (waking it, if hibernated); a
+        name that is no team is not, so made-up names leave nothing behind.
+        """
+        hit = self._routes.get(team)
+        if hit and hit[1] > time.monotonic():
+            self._touch(team)
+            return hit[0], 'ready'
+        loop     = asyncio.get_running_loop()
+        deadline = time.monotonic() + self.wake_timeout
+        touched  = False
+        while True:
+            status, addr = await loop.run_in_executor(None, self.resolve, team)
+            if status is not None and not touched:
+                self._touch(team)
+                touched = True
+            if addr:
+                self._routes[team] = (addr, time.monotonic() + self.route_ttl)
+                return addr, status
+            if status not in _WAITING or time.monotonic() > deadline:
+                return None, status
+            await asyncio.sleep(0.5)
+
+    def _touch(self, team: str):
+        """on_request(team), at most once a second per team, off the event loop."""
+        now = time.monotonic()
+        if self.on_request and now - self._touched.get(team, 0) >= 1:
+            self._touched[team] = now
+            self._loop.run_in_executor(None, self.on_request, team)
+
+    # -- upstream pool ---------------------------------------------------
+
+    async def _acquire(self, addr):
+        idle = self._idle.get(addr)
+        while idle:
+            reader, writer, since = idle.pop()
+            if (writer.is_closing() or reader.at_eof()
+                    or time.monotonic() - since > self.idle_timeout):
+                writer.close()
+                continue
+            self.stats['upstream_reused'] += 1
+            return reader, writer, True
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(*addr),
+                                                self.connect_timeout)
+        self.stats['upstream_opened'] += 1
+        return reader, writer, False
+
+    def _release(self, addr, reader, writer):
+        idle = self._idle.setdefault(addr, [])
+        if len(idle) < self.pool_size:
+            idle.append((reader, writer, time.monotonic()))
+        else:
+            writer.close()
+
+    # -- client side -----------------------------------------------------
+
+    async def _client(self, reader, writer):
+        self.stats['client_connections'] += 1
+        try:
+            while True:
+                try:
+                    start, headers = await _read_head(reader, self.idle_timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._error(writer, 431, 'Request headers too large.', close=True)
+                    break
+                except ValueError:
+                    await self._error(writer, 400, 'Bad request.', close=True)
+                    break
+                if not await self._request(reader, writer, start, headers):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            logging.exception('Instance proxy: unexpected error')
+        finally:
+            writer.close()
+
+    async def _error(self, writer, code: int, message: str, close: bool,
+                     retry: bool = False):
+        self.stats['errors'] += 1
+        body = (f'<!doctype html><title>{code}</title>'
+                + ('<meta http-equiv="refresh" content="5">' if retry else '')
+                + f'<p>{message}</p>\n').encode()
+        head = [f'HTTP/1.1 {code} {_REASONS.get(code, "Error")}',
+                'Content-Type: text/html; charset=utf-8', f'Content-Length: {len(body)}',
+                'Cache-Control: no-store', 'Connection: ' + ('close' if close else 'keep-alive')]
+        if retry:
+            head.append('Retry-After: 5')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+        await writer.drain()
+
+    async def _request(self, reader, writer, start: str, headers: list) -> bool:
+        """Proxy one request; True if the client connection stays open."""
+        try:
+            method, target, version = start.split(' ')
+        except ValueError:
+            await self._error(writer, 400, 'Bad request.', close=True)
+            return False
+        conn   = _header(headers, 'connection', '').lower()
+        keep   = ('close' not in conn) if version == 'HTTP/1.1' else ('keep-alive' in conn)
+        body   = _has_body(headers)
+        host   = _header(headers, 'host', '')
+        team   = self._route(host)
+        # An error answered before the body was read leaves it unread: close
+        err_close = body or not keep
+        if team is None:
+            await self._error(writer, 404, 'No such instance.', close=err_close)
+            return not err_close
+
+        self.stats['requests'] += 1
+        addr, status = await self._resolve(team)
+        if addr is None:
+            if status in _WAITING:
+                await self._error(writer, 503, 'Your instance is starting. This page '
+                                  'reloads by itself.', close=err_close, retry=True)
+            else:
+                await self._error(writer, 404 if status is None else 503,
+                                  'This instance is not running.', close=err_close)
+            return not err_close
+
+        out = [f'{method} {target} HTTP/1.1']
+        out += [f'{k}: {v}' for k, v in headers if k.lower() not in _HOP_BY_HOP]
+        peer = writer.get_extra_info('peername')
+        out += [f'X-Forwarded-For: {peer[0] if peer else ""}', f'X-Forwarded-Host: {host}',
+                'X-Forwarded-Proto: http', 'Connection: keep-alive']
+        head = ('\r\n'.join(out) + '\r\n\r\n').encode('latin-1')
+        if body and '100-continue' in _header(headers, 'expect', '').lower():
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+
+        for attempt in (1, 2):
+            upstream = await self._open(addr, team, writer, err_close)
+            if upstream is None:
+                return not err_close
+            ureader, uwriter, reused = upstream
+            try:
+                uwriter.write(head)
+                if body:
+                    await _relay_body(reader, uwriter, headers)
+                await uwriter.drain()
+                while True:
+                    status_line, resp = await _read_head(ureader, self.upstream_timeout)
+                    code = int(status_line.split(' ', 2)[1])
+                    if not 100 <= code < 200:
+                        break                   # skip interim responses
+                break
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                uwriter.close()
+                if reused and not body and attempt == 1:
+                    continue                    # stale pooled connection: retry once
+                self._routes.pop(team, None)
+                await self._error(writer, 502, 'The instance closed the connection.',
+                                  close=True)
+                return False
+            except asyncio.TimeoutError:
+                uwriter.close()
+                await self._error(writer, 504, 'The instance did not answer in time.',
+                                  close=True)
+                return False
+
+        return await self._respond(writer, ureader, uwriter, addr, method, code, status_line,
+                                   resp, keep)
+
+    async def _open(self, addr, team, writer, err_close):
+        try:
+            return await self._acquire(addr)
+        except (OSError, asyncio.TimeoutError):
+            self._routes.pop(team, None)
+            await self._error(writer, 502, 'The instance is not reachable.', close=err_close)
+            return None
+
+    async def _respond(self, writer, ureader, uwriter, addr, method, code, status_line,
+                       resp, keep) -> bool:
+        no_body   = method == 'HEAD' or code in (204, 304)
+        chunked   = 'chunked' in _header(resp, 'transfer-encoding', '').lower()
+        delimited = not no_body and not chunked and _header(resp, 'content-length') is None
+        rconn     = _header(resp, 'connection', '').lower()
+        reusable  = (not delimited and 'close' not in rconn
+                     and status_line.startswith('HTTP/1.1'))
+        keep      = keep and not delimited
+
+        out = [status_line]
+        out += [f'{k}: {v}' for k, v in resp if k.lower() not in _HOP_BY_HOP]
+        out.append('Connection: ' + ('keep-alive' if keep else 'close'))
+        writer.write(('\r\n'.join(out) + '\r\n\r\n').encode('latin-1'))
+        try:
+            if not no_body:
+                await _relay_body(ureader, writer, resp, until_close=delimited)
+            else:
+                await writer.drain()
+        except BaseException:
+            uwriter.close()
+            raise
+        if reusable:
+            self._release(addr, ureader, uwriter)
+        else:
+            uwriter.close()
+        return keep
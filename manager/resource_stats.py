@@ -0,0 +1,148 @@
+"""
+Container stats — CPU, memory and network use of every team's instance.
+
+One thread per Docker host samples the Engine API's one-shot stats of each
+running compose container, a few requests at a time, and sums them per
+team for the admin page. Crash counts are fed in by the caller.
+
+  container_stats = ContainerStats(10, hosts, team_of=team_of_project)
+  container_stats.start()
+  container_stats.snapshot()['teams']   # {team: {'cpu', 'mem', 'rx', 'tx', 'containers', 'crashes'}}
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from docker_api import DockerClient, DockerError
+from warm_pool import POOL_LABEL
+
+# Stats requests in flight at once on each Docker host
+_PARALLEL = 4
+
+
+def _memory_used(mem: dict) -> int:
+    """Memory use the way `docker stats` shows it: page cache that can be dropped is left out."""
+    extra    = mem.get('stats') or {}
+    # cgroup v2 reports inactive_file, v1 total_inactive_file
+    reusable = extra.get('inactive_file', extra.get('total_inactive_file', 0))
+    return max(0, mem.get('usage', 0) - reusable)
+
+
+class ContainerStats:
+    """CPU, memory and network use of every team's instance, for the admin page.
+
+    One thread per Docker host lists all compose containers once a pass and
+    reads a one-shot stats sample of each running one, a few at a time. A
+    team's figures are summed over its project (`team_of(project)` names
+    the team, or None for other projects) and the warm instance bound to
+    it; CPU is the share of one core used since the previous pass. Each
+    pass replaces its host's figures, so the cache never outgrows the
+    containers that exist, and readers only ever copy it.
+
+    Crashes come from the caller: a container that dies while its instance
+    is up, rather than stopped by the manager, counts as one.
+    """
+
+    def __init__(self, interval: float, hosts: dict, team_of):
+        self.interval = interval
+        self.hosts    = hosts
+        self.team_of  = team_of
+        self.enabled  = False
+        self._lock    = threading.Lock()
+        self._hosts   = {}      # host name -> {team: figures} from its last pass
+        self._crashes = Counter()
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        if any(host['engine'] is None for host in self.hosts.values()):
+            logging.warning('Container stats disabled: they need the Docker Engine API')
+            return
+        self.enabled = True
+        for host in self.hosts.values():
+            threading.Thread(target=self._loop, args=(host,),
+                             name=f'stats-{host["name"]}', daemon=True).start()
+
+    def _loop(self, host: dict):
+        fetch    = ThreadPoolExecutor(_PARALLEL, thread_name_prefix=f'stats-{host["name"]}')
+        cpu      = {}       # container id -> (CPU ns, monotonic time) of its last sample
+        last_err = None
+        while True:
+            started = time.monotonic()
+            try:
+                found    = self._collect(host, fetch, cpu)
+                last_err = None
+            except (DockerError, OSError) as exc:
+                if str(exc) != last_err:
+                    logging.warning('Container stats (%s) failed: %s', host['name'], exc)
+                found, last_err = {}, str(exc)
+            with self._lock:
+                self._hosts[host['name']] = found
+            time.sleep(max(1.0, self.interval - (time.monotonic() - started)))
+
+    @staticmethod
+    def _sample(client: DockerClient, ident: str):
+        try:
+            return client.stats(ident)
+        except DockerError as exc:
+            if exc.status == 404:
+                return None             # removed since the listing
+            raise
+
+    def _collect(self, host: dict, fetch: ThreadPoolExecutor, cpu: dict) -> dict:
+        """{team: figures} of one host, from one listing and a sample per running container."""
+        client     = host['engine'].client
+        containers = client.list_containers(['com.docker.compose.project'])
+        owner      = {}     # project -> team
+        for c in containers:
+            labels  = c.get('Labels') or {}
+            project = labels.get('com.docker.compose.project', '')
+            team    = self.team_of(project)
+            if team:
+                owner[project] = team
+                if labels.get(POOL_LABEL):
+                    owner[labels[POOL_LABEL]] = team
+        running = [(owner[project], c['Id']) for c in containers
+                   if (project := (c.get('Labels') or {}).get('com.docker.compose.project')) in owner
+                   and c.get('State') in ('running', 'paused')]
+        samples = fetch.map(lambda item: (*item, self._sample(client, item[1]), time.monotonic()),
+                            running)
+        found, seen = {}, {}
+        for team, ident, stats, at in samples:
+            if stats is None:
+                continue
+            f = found.setdefault(team, {'cpu': None, 'mem': 0, 'rx': 0, 'tx': 0, 'containers': 0})
+            f['containers'] += 1
+            f['mem']        += _memory_used(stats.get('memory_stats') or {})
+            for net in (stats.get('networks') or {}).values():
+                f['rx'] += net.get('rx_bytes', 0)
+                f['tx'] += net.get('tx_bytes', 0)
+            used = ((stats.get('cpu_stats') or {}).get('cpu_usage') or {}).get('total_usage', 0)
+            seen[ident] = (used, at)
+            if ident in cpu and at > cpu[ident][1] and used >= cpu[ident][0]:
+                share    = (used - cpu[ident][0]) / 1e9 / (at - cpu[ident][1]) * 100
+                f['cpu'] = (f['cpu'] or 0) + share
+        cpu.clear()
+        cpu.update(seen)
+        return found
+
+    def crashed(self, team_name: str):
+        with self._lock:
+            self._crashes[team_name] += 1
+
+    def forget(self, team_name: str):
+        with self._lock:
+            self._crashes.pop(team_name, None)
+
+    def snapshot(self) -> dict:
+        """{'enabled', 'interval', 'teams': {team: {'cpu', 'mem', 'rx', 'tx', 'containers', 'crashes'}}}"""
+        with self._lock:
+            teams = {team: {**f, 'crashes': 0}
+                     for found in self._hosts.values() for team, f in found.items()}
+            for team, n in self._crashes.items():
+                teams.setdefault(team, {'cpu': None, 'mem': 0, 'rx': 0, 'tx': 0,
+                                        'containers': 0})['crashes'] = n
+        return {'enabled': self.enabled, 'interval': self.interval, 'teams': teams}
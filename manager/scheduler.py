@@ -0,0 +1,175 @@
+"""
+Orchestration scheduler — instance launches, a few at a time, by priority.
+
+A fixed set of worker threads runs jobs from a priority queue, leaving at
+least `stagger` seconds between two job starts so MySQL inits don't all hit
+the disk at once. Jobs are keyed (a team name, or 'pool:<project>' for
+warm-pool boots); a key is queued or running at most once, so a team that
+clicks restart five times gets one launch, plus one follow-up if it was
+already running.
+
+  orchestrator = Orchestrator(workers=4, stagger=3).start()
+  orchestrator.submit('team', partial(launch_and_poll, 'team', 8001), PRIO_REGISTER)
+  orchestrator.status('team')       # {'state': 'queued', 'position': 3, 'eta': 95}
+
+Knows nothing about Docker; a job is any callable.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+
+# Assumed launch time until real jobs have been measured
+DEFAULT_JOB_SECONDS = 45.0
+
+# Lower runs first; FIFO within a priority
+PRIO_ADMIN    = 0
+PRIO_WAKE     = 0
+PRIO_REGISTER = 1
+PRIO_POOL     = 2
+
+
+class Orchestrator:
+    """Bounded pool of workers running launch jobs from a priority queue.
+
+    Jobs are keyed (a team name, or 'pool:<project>' for warm-pool boots)
+    and at most one job per key is queued or running. Submitting a key that
+    is already queued keeps its place (or moves it up, for a higher
+    priority); submitting one that is running queues a follow-up run.
+    """
+
+    def __init__(self, workers: int, stagger: float):
+        self.workers     = max(1, workers)
+        self.stagger     = stagger
+        self._cv         = threading.Condition()
+        self._heap       = []       # [(priority, seq, key)]
+        self._seq        = 0
+        self._queued     = {}       # key -> job
+        self._running    = {}       # key -> job
+        self._last_start = 0.0
+        self._durations  = deque(maxlen=20)
+        self._started    = False
+
+    def start(self):
+        with self._cv:
+            if self._started:
+                return self
+            self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f'orch-{i}', daemon=True).start()
+        return self
+
+    def submit(self, key: str, run, priority: int = PRIO_REGISTER):
+        """Queue `run()` under `key`."""
+        with self._cv:
+            job = self._queued.get(key)
+            if job and job['priority'] <= priority:
+                job['run'] = run
+                return
+            self._seq += 1
+            job = {'key': key, 'run': run, 'priority': priority,
+                   'seq': self._seq, 'enqueued': time.time(), 'started': None}
+            # A re-prioritised job leaves its old heap entry behind; _pop skips it
+            self._queued[key] = job
+            heapq.heappush(self._heap, (priority, job['seq'], key))
+            self._cv.notify()
+
+    def cancel(self, key: str) -> bool:
+        """Drop a queued (not yet running) job. Returns True if one was removed."""
+        with self._cv:
+            return self._queued.pop(key, None) is not None
+
+    def _pop(self):
+        """Next runnable job, or None. Caller holds self._cv."""
+        skipped, job = [], None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            _, seq, key = entry
+            queued = self._queued.get(key)
+            if not queued or queued['seq'] != seq:
+                continue                    # cancelled or re-prioritised
+            if key in self._running:
+                skipped.append(entry)       # follow-up run waits for the current one
+                continue
+            job = self._queued.pop(key)
+            break
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+        return job
+
+    def _next_job(self):
+        with self._cv:
+            while True:
+                wait = self._last_start + self.stagger - time.time()
+                if wait > 0:
+                    self._cv.wait(wait)
+                    continue
+                job = self._pop()
+                if job is None:
+                    self._cv.wait()
+                    continue
+                self._last_start = job['started'] = time.time()
+                self._running[job['key']] = job
+                return job
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            logging.info('Orchestrator: launching %s (waited %.1fs)',
+                         job['key'], job['started'] - job['enqueued'])
+            try:
+                job['run']()
+            except Exception:
+                logging.exception('Orchestrator job for %s failed', job['key'])
+            with self._cv:
+                self._durations.append(time.time() - job['started'])
+                del self._running[job['key']]
+                self._cv.notify_all()
+
+    def avg_job_seconds(self) -> float:
+        with self._cv:
+            if not self._durations:
+                return DEFAULT_JOB_SECONDS
+            return sum(self._durations) / len(self._durations)
+
+    def status(self, team_name: str):
+        """{'state': 'queued'|'running', 'position', 'eta'} for a team, or None."""
+        avg = self.avg_job_seconds()
+        with self._cv:
+            if team_name in self._running:
+                job = self._running[team_name]
+                return {'state': 'running', 'position': 0,
+                        'eta': max(0, int(avg - (time.time() - job['started'])))}
+            job = self._queued.get(team_name)
+            if not job:
+                return None
+            key      = (job['priority'], job['seq'])
+            position = 1 + sum(1 for j in self._queued.values()
+                               if (j['priority'], j['seq']) < key)
+        # Jobs ahead of us run `workers` at a time, plus the stagger between starts
+        waves = (position - 1) // self.workers + 1
+        return {'state': 'queued', 'position': position,
+                'eta': int(waves * avg + position * self.stagger)}
+
+    def statuses(self) -> dict:
+        """status() of every queued or running team, in one pass."""
+        avg = self.avg_job_seconds()
+        now = time.time()
+        with self._cv:
+            out = {name: {'state': 'running', 'position': 0,
+                          'eta': max(0, int(avg - (now - job['started'])))}
+                   for name, job in self._running.items()}
+            queued = sorted(self._queued.items(),
+                            key=lambda kv: (kv[1]['priority'], kv[1]['seq']))
+        for position, (name, _) in enumerate(queued, 1):
+            waves = (position - 1) // self.workers + 1
+            out.setdefault(name, {'state': 'queued', 'position': position,
+                                  'eta': int(waves * avg + position * self.stagger)})
+        return out
+
+    def snapshot(self) -> dict:
+        with self._cv:
+            return {'running': len(self._running), 'queued': len(self._queued),
+                    'workers': self.workers}
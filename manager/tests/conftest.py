@@ -0,0 +1,47 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+MANAGER   = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHALLENGE = os.path.join(os.path.dirname(MANAGER), 'challenge')
+sys.path.insert(0, MANAGER)
+
+from bench.fake_docker import FakeDocker        # noqa: E402
+
+
+@pytest.fixture
+def fake_docker(tmp_path):
+    fake = FakeDocker(str(tmp_path / 'docker.sock'), health_delay=0.05).start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """app.py imported once, against a fake daemon and a scratch database."""
+    tmp  = tmp_path_factory.mktemp('app')
+    fake = FakeDocker(str(tmp / 'docker.sock'), health_delay=0.05).start()
+    os.environ.update({'MANAGER_DB': str(tmp / 'manager.db'),
+                       'DOCKER_SOCKET': fake.socket_path,
+                       'CTF_COMPOSE_FILE': os.path.join(CHALLENGE, 'docker-compose.yaml'),
+                       'CHALLENGE_DIR': CHALLENGE, 'LIVE_UPDATES': '0'})
+    import app
+    app.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    app.limiter.enabled = False
+    yield app
+    fake.stop()
+
+
+@pytest.fixture
+def db(app):
+    """A direct connection to the app's database, emptied before the test."""
+    conn = sqlite3.connect(app.DB_PATH)
+    for table in ('submissions', 'hint_purchases', 'name_purchases', 'teams'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.commit()
+    app.scores.load()
+    app._team_states.clear()
+    yield conn
+    conn.close()
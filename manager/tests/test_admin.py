@@ -0,0 +1,55 @@
+import pytest
+
+NAMES = ['delta', 'alpha', 'echo', 'charlie', 'golf', 'bravo', 'foxtrot']     # id order
+
+
+@pytest.fixture
+def admin(app, db, monkeypatch):
+    """Seven teams, pages of three, and a client that sees the template's context."""
+    for i, name in enumerate(NAMES):
+        db.execute("INSERT INTO teams (name, password_hash, port, status, created_at) "
+                   "VALUES (?, 'x', ?, 'ready', datetime('2026-01-01', ?))",
+                   (name, 9000 + i, f'-{i} minutes'))
+    db.commit()
+    app.scores.load()
+    monkeypatch.setattr(app, 'ADMIN_PAGE_SIZE', 3)
+    monkeypatch.setattr(app, 'render_template', lambda template, **ctx: ctx)
+    client = app.app.test_client()
+    with client.session_transaction() as s:
+        s['is_admin'] = True
+
+    def page(**args):
+        resp = client.get('/admin', query_string=args)
+        if resp.status_code == 302:
+            return resp.headers['Location']
+        ctx = resp.get_json()
+        return [t['name'] for t in ctx['teams']], ctx['page'], ctx['pages']
+    return page
+
+
+def test_pages_in_database_order(admin):
+    assert admin() == (['delta', 'alpha', 'echo'], 1, 3)
+    assert admin(page=3) == (['foxtrot'], 3, 3)
+    assert admin(sort='name', page=2) == (['delta', 'echo', 'foxtrot'], 2, 3)
+    assert admin(sort='name', dir='desc') == (['golf', 'foxtrot', 'echo'], 1, 3)
+    assert admin(sort='registered') == (['foxtrot', 'bravo', 'golf'], 1, 3)
+    assert admin(sort='bogus') == admin(sort='id')
+
+
+def test_past_the_last_page_redirects_to_it(admin):
+    assert admin(sort='name', dir='desc', page=9).endswith('/admin?sort=name&dir=desc&page=3')
+
+
+def test_score_and_stats_sorts_are_biggest_first(app, admin, monkeypatch):
+    for name, flags in (('echo', 2), ('bravo', 1), ('golf', 1)):
+        for f in app.catalog.flags[:flags]:
+            app.record_submission(name, f['id'])
+    # Equal keys keep name order
+    assert admin(sort='score') == (['echo', 'bravo', 'golf'], 1, 3)
+    assert admin(sort='flags', dir='asc') == (['alpha', 'charlie', 'delta'], 1, 3)
+
+    figures = lambda mem: {'cpu': 0.1, 'mem': mem, 'rx': 0, 'tx': 0, 'containers': 2}
+    monkeypatch.setattr(app.container_stats, '_hosts', {'local': {
+        'alpha': figures(300), 'golf': figures(900), 'delta': figures(600)}})
+    assert admin(sort='mem') == (['golf', 'delta', 'alpha'], 1, 3)
+    assert admin(sort='mem', page=3) == (['foxtrot'], 3, 3)
@@ -0,0 +1,146 @@
+import pytest
+
+from capacity import Allocator, SubnetPool
+from docker_api import ComposeEngine, ComposeModel, DockerClient, DockerError
+
+COMPOSE = {'services': {'web': {'image': 'ctf-web:latest'}}}
+
+
+class _Pool:
+    """The warm pool, as far as the allocator sees it."""
+
+    def __init__(self):
+        self.ready, self.booting = 0, 0
+
+    def snapshot(self) -> dict:
+        return {'ready': self.ready, 'booting': self.booting}
+
+    def refill(self):
+        pass
+
+
+def _host(name: str, engine, max: int = 0) -> dict:
+    """A host entry as app._load_hosts() builds it."""
+    return {'name': name, 'endpoint': 'fake', 'tls': '',
+            'cli': ['docker'], 'host_ip': '127.0.0.1', 'max': max, 'local': True,
+            'engine': engine, 'subnets': None, 'healthy': True, 'error': '',
+            'memory_mb': 0, 'capacity': None}
+
+
+@pytest.fixture
+def engine(fake_docker, tmp_path):
+    fake_docker.mem_total = 8 << 30
+    return ComposeEngine(ComposeModel(COMPOSE, str(tmp_path)),
+                         DockerClient(fake_docker.socket_path))
+
+
+def _allocator(hosts: dict) -> Allocator:
+    """An allocator over `hosts` that records placements and callbacks."""
+    running, events = {}, []
+
+    def placed(team, host):
+        running[team] = host
+        events.append(('placed', team))
+
+    def count_instances():
+        counts = {}
+        for host in running.values():
+            counts[host] = counts.get(host, 0) + 1
+        return counts
+
+    alloc = Allocator(
+        8000, 8009, hosts, _Pool(),
+        count_instances=count_instances, placed=placed,
+        queued=lambda team: events.append(('queued', team)),
+        launch=lambda team, port: events.append(('launch', team, port)),
+        project_of=lambda team: f'ctf_{team}',
+        instance_memory_mb=2048, admit_percent=50, check_seconds=3600, check_ports=False)
+    alloc.start([])
+    alloc.running, alloc.events = running, events
+    return alloc
+
+
+@pytest.fixture
+def alloc(engine):
+    """One host with room for two instances (8 GB at 50%, 2 GB each)."""
+    return _allocator({'local': _host('local', engine)})
+
+
+def test_admits_until_full_then_queues_in_order(alloc):
+    assert alloc.hosts['local']['capacity'] == 2
+    assert alloc.admit('a', 8000) and alloc.admit('b', 8001)
+    assert not alloc.admit('c', 8002)
+    assert not alloc.admit('d', 8003)
+    assert not alloc.admit('c', 8002)                # already waiting: keeps its place
+    assert [alloc.position(t) for t in 'abcd'] == [None, None, 1, 2]
+    assert alloc.events == [('placed', 'a'), ('placed', 'b'), ('queued', 'c'),
+                            ('queued', 'd'), ('queued', 'c')]
+    assert alloc.spare() == -2
+    snap = alloc.snapshot()
+    assert snap['hosts'][0]['holding'] == 2 and snap['waiting'] == 2
+
+
+def test_freed_capacity_starts_waiting_teams_first_come_first_served(alloc):
+    for i, team in enumerate('abcd'):
+        alloc.admit(team, 8000 + i)
+    alloc.events.clear()
+    alloc.kick()
+    assert alloc.events == []                        # still full
+
+    del alloc.running['a']
+    alloc.kick()
+    assert alloc.events == [('placed', 'c'), ('launch', 'c', 8002)]
+    assert alloc.position('d') == 1
+    # A new registration queues behind 'd' even if there were room
+    del alloc.running['b']
+    assert not alloc.admit('e', 8004)
+    alloc.kick()
+    assert [e[1] for e in alloc.events if e[0] == 'launch'] == ['c', 'd']
+    assert alloc.position('e') == 1
+
+
+def test_warm_instances_count_but_a_ready_one_always_fits(alloc):
+    alloc.pool.booting = 2
+    assert not alloc.admit('a', 8000)
+    alloc.forget('a')
+    alloc.pool.booting, alloc.pool.ready = 0, 2
+    assert alloc.admit('b', 8001) and alloc.admit('c', 8002)    # binds, not boots
+
+
+def test_places_on_the_least_loaded_host_with_room(engine):
+    alloc = _allocator({'local': _host('local', engine),
+                        'small': _host('small', engine, max=1)})
+    assert [alloc.hosts[h]['capacity'] for h in ('local', 'small')] == [2, 1]
+    assert all(alloc.admit(t, 8000 + i) for i, t in enumerate('abc'))
+    assert sorted(alloc.running.items()) == [('a', 'local'), ('b', 'small'), ('c', 'local')]
+    assert not alloc.admit('d', 8003)
+
+    alloc.hosts['local']['healthy'] = False
+    del alloc.running['a']
+    alloc.kick()
+    assert alloc.position('d') == 1                  # the free slot's host is down
+    alloc.hosts['local']['healthy'] = True
+    alloc.kick()
+    assert alloc.running['d'] == 'local'
+
+
+def test_ports_are_reserved_lowest_first(alloc):
+    alloc.start([{'name': 'old', 'port': 8001, 'status': 'ready', 'created_at': ''}])
+    assert [alloc.reserve_port() for _ in range(3)] == [8000, 8002, 8003]
+    alloc.release_port(8002)
+    assert alloc.reserve_port() == 8002
+
+
+def test_subnet_pool_skips_foreign_networks_and_reuses_freed_subnets(fake_docker):
+    client = DockerClient(fake_docker.socket_path)
+    client.post('/networks/create', body={
+        'Name': 'other', 'IPAM': {'Config': [{'Subnet': '10.9.1.0/24'}]}})
+    subnets = SubnetPool('10.9.0.0/22', 24)
+    subnets.recover(client)
+    assert (len(subnets), subnets.free()) == (4, 3)
+    assert [subnets.acquire(p) for p in 'abc'] == ['10.9.0.0/24', '10.9.2.0/24', '10.9.3.0/24']
+    assert subnets.acquire('a') == '10.9.0.0/24'
+    with pytest.raises(DockerError, match='no free subnet'):
+        subnets.acquire('d')
+    subnets.release('b')
+    assert subnets.acquire('d') == '10.9.2.0/24'
@@ -0,0 +1,50 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from control import ControlClient, ControlError, ControlServer, _UnixConnection
+
+
+@pytest.fixture
+def server(tmp_path):
+    calls = []
+
+    def slow(seconds):
+        calls.append('slow')
+        time.sleep(seconds)
+        return 'done'
+
+    server = ControlServer({'ping': lambda: calls.append('ping') or 'pong', 'slow': slow},
+                           str(tmp_path / 'control.sock'))
+    server.calls = calls
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_call_on_a_closed_kept_alive_connection_is_resent(server):
+    client = ControlClient(server.server_address, timeout=5)
+    stale  = _UnixConnection(client.path, 5)
+    stale.sock, peer = socket.socketpair()
+    peer.close()                        # what a restarted orchestrator leaves behind
+    client._idle.put(stale)
+
+    assert client.ping() == 'pong'
+    assert server.calls == ['ping']
+
+
+def test_call_without_a_reply_is_not_repeated(server):
+    client = ControlClient(server.server_address, timeout=0.3)
+    client.ping()                       # leaves a kept-alive connection in the pool
+    with pytest.raises(ControlError, match='no reply'):
+        client.slow(1)
+    time.sleep(1.2)
+    assert server.calls == ['ping', 'slow']
+
+
+def test_unreachable_server_is_a_control_error(tmp_path):
+    with pytest.raises(ControlError, match='unreachable'):
+        ControlClient(str(tmp_path / 'nothing.sock')).ping()
@@ -0,0 +1,123 @@
+import pytest
+
+from docker_api import ComposeEngine, ComposeModel, DockerClient, interpolate
+
+COMPOSE = {
+    'services': {
+        'db': {
+            'image':       'ctf-db:latest',
+            'volumes':     ['db-data:/var/lib/mysql'],
+            'healthcheck': {'test': 'true', 'interval': '1s'},
+        },
+        'web': {
+            'image':       'ctf-web:latest',
+            'environment': {'FLAG': '${FLAG:-CTF{default}}'},
+            'ports':       ['8080:80'],
+            'depends_on':  {'db': {'condition': 'service_healthy'}},
+        },
+    },
+    'volumes': {'db-data': {}},
+}
+
+# ---------------------------------------------------------------------------
+# interpolate()
+# ---------------------------------------------------------------------------
+
+
+def test_default_may_contain_braces():
+    assert interpolate('${FLAG:-CTF{x}}', {}) == 'CTF{x}'
+    assert interpolate('${FLAG:-CTF{x}}', {'FLAG': ''}) == 'CTF{x}'
+    assert interpolate('${FLAG:-CTF{x}}', {'FLAG': 'CTF{real}'}) == 'CTF{real}'
+    assert interpolate('${FLAG-CTF{x}}', {'FLAG': ''}) == ''
+
+
+def test_double_dollar_is_literal():
+    assert interpolate('$$HOME', {'HOME': '/root'}) == '$HOME'
+    assert interpolate('$${A}-$$$A', {'A': 'a'}) == '${A}-$a'
+
+
+def test_required_variable():
+    assert interpolate('${A:?set A}', {'A': 'a'}) == 'a'
+    with pytest.raises(ValueError, match='A: set A'):
+        interpolate('${A:?set A}', {'A': ''})
+    with pytest.raises(ValueError, match='required variable is missing'):
+        interpolate('${A?}', {})
+    assert interpolate('${A?}', {'A': ''}) == ''
+
+
+def test_alternate_and_plain_forms():
+    assert interpolate('${A:+on}|${B:+on}', {'A': 'x', 'B': ''}) == 'on|'
+    assert interpolate('$A/${B}/$', {'A': 'a', 'B': 'b'}) == 'a/b/$'
+
+
+def test_malformed_substitution():
+    with pytest.raises(ValueError, match='unterminated'):
+        interpolate('${FLAG:-CTF{x}', {})
+    with pytest.raises(ValueError, match='invalid substitution'):
+        interpolate('${1A}', {})
+
+# ---------------------------------------------------------------------------
+# ComposeEngine against the fake daemon
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def engine(fake_docker, tmp_path):
+    return ComposeEngine(ComposeModel(COMPOSE, str(tmp_path)), DockerClient(fake_docker.socket_path),
+                         health_timeout=5, poll_interval=0.05)
+
+
+def _ids(fake, project: str) -> dict:
+    return {c['Config']['Labels']['com.docker.compose.service']: c['Id']
+            for c in fake.containers.values()
+            if c['Config']['Labels'].get('com.docker.compose.project') == project}
+
+
+def test_up_creates_and_starts_the_project(engine, fake_docker):
+    engine.up('team1', {'FLAG': 'CTF{one}'})
+    assert engine.service_state('team1', 'db') == 'running'
+    assert engine.service_state('team1', 'web') == 'running'
+    web = fake_docker.containers[_ids(fake_docker, 'team1')['web']]
+    assert 'FLAG=CTF{one}' in web['Config']['Env']
+    assert web['HostConfig']['NetworkMode'] == 'team1_default'
+    assert set(fake_docker.volumes) == {'team1_db-data'}
+
+
+def test_up_reuses_containers_with_the_same_config_hash(engine, fake_docker):
+    engine.up('team1', {'FLAG': 'CTF{one}'})
+    first = _ids(fake_docker, 'team1')
+    engine.up('team1', {'FLAG': 'CTF{one}'})
+    assert _ids(fake_docker, 'team1') == first
+
+    engine.up('team1', {'FLAG': 'CTF{two}'})
+    second = _ids(fake_docker, 'team1')
+    assert second['db'] == first['db']
+    assert second['web'] != first['web']
+
+
+def test_down_removes_the_project(engine, fake_docker):
+    engine.up('team1', {})
+    engine.up('team2', {})
+    engine.down('team1')
+    assert _ids(fake_docker, 'team1') == {}
+    assert set(_ids(fake_docker, 'team2')) == {'db', 'web'}
+    assert [n['Name'] for n in fake_docker.networks.values()] == ['team2_default']
+    assert set(fake_docker.volumes) == {'team2_db-data'}
+    assert engine.service_state('team1', 'web') == ''
+
+
+def test_down_detaches_outside_containers(engine, fake_docker):
+    client = engine.client
+    engine.up('team1', {})
+    client.post('/containers/create', params={'name': 'proxy'},
+                body={'Image': 'ctf-web:latest', 'Labels': {}})
+    client.start_container('proxy')
+    engine.attach('team1', 'proxy', ['team1-web'])
+    assert engine.project_label('team1', 'com.docker.compose.project') == 'team1'
+
+    engine.down('team1')
+    assert _ids(fake_docker, 'team1') == {}
+    assert fake_docker.networks == {}
+    assert fake_docker.volumes == {}
+    proxy = fake_docker._find('proxy')
+    assert proxy['State']['Running'] and proxy['_networks'] == {}
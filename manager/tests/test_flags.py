@@ -0,0 +1,105 @@
+import copy
+import json
+
+import pytest
+
+
+def test_each_team_matches_only_its_own_flags(app):
+    for f in app.catalog.flags:
+        value = app._team_flag(f['id'], 'alpha')
+        assert app.match_flag('alpha', value) is f
+        assert app.match_flag('bravo', value) is None
+    assert app.match_flag('alpha', 'CTF{nope}') is None
+    assert app.match_flag('alpha', 'x' * (app.MAX_FLAG_LEN + 1)) is None
+
+
+def test_rotated_secret_rejects_old_flags(app, monkeypatch):
+    flag = app.catalog.flags[0]
+    old  = app._team_flag(flag['id'], 'alpha')
+    assert app.match_flag('alpha', old) is flag         # index now cached for the old secret
+
+    monkeypatch.setattr(app, 'FLAG_SECRET', 'rotated-secret')
+    new = app._team_flag(flag['id'], 'alpha')
+    assert new != old
+    assert app.match_flag('alpha', old) is None
+    assert app.match_flag('alpha', new) is flag
+
+    monkeypatch.undo()
+    assert app.match_flag('alpha', old) is flag
+    assert app.match_flag('alpha', new) is None
+
+
+# ---------------------------------------------------------------------------
+# Catalog
+# ---------------------------------------------------------------------------
+
+CATALOG = {
+    'flags': [{'id': 'FLAG_A', 'name': 'A', 'points': 100},
+              {'id': 'FLAG_B', 'name': 'B', 'points': 50, 'fb_multiplier': 2.0}],
+    'hints': [{'id': 2, 'flag_id': 'FLAG_A', 'order': 2, 'cost': 20, 'text': ''},
+              {'id': 1, 'flag_id': 'FLAG_A', 'order': 1, 'cost': 10, 'text': ''}],
+}
+
+
+def test_catalog_indexes_hint_chains(app):
+    cat = app.Catalog(copy.deepcopy(CATALOG))
+    assert [h['id'] for h in cat.hint_chain['FLAG_A']] == [1, 2]
+    assert cat.hint_chain['FLAG_B'] == []
+    assert cat.hint_prev[1] is None and cat.hint_prev[2]['id'] == 1
+    assert cat.flag_by_id['FLAG_A']['fb_multiplier'] == 1.0
+    assert (cat.max_score, cat.max_possible, cat.flag_name_cost) == (150, 200, 5)
+
+
+@pytest.mark.parametrize('broken, error', [
+    (lambda c: c['flags'].append(dict(c['flags'][0])),            'duplicate flag id'),
+    (lambda c: c['hints'].append(dict(c['hints'][0], order=3)),   'duplicate hint id'),
+    (lambda c: c['hints'].append(dict(c['hints'][0], id=3)),      'duplicate hint order'),
+    (lambda c: c['hints'][0].update(flag_id='FLAG_Z'),            'unknown flag'),
+])
+def test_catalog_rejects_inconsistent_files(app, broken, error):
+    data = copy.deepcopy(CATALOG)
+    broken(data)
+    with pytest.raises(ValueError, match=error):
+        app.Catalog(data)
+
+
+@pytest.fixture
+def catalog_file(app, tmp_path, monkeypatch):
+    path = tmp_path / 'catalog.json'
+    path.write_text(json.dumps(CATALOG))
+    monkeypatch.setattr(app, 'CATALOG_FILE', str(path))
+    yield path
+    monkeypatch.undo()
+    assert app.reload_catalog()
+
+
+def test_reload_swaps_catalog_and_rescores(app, db, catalog_file):
+    db.execute("INSERT INTO teams (name, password_hash, port, status) "
+               "VALUES ('alpha', 'x', 9001, 'running')")
+    db.commit()
+    assert app.reload_catalog()
+    assert [f['id'] for f in app.catalog.flags] == ['FLAG_A', 'FLAG_B']
+    app.record_submission('alpha', 'FLAG_B')
+    assert app.scores.team('alpha')['score'] == 100
+
+    data = copy.deepcopy(CATALOG)
+    data['flags'][1]['points'] = 80
+    catalog_file.write_text(json.dumps(data))
+    assert app.reload_catalog()
+    assert app.scores.team('alpha')['score'] == 160       # rescored with the new points
+
+
+def test_invalid_reload_keeps_the_current_catalog(app, catalog_file):
+    assert app.reload_catalog()
+    current = app.catalog
+    catalog_file.write_text('{"flags": [')
+    assert not app.reload_catalog()
+    catalog_file.write_text(json.dumps({'flags': CATALOG['flags'] * 2}))
+    assert not app.reload_catalog()
+    assert app.catalog is current
+
+    admin = app.app.test_client()
+    with admin.session_transaction() as s:
+        s['is_admin'] = True
+    admin.post('/admin/reload-catalog')
+    assert app.catalog is current
@@ -0,0 +1,87 @@
+import pytest
+
+
+@pytest.fixture
+def feed(app, monkeypatch):
+    """An enabled feed with no publisher thread: events are published by hand."""
+    feed = app.LiveFeed(max_clients=10, keepalive=0.2)
+    feed.enabled = True
+    feed._floor  = app.scores.position()
+    monkeypatch.setattr(app, 'live', feed)
+    return feed
+
+
+@pytest.fixture
+def at(app):
+    """Positions past the engine's: at(n) has n more submissions applied."""
+    base = app.scores.position()
+    return lambda n: (base[0] + n, *base[1:])
+
+
+def _events(chunk: bytes) -> list:
+    """(id, event) pairs in a chunk of SSE bytes."""
+    out = []
+    for block in chunk.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+        if 'event' in fields:
+            out.append((fields.get('id'), fields['event']))
+    return out
+
+
+def test_resumes_after_the_last_event_seen(app, feed, at):
+    feed.publish('scoreboard', {'version': 1}, at(1))
+    feed.publish('scoreboard', {'version': 2}, at(2))
+    feed.publish('status', {'status': 'ready'}, at(3), team='alpha')
+    feed.publish('scoreboard', {'version': 3}, at(4))
+    seen = app._position_id(at(1))
+
+    stream = feed.stream(seen)
+    assert next(stream) == b'retry: 3000\n\n'
+    assert _events(next(stream)) == [(app._position_id(at(2)), 'scoreboard'),
+                                     (app._position_id(at(4)), 'scoreboard')]
+    stream.close()
+
+    team = feed.stream(seen, team='alpha')
+    next(team)
+    assert _events(next(team)) == [(app._position_id(at(3)), 'status')]
+    team.close()
+    assert feed.clients == 0
+
+
+def test_resumes_on_a_worker_that_diffed_at_other_moments(app, feed, at):
+    # This worker coalesced what another published as at(1) and at(2)
+    feed.publish('scoreboard', {'version': 1}, at(2))
+    stream = feed.stream(app._position_id(at(1)))
+    next(stream)
+    assert _events(next(stream)) == [(app._position_id(at(2)), 'scoreboard')]
+    stream.close()
+
+    feed.publish('scoreboard', {'version': 2}, at(3))
+    stream = feed.stream(app._position_id(at(2)))
+    next(stream)
+    assert _events(next(stream)) == [(app._position_id(at(3)), 'scoreboard')]
+    stream.close()
+
+
+def test_stale_or_unknown_ids_get_a_reset(app, feed, at):
+    seen = app._position_id(at(0))
+    for i in range(app.LIVE_BACKLOG + 2):
+        feed.publish('scoreboard', {'version': i}, at(i + 1))
+    for since in ('0123abcd-' + seen.split('-', 1)[1], seen, f'{app._snapshot_epoch}-x'):
+        stream = feed.stream(since)
+        next(stream)
+        assert _events(next(stream)) == [(None, 'reset')]
+        assert next(stream, None) is None
+
+
+def test_last_event_id_takes_precedence_over_the_page_id(app, feed, at):
+    feed.publish('scoreboard', {'version': 1}, at(1))
+    feed.publish('scoreboard', {'version': 2}, at(2))
+    resp = app.app.test_client().get(
+        f'/scoreboard/events?since={app._position_id(at(0))}',
+        headers={'Last-Event-ID': app._position_id(at(1))})
+    assert resp.mimetype == 'text/event-stream'
+    body = iter(resp.response)
+    next(body)
+    assert _events(next(body)) == [(app._position_id(at(2)), 'scoreboard')]
+    resp.close()
@@ -0,0 +1,71 @@
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+
+def _legacy_db(app, path: str):
+    """A database as the original schema left it: user_version 0, names as keys."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    app._migration_1(conn)
+    conn.executemany('INSERT INTO teams (name, password_hash, port, status) VALUES (?, ?, ?, ?)',
+                     [('alpha', 'x', 8001, 'running'), ('bravo', 'x', 8002, 'stopped')])
+    conn.executemany('INSERT INTO submissions (team_name, flag_id, captured_at) VALUES (?, ?, ?)',
+                     [('alpha', 'f1', '2026-01-01 12:00:00'),
+                      ('bravo', 'f1', '2026-01-01 12:30:00'),
+                      ('ghost', 'f2', '2026-01-01 13:00:00')])
+    conn.execute("INSERT INTO hint_purchases (team_name, hint_id, purchased_at) "
+                 "VALUES ('alpha', 3, '2026-01-01 12:05:00')")
+    conn.execute("INSERT INTO name_purchases (team_name, flag_id) VALUES ('ghost', 'f1')")
+    conn.close()
+
+
+def _ms(ts: str) -> int:
+    return int(datetime.fromisoformat(ts).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def test_init_db_migrates_a_legacy_database(app, tmp_path, monkeypatch):
+    path = str(tmp_path / 'legacy.db')
+    _legacy_db(app, path)
+    monkeypatch.setattr(app, 'DB_PATH', path)
+    app.init_db()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == len(app.MIGRATIONS)
+    assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+    ids = dict(conn.execute('SELECT name, id FROM teams'))
+    # Rows of teams that no longer exist are dropped; times become Unix ms
+    assert sorted(conn.execute('SELECT team_id, flag_id, captured_ms FROM submissions')) == [
+        (ids['alpha'], 'f1', _ms('2026-01-01 12:00:00')),
+        (ids['bravo'], 'f1', _ms('2026-01-01 12:30:00'))]
+    assert conn.execute('SELECT team_id, hint_id, purchased_ms FROM hint_purchases').fetchall() == [
+        (ids['alpha'], 3, _ms('2026-01-01 12:05:00'))]
+    assert conn.execute('SELECT COUNT(*) FROM name_purchases').fetchone()[0] == 0
+
+    # Later migrations: the host column and the team_log triggers
+    conn.execute("UPDATE teams SET host = 'b', status = 'running' WHERE name = 'bravo'")
+    conn.commit()
+    assert conn.execute('SELECT team FROM team_log').fetchall() == [('bravo',)]
+    conn.close()
+
+    app.init_db()           # already current: nothing to apply
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == len(app.MIGRATIONS)
+    conn.close()
+
+
+def test_failed_migration_rolls_back(app, tmp_path, monkeypatch):
+    path = str(tmp_path / 'legacy.db')
+    _legacy_db(app, path)
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE submissions_new (id INTEGER)')   # in migration 2's way
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(app, 'DB_PATH', path)
+
+    with pytest.raises(sqlite3.OperationalError):
+        app.init_db()
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == 1
+    assert conn.execute('SELECT COUNT(*) FROM submissions').fetchone()[0] == 3
+    conn.close()
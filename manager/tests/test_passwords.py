@@ -0,0 +1,76 @@
+import threading
+import time
+
+import bcrypt
+import pytest
+
+from passwords import HasherBusy, PasswordHasher, hash_rounds
+
+
+@pytest.fixture
+def full():
+    """A hasher (in-thread, one slot) whose only slot is held until the test ends."""
+    hasher, started, release = PasswordHasher(0, 1, 4), threading.Event(), threading.Event()
+    holder = threading.Thread(target=hasher._run, args=(lambda: (started.set(), release.wait(5)),))
+    holder.start()
+    assert started.wait(5)
+    yield hasher
+    release.set()
+    holder.join()
+
+
+def test_hashes_in_the_request_thread_without_workers():
+    hasher = PasswordHasher(0, 4, 4)
+    password_hash = hasher.hash(b'secret')
+    assert hash_rounds(password_hash) == 4
+    assert hasher.check(b'secret', password_hash) and not hasher.check(b'other', password_hash)
+    assert hasher.snapshot()['pending'] == 0 and hasher.snapshot()['peak'] == 1
+
+
+def test_sheds_past_the_queue_bound(full):
+    with pytest.raises(HasherBusy) as exc:
+        full.hash(b'secret')
+    assert exc.value.retry_after >= 1
+    assert full.snapshot()['shed'] == 1 and full.snapshot()['pending'] == 1
+
+
+def test_login_gets_a_503_with_retry_after(app, db, full, monkeypatch):
+    db.execute("INSERT INTO teams (name, password_hash, port, status) VALUES (?, ?, 9001, 'ready')",
+               ('alpha', bcrypt.hashpw(b'password', bcrypt.gensalt(4)).decode()))
+    db.commit()
+    monkeypatch.setattr(app, 'hasher', full)
+    resp = app.app.test_client().post('/login', data={'name': 'alpha', 'password': 'password'})
+    assert resp.status_code == 503 and int(resp.headers['Retry-After']) >= 1
+
+
+def test_hash_later_runs_in_the_background():
+    hasher, hashed = PasswordHasher(0, 4, 4), threading.Event()
+    got = []
+    assert hasher.hash_later(b'secret', lambda h: (got.append(h), hashed.set()))
+    assert hashed.wait(5)
+    assert hash_rounds(got[0]) == 4 and hasher.check(b'secret', got[0])
+
+
+def test_hash_later_is_skipped_while_the_workers_are_busy(full):
+    assert not full.hash_later(b'secret', pytest.fail)
+    assert full.snapshot()['shed'] == 0          # skipped, not shed
+
+
+def test_login_rehashes_without_waiting(app, db, monkeypatch):
+    old = bcrypt.hashpw(b'password', bcrypt.gensalt(4)).decode()
+    db.execute("INSERT INTO teams (name, password_hash, port, status) VALUES (?, ?, 9001, 'ready')",
+               ('alpha', old))
+    db.commit()
+    hasher, release = PasswordHasher(1, 4, 5), threading.Event()
+    hasher.hash = lambda password: (release.wait(5), PasswordHasher.hash(hasher, password))[1]
+    monkeypatch.setattr(app, 'hasher', hasher)
+    monkeypatch.setattr(app, 'BCRYPT_ROUNDS', 5)
+
+    resp = app.app.test_client().post('/login', data={'name': 'alpha', 'password': 'password'})
+    assert resp.status_code == 302
+    assert app.get_team_by_name('alpha')['password_hash'] == old    # not yet
+    release.set()
+    deadline = time.monotonic() + 5
+    while app.get_team_by_name('alpha')['password_hash'] == old and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert hash_rounds(app.get_team_by_name('alpha')['password_hash']) == 5
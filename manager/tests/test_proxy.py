@@ -0,0 +1,160 @@
+import http.client
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from proxy import InstanceProxy
+
+
+class _Upstream(BaseHTTPRequestHandler):
+    """An instance's web server; server.script(handler) writes each response."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+            self.connection_no = self.server.connections
+        self.served = 0
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _dispatch(self):
+        self.server.seen.append((self.command, self.path, dict(self.headers), self._body()))
+        self.server.script(self)
+        self.served += 1
+
+    do_GET = do_POST = _dispatch
+
+    def _body(self) -> bytes:
+        if 'chunked' in self.headers.get('Transfer-Encoding', ''):
+            out = b''
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                data = self.rfile.read(size + 2)[:-2]
+                if not size:
+                    return out
+                out += data
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def reply(self, code=200, headers=(), body=b'ok'):
+        self.send_response(code)
+        for k, v in headers:
+            self.send_header(k, v)
+        if not any(k.lower() == 'transfer-encoding' for k, _ in headers):
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Upstream)
+    server.lock, server.connections, server.seen = threading.Lock(), 0, []
+    server.script = lambda h: h.reply()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def proxy(upstream):
+    addr  = upstream.server_address
+    port  = _free_port()
+    touched = []
+    proxy = InstanceProxy(lambda team: ('ready', addr) if team == 'alpha' else (None, None),
+                          touched.append, domain='ctf.test').start('127.0.0.1', port)
+    deadline = time.monotonic() + 5
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.02)
+    proxy.port, proxy.touched = port, touched
+    return proxy
+
+
+def _request(proxy, method, path, host='alpha.ctf.test', **kw):
+    conn = http.client.HTTPConnection('127.0.0.1', proxy.port, timeout=5)
+    conn.request(method, path, headers={'Host': host}, **kw)
+    resp = conn.getresponse()
+    return resp, resp.read()
+
+
+def test_host_name_routes_to_the_instance(proxy, upstream):
+    resp, body = _request(proxy, 'GET', '/login?next=/', host='Alpha.CTF.test:8080')
+    assert (resp.status, body) == (200, b'ok')
+    method, path, headers, _ = upstream.seen[0]
+    assert (method, path) == ('GET', '/login?next=/')
+    assert headers['Host'] == 'Alpha.CTF.test:8080'
+
+    for host, path in (('nobody.ctf.test', '/'), ('127.0.0.1', '/i/alpha/'),
+                       ('alpha.ctf.test.evil', '/'), ('ctf.test', '/')):
+        resp, _ = _request(proxy, 'GET', path, host=host)
+        assert resp.status == 404, host
+    assert len(upstream.seen) == 1
+
+
+def test_only_existing_teams_are_touched(proxy):
+    for team in ('nobody', 'alpha', 'someone'):
+        _request(proxy, 'GET', '/', host=f'{team}.ctf.test')
+    deadline = time.monotonic() + 5
+    while not proxy.touched and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert proxy.touched == ['alpha']                # once a second at most
+    assert list(proxy._touched) == ['alpha']
+
+
+def test_chunked_bodies_are_relayed(proxy, upstream):
+    def chunked(h):
+        h.send_response(200)
+        h.send_header('Transfer-Encoding', 'chunked')
+        h.end_headers()
+        for part in (b'hello, ', b'world', b''):
+            h.wfile.write(b'%x\r\n%s\r\n' % (len(part), part))
+    upstream.script = chunked
+
+    resp, body = _request(proxy, 'POST', '/upload',
+                          body=iter([b'abc', b'def']), encode_chunked=True)
+    assert (resp.status, body) == (200, b'hello, world')
+    assert upstream.seen[0][3] == b'abcdef'
+
+
+def test_cookies_and_redirects_pass_through_unchanged(proxy, upstream):
+    upstream.script = lambda h: h.reply(302, [('Location', '/dashboard'),
+                                              ('Set-Cookie', 'session=abc; Path=/; HttpOnly')])
+    resp, _ = _request(proxy, 'GET', '/login')
+    assert resp.getheader('Location') == '/dashboard'
+    assert resp.getheader('Set-Cookie') == 'session=abc; Path=/; HttpOnly'
+
+
+def test_stale_pooled_connection_is_retried(proxy, upstream):
+    def close_after_first(h):
+        if h.connection_no == 1 and h.served == 1:
+            h.close_connection = True       # closed while the request was in flight
+            return
+        h.reply(body=f'conn {h.connection_no}'.encode())
+    upstream.script = close_after_first
+
+    conn = http.client.HTTPConnection('127.0.0.1', proxy.port, timeout=5)
+    bodies = []
+    for _ in range(2):
+        conn.request('GET', '/', headers={'Host': 'alpha.ctf.test'})
+        resp = conn.getresponse()
+        bodies.append((resp.status, resp.read()))
+    assert bodies == [(200, b'conn 1'), (200, b'conn 2')]
+    assert proxy.stats['upstream_reused'] == 1 and proxy.stats['upstream_opened'] == 2
@@ -0,0 +1,72 @@
+import threading
+
+from scheduler import PRIO_ADMIN, PRIO_REGISTER, Orchestrator
+
+
+def _jobs(count: int, ran: list, done: threading.Event):
+    """A job factory: each job appends its key to `ran`; `done` is set after `count`."""
+    def job(key):
+        def run():
+            ran.append(key)
+            if len(ran) == count:
+                done.set()
+        return run
+    return job
+
+
+def test_priority_then_fifo():
+    orch, ran, done = Orchestrator(workers=1, stagger=0), [], threading.Event()
+    job = _jobs(4, ran, done)
+    orch.submit('a', job('a'), PRIO_REGISTER)
+    orch.submit('b', job('b'), PRIO_REGISTER)
+    orch.submit('c', job('c'), PRIO_ADMIN)
+    orch.submit('d', job('d'), PRIO_REGISTER)
+    assert orch.status('a') == {'state': 'queued', 'position': 2, 'eta': 2 * 45}
+    orch.start()
+    assert done.wait(5)
+    assert ran == ['c', 'a', 'b', 'd']
+
+
+def test_resubmit_keeps_place_or_moves_up():
+    orch, ran, done = Orchestrator(workers=1, stagger=0), [], threading.Event()
+    job = _jobs(3, ran, done)
+    orch.submit('a', job('a'), PRIO_REGISTER)
+    orch.submit('b', job('b'), PRIO_REGISTER)
+    orch.submit('c', job('c'), PRIO_REGISTER)
+    orch.submit('a', job('a'), PRIO_REGISTER)        # already queued: same place
+    orch.submit('c', job('c'), PRIO_ADMIN)           # moved ahead
+    assert orch.snapshot() == {'running': 0, 'queued': 3, 'workers': 1}
+    orch.start()
+    assert done.wait(5)
+    assert ran == ['c', 'a', 'b']
+
+
+def test_cancel_drops_only_queued_jobs():
+    orch, ran = Orchestrator(workers=1, stagger=0), []
+    release, started, done = threading.Event(), threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        ran.append('a')
+
+    orch.submit('a', slow)
+    orch.submit('b', lambda: ran.append('b'))
+    orch.start()
+    assert started.wait(5)
+    assert orch.status('a')['state'] == 'running'
+    assert not orch.cancel('a')                      # running: too late
+    assert orch.cancel('b') and orch.status('b') is None
+
+    orch.submit('a', lambda: (ran.append('a again'), done.set()))   # follow-up run
+    release.set()
+    assert done.wait(5)
+    assert ran == ['a', 'a again']
+
+
+def test_failing_job_frees_its_slot():
+    orch, done = Orchestrator(workers=1, stagger=0), threading.Event()
+    orch.submit('a', lambda: 1 / 0)
+    orch.submit('b', done.set)
+    orch.start()
+    assert done.wait(5)
@@ -0,0 +1,86 @@
+import gzip
+import json
+import threading
+import time
+
+
+def _team(app, db, name: str = 'alpha'):
+    db.execute("INSERT INTO teams (name, password_hash, port, status) "
+               "VALUES (?, 'x', 9001, 'running')", (name,))
+    db.commit()
+    app.scores.load()
+
+
+def test_unchanged_scoreboard_is_a_304(app, db):
+    _team(app, db)
+    client = app.app.test_client()
+    first  = client.get('/scoreboard.json')
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+
+    again = client.get('/scoreboard.json', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+    assert again.headers['ETag'] == etag
+
+
+def test_capture_changes_the_etag(app, db):
+    _team(app, db)
+    client = app.app.test_client()
+    etag   = client.get('/scoreboard.json').headers['ETag']
+
+    app.record_submission('alpha', app.catalog.flags[0]['id'])
+    resp = client.get('/scoreboard.json', headers={'If-None-Match': etag})
+    assert resp.status_code == 200 and resp.headers['ETag'] != etag
+    team = json.loads(resp.data)['teams'][0]
+    assert team['name'] == 'alpha' and team['flag_positions'] == {app.catalog.flags[0]['id']: 1}
+
+
+def test_gzip_body_matches_identity_body(app, db):
+    _team(app, db)
+    client = app.app.test_client()
+    plain  = client.get('/scoreboard.json', headers={'Accept-Encoding': 'identity'})
+    packed = client.get('/scoreboard.json', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in plain.headers
+    assert packed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(packed.data) == plain.data
+    assert 'Accept-Encoding' in packed.headers['Vary']
+    assert packed.headers['ETag'] == plain.headers['ETag'][:-1] + '-gz"'
+
+    # Each tag validates only its own encoding
+    for headers, tag in (({'Accept-Encoding': 'gzip'}, plain.headers['ETag']),
+                         ({'Accept-Encoding': 'identity'}, packed.headers['ETag'])):
+        resp = client.get('/scoreboard.json', headers={**headers, 'If-None-Match': tag})
+        assert resp.status_code == 200
+
+
+def test_team_and_public_pages_are_cached_apart(app, db):
+    _team(app, db)
+    public = app.app.test_client()
+    team   = app.app.test_client()
+    with team.session_transaction() as s:
+        s['team'] = 'alpha'
+    etag = public.get('/scoreboard').headers['ETag']
+    resp = team.get('/scoreboard', headers={'If-None-Match': etag})
+    assert resp.status_code == 200 and resp.headers['ETag'] != etag
+
+
+def test_tag_names_the_state_that_was_rendered(app, db, monkeypatch):
+    _team(app, db)
+    client = app.app.test_client()
+    render = app._scoreboard_json
+    writer = threading.Thread(target=app.record_submission,
+                              args=('alpha', app.catalog.flags[0]['id']))
+
+    def racing():
+        writer.start()                  # a capture lands while the page is built
+        time.sleep(0.2)
+        return render()
+
+    monkeypatch.setattr(app, '_scoreboard_json', racing)
+    first = client.get('/scoreboard.json')
+    monkeypatch.setattr(app, '_scoreboard_json', render)
+    writer.join(5)
+    assert json.loads(first.data)['teams'][0]['flag_positions'] == {}
+    resp = client.get('/scoreboard.json', headers={'If-None-Match': first.headers['ETag']})
+    assert resp.status_code == 200
+    assert json.loads(resp.data)['teams'][0]['flag_positions'] != {}
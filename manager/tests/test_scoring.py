@@ -0,0 +1,153 @@
+import random
+
+import pytest
+
+START_MS = 1_767_268_800_000        # 2026-01-01 12:00 UTC
+
+
+def _points(flag: dict, position: int) -> int:
+    if position == 1:
+        return int(flag['points'] * flag['fb_multiplier'])
+    if position <= 3:
+        return flag['points']
+    return max(1, flag['points'] - (position - 3))
+
+
+def _rows(db) -> dict:
+    """Every scoring row, by team name, in table (id) order."""
+    q = lambda sql: db.execute(sql).fetchall()
+    return {
+        'teams':    q('SELECT name, status, created_at FROM teams ORDER BY name'),
+        'captures': q('SELECT t.name, s.flag_id, s.captured_ms FROM submissions s '
+                      'JOIN teams t ON t.id = s.team_id ORDER BY s.id'),
+        'hints':    q('SELECT t.name, h.hint_id, h.purchased_ms FROM hint_purchases h '
+                      'JOIN teams t ON t.id = h.team_id ORDER BY h.id'),
+        'names':    q('SELECT t.name, n.purchased_ms FROM name_purchases n '
+                      'JOIN teams t ON t.id = n.team_id ORDER BY n.id'),
+    }
+
+
+def _capture_order(rows: dict) -> dict:
+    order = {}
+    for team, fid, _ in sorted(rows['captures'], key=lambda c: c[2]):    # ties keep id order
+        order.setdefault(fid, []).append(team)
+    return order
+
+
+def _old_scoreboard(app, rows: dict) -> list:
+    """The ranking as get_scoreboard() built it from the tables before the engine."""
+    flags = {f['id']: f for f in app.catalog.flags}
+    costs = {h['id']: h['cost'] for h in app.catalog.hints}
+    order = _capture_order(rows)
+    board = []
+    for name, status, _ in rows['teams']:
+        caps      = [(fid, ms) for team, fid, ms in rows['captures'] if team == name]
+        reveals   = sum(1 for team, _ in rows['names'] if team == name)
+        deduct    = (sum(costs[h] for team, h, _ in rows['hints'] if team == name)
+                     + app.catalog.flag_name_cost * reveals)
+        positions = {fid: order[fid].index(name) + 1 for fid, _ in caps}
+        last      = max((ms for _, ms in caps), default=None)
+        board.append({'name': name, 'status': status,
+                      'score': sum(_points(flags[f], p) for f, p in positions.items()) - deduct,
+                      'flag_positions': positions,
+                      'last_capture': app._ms_to_est(last) if last else None,
+                      '_sort_key': last or float('inf')})
+    board.sort(key=lambda r: (-r['score'], r['_sort_key']))
+    return [{k: v for k, v in r.items() if k != '_sort_key'} for r in board]
+
+
+def _old_timeline(app, rows: dict) -> tuple:
+    """(graph_data, graph_min, graph_max) as /scoreboard built them per request."""
+    flags   = {f['id']: f for f in app.catalog.flags}
+    costs   = {h['id']: h['cost'] for h in app.catalog.hints}
+    created = {name: app._ts_to_ms(ts) for name, _, ts in rows['teams']}
+    order   = _capture_order(rows)
+    events  = {}
+    for team, fid, ms in rows['captures']:
+        events.setdefault(team, []).append((ms, 'flag', fid))
+    for team, hid, ms in rows['hints']:
+        events.setdefault(team, []).append((ms, 'deduct', costs[hid]))
+    for team, ms in rows['names']:
+        events.setdefault(team, []).append((ms, 'deduct', app.catalog.flag_name_cost))
+    graph = {}
+    for team, evs in events.items():
+        evs.sort(key=lambda e: e[0])
+        series, got, deduct = [{'x': created.get(team, evs[0][0]), 'y': 0}], set(), 0
+        for ms, kind, payload in evs:
+            if kind == 'flag':
+                got.add(payload)
+            else:
+                deduct += payload
+            score = sum(_points(flags[f], order[f].index(team) + 1) for f in got) - deduct
+            series.append({'x': ms, 'y': score})
+        graph[team] = series
+    ys = [pt['y'] for series in graph.values() for pt in series]
+    return graph, min(ys, default=0), max(ys, default=100)
+
+
+def _board(app) -> list:
+    return [{k: r[k] for k in ('name', 'status', 'score', 'flag_positions', 'last_capture')}
+            for r in app.get_scoreboard()]
+
+
+def _seed(app, db, teams: int = 12, seed: int = 1):
+    """Random teams, captures (with timestamp ties), hint purchases and name reveals."""
+    rng   = random.Random(seed)
+    ms    = lambda: START_MS + 1000 * rng.randrange(600)
+    names = [f'team{i:02d}' for i in range(teams)]
+    ids   = {}
+    for i, name in enumerate(names):
+        ids[name] = db.execute(
+            "INSERT INTO teams (name, password_hash, port, status, created_at) "
+            "VALUES (?, 'x', ?, ?, datetime(?, 'unixepoch'))",
+            (name, 9000 + i, rng.choice(['running', 'stopped', 'starting']),
+             START_MS // 1000 - 60 * i)).lastrowid
+    captures = [(name, f['id']) for name in names for f in app.catalog.flags
+                if rng.random() < 0.5]
+    rng.shuffle(captures)
+    for name, fid in captures:
+        db.execute('INSERT INTO submissions (team_id, flag_id, captured_ms) VALUES (?, ?, ?)',
+                   (ids[name], fid, ms()))
+    for name in names:
+        for h in rng.sample(app.catalog.hints, rng.randrange(3)):
+            db.execute('INSERT INTO hint_purchases (team_id, hint_id, purchased_ms) '
+                       'VALUES (?, ?, ?)', (ids[name], h['id'], ms()))
+        for f in rng.sample(app.catalog.flags, rng.randrange(2)):
+            db.execute('INSERT INTO name_purchases (team_id, flag_id, purchased_ms) '
+                       'VALUES (?, ?, ?)', (ids[name], f['id'], ms()))
+    db.commit()
+    return names
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_loaded_scoreboard_matches_the_old_one(app, db, seed):
+    _seed(app, db, seed=seed)
+    app.scores.load()
+    rows = _rows(db)
+    assert _board(app) == _old_scoreboard(app, rows)
+    assert app.scores.timeline() == _old_timeline(app, rows)
+
+
+def test_live_updates_match_a_reload(app, db, monkeypatch):
+    monkeypatch.setattr(app, 'docker_down', lambda *args, **kwargs: None)
+    names = _seed(app, db, teams=6)
+    app.scores.load()
+    rng    = random.Random(7)
+    client = app.app.test_client()
+    for name in names:
+        for f in app.catalog.flags:
+            if rng.random() < 0.5:
+                app.record_submission(name, f['id'])
+        with client.session_transaction() as s:
+            s['team'] = name
+        client.post('/reveal-name', data={'flag_id': rng.choice(app.catalog.flags)['id']})
+    # Deleting a team moves later captures of its flags up a position
+    with client.session_transaction() as s:
+        s['is_admin'] = True
+    client.post(f'/admin/delete/{names[0]}')
+
+    rows = _rows(db)
+    live = _board(app), app.scores.timeline()
+    assert live == (_old_scoreboard(app, rows), _old_timeline(app, rows))
+    app.scores.load()
+    assert (_board(app), app.scores.timeline()) == live
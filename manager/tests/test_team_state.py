@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+
+import pytest
+
+
+@pytest.fixture
+def team(app, db):
+    db.execute("INSERT INTO teams (name, password_hash, port, status) "
+               "VALUES ('alpha', 'x', 9001, 'running')")
+    db.commit()
+    app.scores.load()
+    client = app.app.test_client()
+    with client.session_transaction() as s:
+        s['team'] = 'alpha'
+    return client
+
+
+def test_state_is_cached_until_a_write(app, team):
+    state = app.get_team_state('alpha')
+    assert state.captured == set() and app.get_team_state('alpha') is state
+
+    flag = app.catalog.flags[0]['id']
+    app.record_submission('alpha', flag)
+    assert app.get_team_state('alpha').captured == {flag}
+
+
+def test_team_writes_invalidate(app, team):
+    hint = next(h for h in app.catalog.hints if h['order'] == 1)
+    app.get_team_state('alpha')
+    team.post('/hints/buy', data={'hint_id': hint['id']})
+    assert app.get_team_state('alpha').hints == {hint['id']}
+    assert app.get_team_state('alpha').hint_cost == hint['cost']
+
+    team.post('/reveal-name', data={'flag_id': app.catalog.flags[1]['id']})
+    assert app.get_team_state('alpha').revealed == {app.catalog.flags[1]['id']}
+
+    app.set_team_status('alpha', 'stopped')
+    assert app.get_team_state('alpha').team['status'] == 'stopped'
+
+
+def test_admin_writes_invalidate(app, team, monkeypatch):
+    monkeypatch.setattr(app, 'docker_down', lambda *args, **kwargs: None)
+    admin = app.app.test_client()
+    with admin.session_transaction() as s:
+        s['is_admin'] = True
+    old = app.get_team_state('alpha').team['password_hash']
+    admin.post('/admin/reset-password/alpha', data={'new_password': 'a-new-password'})
+    assert app.get_team_state('alpha').team['password_hash'] != old
+
+    admin.post('/admin/delete/alpha')
+    assert app.get_team_state('alpha') is None
+
+
+def test_load_that_raced_a_write_is_not_cached(app, team, monkeypatch):
+    real = app.get_db
+
+    @contextmanager
+    def racing():
+        with real() as db:
+            yield db
+        app.invalidate_team_state('alpha')     # a write lands while the row is read
+
+    monkeypatch.setattr(app, 'get_db', racing)
+    assert app.get_team_state('alpha') is not None
+    monkeypatch.setattr(app, 'get_db', real)
+    assert 'alpha' not in app._team_states
+
+
+def test_lookups_of_unknown_names_keep_nothing(app, team):
+    for name in ('nosuch', 'www', 'alpha.example'):
+        assert app.get_team_state(name) is None
+        assert name not in app._team_state_gen and name not in app._team_states
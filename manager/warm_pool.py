@@ -0,0 +1,169 @@
+"""
+Warm instance pool — pre-booted slow services (MySQL), waiting for a team.
+
+Each pooled instance is its own compose project (ctfpool-<hex>) running only
+the pooled services, labelled ctf.pool=warm. Binding one to a team injects
+the team's flags with one exec and starts the remaining services on the
+instance's network, labelled with POOL_LABEL, which takes about a second
+instead of a full cold start. Everything the pool knows is in those labels,
+so ready instances survive a manager restart.
+
+  pool = WarmPool(2, engine, ['db'], 'db:bash /init.sh', orchestrator, spare=lambda: 10)
+  pool.start()
+  instance = pool.claim()               # None when nothing is ready
+  pool.bind(instance, 'ctf_team', env, flags)
+"""
+
+import logging
+import os
+import shlex
+import threading
+from collections import defaultdict, deque
+from functools import partial
+
+from docker_api import DockerError
+from scheduler import PRIO_POOL
+
+# On a team's containers: the pool project they are bound to
+POOL_LABEL = 'ctf.pool.instance'
+# On pooled containers
+_POOL_MARK = 'ctf.pool'
+_RETRY_SECONDS = 30
+
+
+class WarmPool:
+    """Pre-booted instances of the slow services (MySQL), waiting for a team.
+
+    Each instance is its own compose project (ctfpool-<hex>) running only
+    `services`. Binding it to a team takes about a second instead of a
+    full cold start. Boots go through the orchestrator below registrations
+    and restarts, and only into the room `spare()` reports. Pool state
+    lives in Docker labels, so ready instances survive a manager restart.
+
+    `bind_exec` is 'service:command', run in the pooled container at
+    assignment with the team's flags in its environment.
+    """
+
+    def __init__(self, size: int, engine, services: list, bind_exec: str,
+                 orchestrator, spare):
+        self.size         = size
+        self.engine       = engine          # ComposeEngine, or None with the docker CLI
+        self.services     = services
+        self.bind_exec    = bind_exec
+        self.orchestrator = orchestrator
+        self.spare        = spare
+        self.enabled      = False
+        self._lock        = threading.Lock()
+        self._ready       = deque()     # instance projects, oldest first
+        self._booting     = set()
+
+    def start(self):
+        if self.size <= 0:
+            return
+        if self.engine is None:
+            logging.warning('Warm pool disabled: it needs the Docker Engine API')
+            return
+        model   = self.engine.model
+        unknown = [s for s in self.services if s not in model.services]
+        if unknown or not self.services or set(self.services) >= set(model.services):
+            logging.warning('Warm pool disabled: POOL_SERVICES must name some, '
+                            'but not all, services of %s', model.config_file)
+            return
+        self.enabled = True
+        try:
+            self._recover()
+        except (DockerError, OSError) as exc:
+            logging.warning('Warm pool: could not list existing instances: %s', exc)
+        self.refill()
+
+    def _recover(self):
+        client = self.engine.client
+        bound  = {c['Labels'].get(POOL_LABEL) for c in client.list_containers([POOL_LABEL])}
+        found  = defaultdict(list)
+        for c in client.list_containers([f'{_POOL_MARK}=warm']):
+            found[c['Labels']['com.docker.compose.project']].append(c)
+        for instance, containers in found.items():
+            if instance in bound:
+                continue
+            healthy = len(containers) == len(self.services) and all(
+                c['State'] == 'running' and '(health:' not in c.get('Status', '')
+                and '(unhealthy)' not in c.get('Status', '') for c in containers)
+            if healthy:
+                self._ready.append(instance)
+            else:
+                self.discard(instance)
+        logging.info('Warm pool: %d ready instance(s) recovered', len(self._ready))
+
+    def refill(self):
+        # Waiting teams come first; the pool only grows into spare capacity
+        spare = self.spare()
+        with self._lock:
+            if not self.enabled:
+                return
+            need      = min(spare, self.size - len(self._ready) - len(self._booting))
+            instances = [f'ctfpool-{os.urandom(4).hex()}' for _ in range(max(0, need))]
+            self._booting.update(instances)
+        for instance in instances:
+            if self.engine.subnets:
+                self.engine.subnets.reserve(instance)
+            self.orchestrator.submit(f'pool:{instance}', partial(self._boot, instance), PRIO_POOL)
+
+    def up(self, instance: str):
+        """Bring the pooled services of an instance up and wait until they are ready."""
+        self.engine.up(instance, dict(os.environ), services=self.services,
+                       labels={_POOL_MARK: 'warm'})
+        self.engine.wait_ready(instance, self.services)
+
+    def _boot(self, instance: str):
+        try:
+            self.up(instance)
+        except (DockerError, OSError, ValueError) as exc:
+            logging.error('Warm pool: booting %s failed: %s', instance, exc)
+            with self._lock:
+                self._booting.discard(instance)
+            self.discard(instance)
+            # Back off instead of hammering a broken daemon / image
+            threading.Timer(_RETRY_SECONDS, self.refill).start()
+            return
+        with self._lock:
+            self._booting.discard(instance)
+            self._ready.append(instance)
+        logging.info('Warm pool: %s ready (%d/%d)', instance, len(self._ready), self.size)
+
+    def bind(self, instance: str, project: str, env: dict, flags: dict):
+        """Late-bind a warm instance to a team's project: inject its flags, start the rest."""
+        self.up(instance)           # no-op when already running
+        service, _, command = self.bind_exec.partition(':')
+        if command:
+            code, out = self.engine.client.exec(f'{instance}-{service}-1',
+                                                shlex.split(command), env=flags)
+            if code != 0:
+                raise DockerError(500, f'{command!r} exited with {code}: {out.strip()[-200:]}')
+        self.engine.up(project, env,
+                       services=[s for s in self.engine.model.order if s not in self.services],
+                       network=self.engine.model.network_name(instance),
+                       labels={POOL_LABEL: instance},
+                       peers={s: f'{instance}-{s}-1' for s in self.services})
+
+    def claim(self):
+        """Take a ready instance (or None) and start booting its replacement."""
+        with self._lock:
+            instance = self._ready.popleft() if self._ready else None
+        if instance:
+            self.refill()
+        return instance
+
+    def discard(self, instance: str):
+        """Remove an instance that is broken or no longer wanted (in the background)."""
+        threading.Thread(target=self._down, args=(instance,), daemon=True).start()
+
+    def _down(self, project: str):
+        try:
+            self.engine.down(project)
+        except (DockerError, OSError) as exc:
+            logging.warning('Cleanup of %s failed: %s', project, exc)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'size': self.size if self.enabled else 0,
+                    'ready': len(self._ready), 'booting': len(self._booting)}